@@ -0,0 +1,23 @@
+"""
+笔记附件
+
+附件内容按 SHA-256 存放在本地磁盘（store），相同内容只存一份；上传时从请求体流式
+解析并边写边计算哈希（upload），不在内存中缓存整个文件；无人引用的内容由垃圾回收
+删除（gc）。
+"""
+from .store import ATTACHMENT_MAX_SIZE, BlobStore, BlobTooLarge, BlobWriter, blob_store
+from .upload import Upload, UploadError, receive_upload
+from .gc import BlobCollector, collect_garbage
+
+__all__ = [
+    'ATTACHMENT_MAX_SIZE',
+    'BlobStore',
+    'BlobTooLarge',
+    'BlobWriter',
+    'blob_store',
+    'Upload',
+    'UploadError',
+    'receive_upload',
+    'BlobCollector',
+    'collect_garbage'
+]
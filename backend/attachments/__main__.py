@@ -0,0 +1,21 @@
+"""附件维护命令行：python -m attachments [gc [宽限秒数]|usage]"""
+import logging
+import sys
+
+from .gc import ATTACHMENT_GC_GRACE, collect_garbage
+from .store import blob_store
+
+logging.basicConfig(level=logging.INFO)
+command = sys.argv[1] if len(sys.argv) > 1 else "gc"
+if command == "gc":
+    grace = float(sys.argv[2]) if len(sys.argv) > 2 else ATTACHMENT_GC_GRACE
+    result = collect_garbage(grace)
+    print(
+        f"removed {result['blobs']} blobs, {result['orphans']} orphan files, "
+        f"{result['temp_files']} temp files ({result['bytes']} bytes)"
+    )
+elif command == "usage":
+    files, size = blob_store.usage()
+    print(f"{files} blobs, {size} bytes in {blob_store.root}")
+else:
+    sys.exit(f"unknown command: {command}")
@@ -0,0 +1,122 @@
+"""
+附件内容的垃圾回收
+
+删除附件或笔记只减少 blobs.ref_count，文件留给这里删除：
+- 引用计数为 0 且超过宽限期（ATTACHMENT_GC_GRACE）的内容：删除行和文件
+- 数据库中没有记录的文件（写事务回滚、进程崩溃留下的）和过期的上传临时文件
+
+宽限期内重新上传同样的内容不必再写文件；对临时文件来说，宽限期避免删除进行中的上传
+（每次写入都会更新修改时间）。
+
+应用内由 BlobCollector 定期执行（ATTACHMENT_GC_INTERVAL，0 表示不执行），
+也可以手动执行：
+    python -m attachments gc [宽限秒数]
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+import crud
+from database import SessionLocal
+from .store import blob_store
+
+logger = logging.getLogger(__name__)
+
+# 引用计数降为 0 的内容和孤立文件保留的秒数
+ATTACHMENT_GC_GRACE = float(os.getenv("ATTACHMENT_GC_GRACE", "3600"))
+# 定期垃圾回收的间隔（秒），0 表示不执行
+ATTACHMENT_GC_INTERVAL = float(os.getenv("ATTACHMENT_GC_INTERVAL", "3600"))
+# 每个写事务检查的孤立文件数
+ORPHAN_BATCH_SIZE = 500
+
+
+def _write_session():
+    db = SessionLocal()
+    db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+    return db
+
+
+def collect_garbage(grace: float = ATTACHMENT_GC_GRACE) -> dict:
+    """
+    执行一次完整的垃圾回收，每批在一个短的写事务中完成，不长时间占用写锁。
+
+    返回: 删除的内容数、孤立文件数、临时文件数和释放的字节数
+    """
+    result = {"blobs": 0, "orphans": 0, "temp_files": 0, "bytes": 0}
+    before = datetime.utcnow() - timedelta(seconds=grace)
+    while True:
+        with _write_session() as db:
+            removed, freed = crud.collect_unreferenced_blobs(db, before)
+        result["blobs"] += removed
+        result["bytes"] += freed
+        if removed < crud.GC_BATCH_SIZE:
+            break
+
+    orphans = []
+
+    def _remove_orphans() -> None:
+        with _write_session() as db:
+            removed, freed = crud.remove_orphan_files(db, orphans)
+        result["orphans"] += removed
+        result["bytes"] += freed
+        orphans.clear()
+
+    for name, temporary in blob_store.scan(time.time() - grace):
+        if temporary:
+            try:
+                result["bytes"] += os.stat(name).st_size
+                os.unlink(name)
+                result["temp_files"] += 1
+            except FileNotFoundError:
+                pass
+            continue
+        orphans.append(name)
+        if len(orphans) >= ORPHAN_BATCH_SIZE:
+            _remove_orphans()
+    if orphans:
+        _remove_orphans()
+    return result
+
+
+class BlobCollector:
+    """在后台任务中定期执行 collect_garbage"""
+
+    def __init__(self, interval: float = ATTACHMENT_GC_INTERVAL, grace: float = ATTACHMENT_GC_GRACE):
+        self.interval = interval
+        self.grace = grace
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            # 多个 worker 各自执行，错开时间
+            await asyncio.sleep(self.interval * random.uniform(0.5, 1.5))
+            try:
+                result = await run_in_threadpool(collect_garbage, self.grace)
+            except Exception:
+                logger.exception("Attachment garbage collection failed")
+                continue
+            if any(result.values()):
+                logger.info(
+                    "Attachment GC: removed %d blobs, %d orphan files, %d temp files (%d bytes)",
+                    result["blobs"], result["orphans"], result["temp_files"], result["bytes"]
+                )
+
+    async def start(self) -> None:
+        if self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
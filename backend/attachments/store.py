@@ -0,0 +1,177 @@
+"""
+附件内容的存储：本地磁盘上按 SHA-256 寻址的文件
+
+内容相同的附件（不论属于哪个用户）只存一份，路径为 <目录>/<前 2 位>/<3~4 位>/<完整哈希>。
+上传的数据先写入 <目录>/tmp 下的临时文件并同时计算哈希，写完后在数据库的写事务中
+改名到最终路径（同一文件系统内的 rename 是原子的），已有同样内容时直接丢弃临时文件。
+
+文件的增删都发生在数据库写事务中（见 crud/attachment.py），与 blobs 表的引用计数
+一起串行化：垃圾回收删除文件的同时不会有上传认为文件已存在而跳过写入。
+"""
+import hashlib
+import os
+import tempfile
+import time
+from typing import Iterator, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from database import engine
+
+# 单个附件的最大字节数
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE", str(100 * 1024 * 1024)))
+# 上传数据攒到这么多字节后再交给线程池写盘和计算哈希，减少线程切换；也是每个上传占用内存的上限
+UPLOAD_FLUSH_SIZE = 1024 * 1024
+
+_TMP_DIR = "tmp"
+
+
+def default_blob_dir() -> str:
+    """ATTACHMENT_DIR，默认在 SQLite 数据库文件旁边的 <数据库文件名>.attachments 目录"""
+    configured = os.getenv("ATTACHMENT_DIR")
+    if configured:
+        return configured
+    path = engine.url.database if engine.dialect.name == "sqlite" else None
+    if not path or path == ":memory:":
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "notes.db")
+    return f"{os.path.abspath(path)}.attachments"
+
+
+class BlobTooLarge(Exception):
+    """上传内容超过大小上限"""
+
+
+class BlobWriter:
+    """
+    把上传内容写入临时文件，边写边计算 SHA-256，内存中最多保留 UPLOAD_FLUSH_SIZE 字节。
+
+    写完调用 finish，之后由 BlobStore.place 放到最终位置；中途放弃时调用 discard。
+    """
+
+    def __init__(self, tmp_dir: str, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.sha256: Optional[str] = None
+        fd, self.temp_path = tempfile.mkstemp(dir=tmp_dir, prefix="upload-")
+        self._file = os.fdopen(fd, "wb", buffering=0)
+        self._hash = hashlib.sha256()
+        self._pending = []
+        self._pending_size = 0
+
+    def _write(self, data: bytes) -> None:
+        # hashlib 和文件写入都会释放 GIL，在线程池中执行不阻塞事件循环
+        self._hash.update(data)
+        self._file.write(data)
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise BlobTooLarge(f"Attachment exceeds {self.max_size} bytes")
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= UPLOAD_FLUSH_SIZE:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        data = b"".join(self._pending)
+        self._pending, self._pending_size = [], 0
+        if data:
+            await run_in_threadpool(self._write, data)
+
+    async def finish(self) -> str:
+        """写入剩余数据并落盘，返回内容的 SHA-256"""
+        await self._flush()
+        await run_in_threadpool(self._close, True)
+        self.sha256 = self._hash.hexdigest()
+        return self.sha256
+
+    def _close(self, sync: bool) -> None:
+        if not self._file.closed:
+            if sync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    def discard(self) -> None:
+        """删除临时文件；已放到最终位置后调用没有影响"""
+        self._close(False)
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobStore:
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        # 目录在第一次使用时才确定和创建，导入模块时不触碰文件系统
+        if self._root is None:
+            self._root = default_blob_dir()
+        return self._root
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def relative_path(self, sha256: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def open_writer(self, max_size: int = ATTACHMENT_MAX_SIZE) -> BlobWriter:
+        tmp_dir = os.path.join(self.root, _TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return BlobWriter(tmp_dir, max_size)
+
+    def place(self, writer: BlobWriter) -> bool:
+        """
+        把写完的临时文件放到最终位置，已有同样内容时丢弃临时文件。在数据库写事务中调用。
+
+        返回: 是否新写入了文件
+        """
+        path = self.path(writer.sha256)
+        if os.path.exists(path):
+            writer.discard()
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(writer.temp_path, path)
+        return True
+
+    def remove(self, sha256: str) -> int:
+        """删除文件，返回释放的字节数（文件不存在时为 0）"""
+        path = self.path(sha256)
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def scan(self, older_than: float) -> Iterator[Tuple[str, bool]]:
+        """
+        列出修改时间早于 older_than（time.time() 秒）的文件：(哈希或临时文件路径, 是否临时文件)。
+        用于清理数据库中没有记录的文件（写事务回滚、进程崩溃留下的）。
+        """
+        if not os.path.isdir(self.root):
+            return
+        for dirpath, _, filenames in os.walk(self.root):
+            temporary = os.path.basename(dirpath) == _TMP_DIR
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime >= older_than:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield (path, True) if temporary else (name, False)
+
+    def usage(self) -> Tuple[int, int]:
+        """(文件数, 占用字节数)，不含临时文件"""
+        files = size = 0
+        for sha256, temporary in self.scan(time.time() + 1):
+            if not temporary:
+                files += 1
+                size += os.stat(self.path(sha256)).st_size
+        return files, size
+
+
+blob_store = BlobStore()
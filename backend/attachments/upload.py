@@ -0,0 +1,152 @@
+"""
+流式接收 multipart/form-data 上传
+
+FastAPI 的 UploadFile 要等整个请求体解析完（先缓存在内存，超过 1MB 转存临时文件）才进入
+路由，之后还要再读一遍计算哈希、再写一遍到存储目录。这里直接从 request.stream() 取数据
+交给 python-multipart 的增量解析器，文件部分边收边写入 BlobWriter（同时计算哈希），
+每个上传占用的内存与文件大小无关。
+"""
+import mimetypes
+import re
+from typing import List, Optional
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from .store import ATTACHMENT_MAX_SIZE, BlobStore, BlobWriter
+
+# 上传的文件字段名
+FILE_FIELD = "file"
+# 每个 part 头部的最大字节数
+MAX_HEADER_BYTES = 8 * 1024
+
+_CONTENT_TYPE = re.compile(r"^[a-z0-9][a-z0-9!#$&^_.+-]*/[a-z0-9][a-z0-9!#$&^_.+-]*$")
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\x00-\x1f\x7f"\\/]')
+
+
+class UploadError(Exception):
+    """请求体不是合法的 multipart 上传，或者没有文件字段"""
+
+
+class Upload:
+    """收到的文件：内容已写入 writer（已计算哈希），filename / content_type 来自 part 头部"""
+    __slots__ = ("writer", "filename", "content_type")
+
+    def __init__(self, writer: BlobWriter, filename: str, content_type: str):
+        self.writer = writer
+        self.filename = filename
+        self.content_type = content_type
+
+
+def clean_filename(value: str) -> str:
+    # 只保留文件名本身（去掉客户端路径），去掉控制字符和引号，限制长度
+    name = _UNSAFE_FILENAME_CHARS.sub("_", value.replace("\\", "/").rsplit("/", 1)[-1]).strip()
+    return name[:255] or "file"
+
+
+def clean_content_type(value: Optional[str], filename: str) -> str:
+    content_type = (value or "").split(";", 1)[0].strip().lower()
+    if not content_type or content_type == "application/octet-stream":
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return content_type if len(content_type) <= 100 and _CONTENT_TYPE.match(content_type) else "application/octet-stream"
+
+
+class _PartCollector:
+    """python-multipart 的回调是同步的：先收集本次 write 产生的文件数据，由调用方异步写入"""
+
+    def __init__(self):
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.header_bytes = 0
+        self.in_file = False
+        self.file_seen = False
+        self.filename = ""
+        self.content_type = None
+        self.chunks: List[bytes] = []
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+        self.header_bytes = 0
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_field += data[start:end]
+        self._count(end - start)
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+        self._count(end - start)
+
+    def _count(self, size: int) -> None:
+        self.header_bytes += size
+        if self.header_bytes > MAX_HEADER_BYTES:
+            raise UploadError("Multipart headers too large")
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_field.strip().lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        # 只接收第一个文件字段，其余 part 的内容丢弃
+        self.in_file = (
+            not self.file_seen
+            and options.get(b"name") == FILE_FIELD.encode()
+            and b"filename" in options
+        )
+        if self.in_file:
+            self.file_seen = True
+            self.filename = clean_filename(options[b"filename"].decode("utf-8", "replace"))
+            content_type = self.headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.in_file:
+            self.chunks.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        self.in_file = False
+
+
+async def receive_upload(request: Request, store: BlobStore, max_size: int = ATTACHMENT_MAX_SIZE) -> Upload:
+    """
+    从请求体中读取 FILE_FIELD 字段的文件，写入存储的临时文件并计算 SHA-256。
+
+    出错时临时文件已删除；成功时调用方负责 place 或 discard。
+    抛出: UploadError、BlobTooLarge
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected multipart/form-data with a boundary")
+
+    collector = _PartCollector()
+    parser = MultipartParser(boundary, {
+        "on_part_begin": collector.on_part_begin,
+        "on_header_field": collector.on_header_field,
+        "on_header_value": collector.on_header_value,
+        "on_header_end": collector.on_header_end,
+        "on_headers_finished": collector.on_headers_finished,
+        "on_part_data": collector.on_part_data,
+        "on_part_end": collector.on_part_end,
+    })
+    writer = store.open_writer(max_size)
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except UploadError:
+                raise
+            except Exception as exc:
+                raise UploadError(f"Malformed multipart body: {exc}") from exc
+            for data in collector.chunks:
+                await writer.write(data)
+            collector.chunks.clear()
+        parser.finalize()
+        if not collector.file_seen:
+            raise UploadError(f"Missing file field '{FILE_FIELD}'")
+        await writer.finish()
+    except BaseException:
+        writer.discard()
+        raise
+    return Upload(writer, collector.filename, clean_content_type(collector.content_type, collector.filename))
@@ -0,0 +1,225 @@
+"""
+附件的流式上传、去重、Range 下载和垃圾回收
+
+启动应用（serve.py，单 worker），然后：
+- 上传：以分块传输发送一个大文件，记录吞吐量和 worker 进程的内存峰值增长（VmHWM），
+  峰值不应随文件大小增长
+- 去重：另一个用户上传同样的内容，存储目录中仍只有一个文件
+- 下载：完整下载的吞吐量，Range 请求返回 206 和对应的字节，If-None-Match 返回 304
+- 垃圾回收：删除两个用户的笔记后执行 python -m attachments gc 0，文件被删除
+检查不通过时以非零状态退出。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_attachments.py [文件大小 MB，默认 256]
+"""
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHUNK_SIZE = 256 * 1024
+BOUNDARY = "benchattachmentboundary"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str) -> None:
+    for _ in range(300):
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def _worker_pid(server_pid: int) -> int:
+    # serve.py 是 uvicorn 的进程管理器，worker 是它的子进程
+    for _ in range(100):
+        with open(f"/proc/{server_pid}/task/{server_pid}/children") as f:
+            children = [int(pid) for pid in f.read().split()]
+        if children:
+            return max(children)
+        time.sleep(0.1)
+    raise RuntimeError("worker process not found")
+
+
+def _memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak(pid: int) -> bool:
+    # 写入 5 重置 VmHWM（Linux 4.0+），失败时峰值包含启动以来的最大值
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _block(index: int) -> bytes:
+    # 每块内容不同（不能被压缩或去重），生成成本可以忽略
+    return hashlib.sha256(index.to_bytes(8, "big")).digest() * (CHUNK_SIZE // 32)
+
+
+def _multipart_body(size: int, filename: str, digest):
+    """分块产生 multipart 请求体，同时计算文件内容的 SHA-256"""
+    yield (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    sent = index = 0
+    while sent < size:
+        block = _block(index)[:size - sent]
+        digest.update(block)
+        sent += len(block)
+        index += 1
+        yield block
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _login(client: httpx.Client, name: str) -> dict:
+    client.post("/api/users/", json={"username": name, "email": f"{name}@example.com", "password": "bench123"})
+    token = client.post("/api/users/login", json={"username": name, "password": "bench123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _blob_files(root: str) -> list:
+    return [
+        name for dirpath, _, names in os.walk(root) if os.path.basename(dirpath) != "tmp" for name in names
+    ]
+
+
+def _run(base: str, worker: int, blob_dir: str, env: dict, size: int) -> list:
+    failures = []
+
+    def check(condition: bool, message: str) -> None:
+        print(f"  [{'ok' if condition else 'FAIL'}] {message}")
+        if not condition:
+            failures.append(message)
+
+    with httpx.Client(base_url=base, timeout=300) as client:
+        headers = [_login(client, name) for name in ("bench0", "bench1")]
+        note_ids = [
+            client.post("/api/notes/", json={"title": "附件", "content": "附件测试"}, headers=h).json()["id"]
+            for h in headers
+        ]
+        upload_headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+        print(f"streamed upload ({size / 2**20:.0f} MB, chunked):")
+        baseline = _memory_kb(worker, "VmRSS")
+        exact = _reset_peak(worker)
+        digest = hashlib.sha256()
+        start = time.perf_counter()
+        response = client.post(
+            f"/api/attachments/?note_id={note_ids[0]}",
+            content=_multipart_body(size, "large.bin", digest),
+            headers={**headers[0], **upload_headers}
+        )
+        elapsed = time.perf_counter() - start
+        peak = _memory_kb(worker, "VmHWM")
+        attachment = response.json()
+        growth = (peak - baseline) / 1024
+        print(
+            f"  {size / 2**20 / elapsed:.0f} MB/s; worker RSS {baseline / 1024:.0f} MB before, "
+            f"peak {peak / 1024:.0f} MB (+{growth:.0f} MB){'' if exact else ' (peak since start)'}"
+        )
+        check(response.status_code == 201 and attachment["sha256"] == digest.hexdigest(), "stored content hash matches")
+        check(growth < 64, "worker memory does not grow with the upload size (< 64 MB)")
+
+        print("dedup:")
+        response = client.post(
+            f"/api/attachments/?note_id={note_ids[1]}",
+            content=_multipart_body(size, "copy.bin", hashlib.sha256()),
+            headers={**headers[1], **upload_headers}
+        )
+        files = _blob_files(blob_dir)
+        print(f"  second user's upload: {response.status_code}, {len(files)} file(s) in the store")
+        check(response.status_code == 201 and response.json()["sha256"] == attachment["sha256"], "same hash for both users")
+        check(len(files) == 1, "content stored once")
+
+        print("download:")
+        url = attachment["url"]
+        received = 0
+        start = time.perf_counter()
+        with client.stream("GET", url, headers=headers[0]) as response:
+            etag = response.headers.get("etag")
+            for chunk in response.iter_bytes():
+                received += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"  full: {received / 2**20 / elapsed:.0f} MB/s, ETag {etag}")
+        check(received == size, "full download size")
+        offset = size // 2
+        expected = _block(offset // CHUNK_SIZE)[offset % CHUNK_SIZE:][:1000]
+        response = client.get(url, headers={**headers[0], "Range": f"bytes={offset}-{offset + len(expected) - 1}"})
+        print(f"  range: {response.status_code} {response.headers.get('content-range')}")
+        check(response.status_code == 206 and response.content == expected, "range request returns the requested bytes")
+        response = client.get(url, headers={**headers[0], "If-None-Match": etag})
+        check(response.status_code == 304, "If-None-Match returns 304")
+
+        print("garbage collection:")
+        client.delete(f"/api/notes/{note_ids[0]}", headers=headers[0])
+        result = subprocess.run(
+            [sys.executable, "-m", "attachments", "gc", "0"], cwd=BACKEND, env=env, capture_output=True, text=True
+        )
+        print(f"  after deleting one note: {result.stdout.strip()}")
+        check(len(_blob_files(blob_dir)) == 1, "content still referenced by the other user is kept")
+        client.delete(f"/api/notes/{note_ids[1]}", headers=headers[1])
+        result = subprocess.run(
+            [sys.executable, "-m", "attachments", "gc", "0"], cwd=BACKEND, env=env, capture_output=True, text=True
+        )
+        print(f"  after deleting both notes: {result.stdout.strip()}")
+        check(not _blob_files(blob_dir), "unreferenced content removed")
+    return failures
+
+
+def main() -> int:
+    size = int(float(sys.argv[1]) * 2**20) if len(sys.argv) > 1 else 256 * 2**20
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        blob_dir = os.path.join(tmp, "attachments")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'attachments.db')}",
+            "ATTACHMENT_DIR": blob_dir,
+            "ATTACHMENT_MAX_SIZE": str(size),
+            "BCRYPT_ROUNDS": "4",
+            "HOST": "127.0.0.1",
+            "PORT": str(port),
+            "WEB_CONCURRENCY": "1",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "serve.py"], cwd=BACKEND, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_ready(f"http://127.0.0.1:{port}/ready")
+            failures = _run(f"http://127.0.0.1:{port}", _worker_pid(server.pid), blob_dir, env, size)
+        finally:
+            server.terminate()
+            server.wait(30)
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+AI 助手对话接口（POST /api/assistant/chat）的流式输出、并发限制和取消
+
+启动模拟模型服务（benchmarks/fake_llm.py）和应用（serve.py），然后：
+- 单个对话：客户端看到的首个 token 延迟、生成速度，与服务端 done 事件中的统计对比
+- 连接复用：连续多次对话后模型服务收到的 TCP 连接数
+- 并发：多个用户同时提问，模型服务观察到的最大并发数、排队和被拒绝（429）的请求数
+- 取消：读到几个 token 后断开，模型服务是否随之停止生成，名额是否归还
+最后输出 /metrics 中的 llm_* 指标。检查不通过时以非零状态退出。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_chat.py [用户数，默认 4] [每个用户同时提问数，默认 4]
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟模型：首 token 延迟 0.2 秒，50 tokens/s，每个回答 40 个 token
+FAKE_TTFT, FAKE_RATE, FAKE_TOKENS = 0.2, 50.0, 40
+MAX_CONCURRENCY, MAX_PER_USER, MAX_WAITING_PER_USER = 4, 2, 1
+SEQUENTIAL = 5
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str) -> None:
+    for _ in range(300):
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+async def _chat(client, headers, question: str, cancel_after: int = 0, max_tokens: int = None) -> dict:
+    """提问并读取事件流；cancel_after 大于 0 时读到这么多 token 后断开"""
+    result = {"status": None, "tokens": 0, "queued": False, "first_token": None, "done": None, "error": None}
+    body = {"messages": [{"role": "user", "content": question}], "use_notes": False}
+    if max_tokens:
+        body["max_tokens"] = max_tokens
+    start = time.perf_counter()
+    async with client.stream("POST", "/api/assistant/chat", json=body, headers=headers) as response:
+        result["status"] = response.status_code
+        if response.status_code != 200:
+            return result
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+                if event == "token":
+                    result["tokens"] += 1
+                    if result["first_token"] is None:
+                        result["first_token"] = time.perf_counter() - start
+                    if result["tokens"] == cancel_after:
+                        break
+                elif event in ("done", "error"):
+                    result[event] = data
+                elif event == "queued":
+                    result["queued"] = True
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+async def _login(client, name: str) -> dict:
+    await client.post("/api/users/", json={"username": name, "email": f"{name}@example.com", "password": "bench123"})
+    token = (await client.post("/api/users/login", json={"username": name, "password": "bench123"})).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _run(base: str, fake: str, users: int, per_user: int) -> list:
+    failures = []
+
+    def check(condition: bool, message: str) -> None:
+        print(f"  [{'ok' if condition else 'FAIL'}] {message}")
+        if not condition:
+            failures.append(message)
+
+    async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+        headers = [await _login(client, f"bench{i}") for i in range(users)]
+
+        print("single chat:")
+        await _chat(client, headers[0], "预热", max_tokens=1)
+        result = await _chat(client, headers[0], "你好")
+        done = result["done"] or {}
+        print(
+            f"  client: first token {result['first_token'] * 1e3:.0f} ms, {result['tokens']} tokens in {result['elapsed'] * 1e3:.0f} ms"
+            f"   server: ttft {done.get('time_to_first_token_ms')} ms, {done.get('tokens_per_second')} tokens/s"
+        )
+        check(result["tokens"] == FAKE_TOKENS and done.get("finish_reason") == "stop", "all tokens streamed, finish_reason=stop")
+        check(result["first_token"] < FAKE_TTFT + 0.2, f"tokens arrive as generated (first token < {FAKE_TTFT + 0.2:.1f} s)")
+
+        print(f"keep-alive ({SEQUENTIAL} sequential chats):")
+        before = httpx.get(f"{fake}/stats").json()
+        for _ in range(SEQUENTIAL):
+            await _chat(client, headers[0], "再来一次", max_tokens=4)
+        after = httpx.get(f"{fake}/stats").json()
+        opened = after["connections"] - before["connections"]
+        print(f"  {after['requests'] - before['requests']} upstream requests over {opened} new connections")
+        check(opened == 0, "upstream connections are reused")
+
+        total = users * per_user
+        print(f"concurrency ({users} users x {per_user} questions, limits {MAX_CONCURRENCY} global / {MAX_PER_USER} per user):")
+        before = httpx.get(f"{fake}/stats").json()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            _chat(client, headers[i % users], f"问题 {i}") for i in range(total)
+        ))
+        elapsed = time.perf_counter() - start
+        stats = httpx.get(f"{fake}/stats").json()
+        served = [r for r in results if r["status"] == 200 and r["done"]]
+        rejected = sum(r["status"] == 429 for r in results)
+        timed_out = sum(bool(r["error"]) for r in results)
+        queued = sum(r["queued"] for r in served)
+        print(
+            f"  {len(served)} served ({queued} after queueing), {rejected} rejected with 429, {timed_out} errors"
+            f" in {elapsed:.2f} s; upstream max concurrency {stats['max_active']}"
+        )
+        check(stats["max_active"] <= MAX_CONCURRENCY, "upstream concurrency within the global limit")
+        # 每个用户最多 MAX_PER_USER 个执行、MAX_WAITING_PER_USER 个排队；全局名额满时排队的更多，拒绝的也更多
+        at_least = max(0, per_user - MAX_PER_USER - MAX_WAITING_PER_USER) * users
+        check(rejected >= at_least, f"requests over the per-user limits rejected (at least {at_least})")
+        check(len(served) + rejected == total, "every accepted request completed")
+        check(stats["requests"] - before["requests"] == len(served), "one upstream request per accepted chat")
+
+        print("cancellation:")
+        before = httpx.get(f"{fake}/stats").json()
+        result = await _chat(client, headers[0], "长回答", cancel_after=3)
+        await asyncio.sleep(0.3)
+        after = httpx.get(f"{fake}/stats").json()
+        metrics = (await client.get("/metrics")).text
+        active = next(line for line in metrics.splitlines() if line.startswith("llm_generations_active"))
+        print(f"  read {result['tokens']} tokens then disconnected; upstream cancelled {after['cancelled'] - before['cancelled']}, {active}")
+        check(after["cancelled"] - before["cancelled"] == 1 and after["active"] == 0, "upstream generation stopped")
+        check(active.endswith(" 0.0"), "generation slot released")
+
+        print("metrics:")
+        for line in metrics.splitlines():
+            if line.startswith("llm_") and "_bucket" not in line:
+                print(f"  {line}")
+    return failures
+
+
+def main() -> int:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        fake_port, port = _free_port(), _free_port()
+        fake = subprocess.Popen(
+            [sys.executable, "benchmarks/fake_llm.py", "--port", str(fake_port),
+             "--ttft", str(FAKE_TTFT), "--rate", str(FAKE_RATE), "--tokens", str(FAKE_TOKENS)],
+            cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'chat.db')}",
+            "BCRYPT_ROUNDS": "4",
+            "HOST": "127.0.0.1",
+            "PORT": str(port),
+            "WEB_CONCURRENCY": "1",
+            "LLM_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+            "LLM_MAX_CONCURRENCY": str(MAX_CONCURRENCY),
+            "LLM_MAX_PER_USER": str(MAX_PER_USER),
+            "LLM_MAX_WAITING_PER_USER": str(MAX_WAITING_PER_USER),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "serve.py"], cwd=BACKEND, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        base, fake_base = f"http://127.0.0.1:{port}", f"http://127.0.0.1:{fake_port}"
+        try:
+            _wait_ready(f"{base}/ready")
+            _wait_ready(f"{fake_base}/stats")
+            failures = asyncio.run(_run(base, fake_base, users, per_user))
+        finally:
+            server.terminate()
+            fake.terminate()
+            server.wait(30)
+            fake.wait(30)
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+worker 冷启动耗时：从启动 uvicorn 到 /health 第一次返回 200 的时间，
+以及每个 worker 日志中的 import / startup 耗时。
+
+分别在空数据库（第一个 worker 需要建表和迁移）和已是最新结构的数据库上，
+用 1 个和多个 worker 启动，反映扩容和滚动重启（restart.sh / systemd）时的等待时间。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_cold_start.py [worker 数，默认 4]
+"""
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_LINE = re.compile(r"Worker started: import (\d+) ms, startup (\d+) ms")
+STARTUP_TIMEOUT = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _healthy(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def _cold_start(database_url: str, workers: int) -> tuple:
+    """返回 (到 /health 返回 200 的秒数, 各 worker 的 (import ms, startup ms))"""
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    with tempfile.TemporaryFile() as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers)],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            while not _healthy(port):
+                if time.perf_counter() - started > STARTUP_TIMEOUT or process.poll() is not None:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.01)
+            first_response = time.perf_counter() - started
+            # 等所有 worker 都打印启动日志
+            deadline = time.perf_counter() + 10
+            while time.perf_counter() < deadline:
+                log.seek(0)
+                timings = WORKER_LINE.findall(log.read().decode(errors="replace"))
+                if len(timings) >= workers:
+                    break
+                time.sleep(0.05)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return first_response, [(int(a), int(b)) for a, b in timings]
+
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (1, workers):
+            database_url = f"sqlite:///{os.path.join(tmp, f'cold-{count}.db')}"
+            for label in ("empty database", "current schema"):
+                seconds, timings = _cold_start(database_url, count)
+                per_worker = ", ".join(f"{a}+{b}" for a, b in timings) or "-"
+                print(f"{count} worker(s), {label:<15} first /health {seconds * 1000:6.0f} ms   import+startup ms: {per_worker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+响应压缩的微基准：各编码在不同响应体大小下的压缩耗时和压缩率，
+用于调整 COMPRESSION_MIN_SIZE 和 COMPRESSION_OFFLOAD_SIZE。
+
+压缩耗时超过约 1ms 的响应体应当放到线程池中压缩，避免阻塞事件循环。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_compression.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression  # noqa: E402
+
+SIZES = (512, 1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024)
+
+
+def _note_body(size: int) -> bytes:
+    # 形如单篇笔记的 JSON 响应，正文是重复度中等的 Markdown
+    paragraph = "## 标题\n\n这是一段 Markdown 正文，包含 `code`、[链接](https://example.com) 和列表：\n- 条目\n"
+    content = ""
+    i = 0
+    while len(content.encode()) < size:
+        content += f"{paragraph}{i}\n"
+        i += 1
+    return json.dumps({"id": 1, "title": "笔记", "content": content}, ensure_ascii=False).encode()[:size]
+
+
+def _best(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"encodings: {', '.join(compression.ENCODERS)}")
+    print(f"COMPRESSION_MIN_SIZE={compression.COMPRESSION_MIN_SIZE} COMPRESSION_OFFLOAD_SIZE={compression.COMPRESSION_OFFLOAD_SIZE}")
+    for size in SIZES:
+        body = _note_body(size)
+        cells = []
+        for encoding in compression.ENCODERS:
+            compressed = compression.compress(body, encoding)
+            elapsed = _best(lambda: compression.compress(body, encoding))
+            cells.append(f"{encoding} {elapsed * 1e3:7.3f} ms {len(compressed) / len(body):5.1%}")
+        print(f"{size:>8} B   " + "   ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
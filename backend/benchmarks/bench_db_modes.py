@@ -0,0 +1,126 @@
+"""
+对比同步（DB_ASYNC=0）与异步（DB_ASYNC=1）数据库模式下的吞吐和延迟。
+
+每种模式各启动一个 uvicorn 进程，使用独立的临时 SQLite 数据库，写入测试数据后
+以固定并发压测笔记列表和单条笔记读取接口，输出 requests/sec 与 p50/p99 延迟。
+
+用法（在 backend 目录下执行，需要额外安装 httpx）：
+    python benchmarks/bench_db_modes.py --concurrency 64 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(port: int, db_path: str, async_db: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        DB_ASYNC="1" if async_db else "0",
+        BCRYPT_ROUNDS="4",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+async def _seed(client: httpx.AsyncClient, notes: int) -> list:
+    user = {"username": "bench", "email": "bench@example.com", "password": "bench123"}
+    await client.post("/api/users/", json=user)
+    resp = await client.post("/api/users/login", json={"username": user["username"], "password": user["password"]})
+    client.headers["Authorization"] = f"Bearer {resp.json()['access_token']}"
+    note_ids = []
+    for i in range(notes):
+        resp = await client.post("/api/notes/", json={"title": f"note {i}", "content": "正文内容 " * 200})
+        note_ids.append(resp.json()["id"])
+    return note_ids
+
+
+async def _load(client: httpx.AsyncClient, note_ids: list, concurrency: int, duration: float) -> list:
+    latencies = []
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            if random.random() < 0.5:
+                url = "/api/notes/?limit=50"
+            else:
+                url = f"/api/notes/{random.choice(note_ids)}"
+            start = time.perf_counter()
+            resp = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def _run_mode(async_db: bool, args) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(port, os.path.join(tmp, "bench.db"), async_db)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+                await _wait_ready(client)
+                note_ids = await _seed(client, args.notes)
+                latencies = await _load(client, note_ids, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    return {
+        "mode": "async" if async_db else "sync",
+        "requests": len(latencies),
+        "rps": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="每种模式的压测时长（秒）")
+    parser.add_argument("--notes", type=int, default=200, help="预先写入的笔记数量")
+    args = parser.parse_args()
+
+    results = [asyncio.run(_run_mode(async_db, args)) for async_db in (False, True)]
+    print(f"{'mode':<8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['requests']:>10}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+轮询与变更推送的对比
+
+在临时数据库上启动服务（serve.py），一个用户打开若干个客户端（标签页/设备），
+另一个连接每隔一段时间保存一次笔记，比较：
+- 轮询：每个客户端每 POLL_INTERVAL 秒调用一次 GET /api/sync?since=...
+- 推送：每个客户端保持一个 GET /api/events 连接
+两者在同一段时间内的请求数、下载字节数，以及保存后客户端得知改动的延迟。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_events.py [客户端数，默认 20] [保存次数，默认 20] [worker 数，默认 1]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POLL_INTERVAL = 2.0
+SAVE_INTERVAL = 0.5
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+async def _saver(client, headers, note_id: int, saves: int, saved_at: dict) -> None:
+    for i in range(saves):
+        await asyncio.sleep(SAVE_INTERVAL)
+        start = time.perf_counter()
+        await client.put(f"/api/notes/{note_id}", json={"title": f"保存 {i}"}, headers=headers)
+        saved_at[i] = start
+    await asyncio.sleep(POLL_INTERVAL + 0.5)
+
+
+async def _poller(client, headers, since: int, stop: asyncio.Event, seen: list, stats: dict) -> None:
+    while not stop.is_set():
+        response = await client.get("/api/sync", params={"since": since}, headers=headers)
+        stats["requests"] += 1
+        stats["bytes"] += len(response.content)
+        page = response.json()
+        now = time.perf_counter()
+        seen.extend((note["change_seq"], now) for note in page["notes"])
+        since = page["change_seq"]
+        try:
+            await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _listener(base: str, token: str, stop: asyncio.Event, seen: list, stats: dict, ready: asyncio.Event) -> None:
+    async with httpx.AsyncClient(base_url=base, timeout=None) as client:
+        async with client.stream("GET", "/api/events", params={"access_token": token}) as response:
+            stats["requests"] += 1
+            ready.set()
+            async for line in response.aiter_lines():
+                stats["bytes"] += len(line) + 1
+                if line.startswith("id: "):
+                    seen.append((int(line[4:]), time.perf_counter()))
+                if stop.is_set():
+                    return
+
+
+def _latencies(seq_saved_at: dict, seen: list) -> list:
+    return [at - seq_saved_at[seq] for seq, at in seen if seq in seq_saved_at]
+
+
+async def _run(base: str, clients: int, saves: int) -> None:
+    async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+        await client.post("/api/users/", json={"username": "bench", "email": "bench@example.com", "password": "bench123"})
+        token = (await client.post("/api/users/login", json={"username": "bench", "password": "bench123"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        note_id = (await client.post("/api/notes/", json={"title": "基准", "content": "正文"}, headers=headers)).json()["id"]
+
+        for mode in ("poll", "push"):
+            since = (await client.get("/api/sync", headers=headers)).json()["change_seq"]
+            stop = asyncio.Event()
+            seen, stats, saved_at = [], {"requests": 0, "bytes": 0}, {}
+            if mode == "poll":
+                tasks = [asyncio.create_task(_poller(client, headers, since, stop, seen, stats)) for _ in range(clients)]
+            else:
+                readies = [asyncio.Event() for _ in range(clients)]
+                tasks = [asyncio.create_task(_listener(base, token, stop, seen, stats, ready)) for ready in readies]
+                await asyncio.gather(*(ready.wait() for ready in readies))
+            start = time.perf_counter()
+            await _saver(client, headers, note_id, saves, saved_at)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            # 推送连接在下一次心跳或事件时才会结束，这里直接取消
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # 每次保存的 change_seq 依次递增
+            seq_saved_at = {since + 1 + i: at for i, at in saved_at.items()}
+            latencies = _latencies(seq_saved_at, seen)
+            print(
+                f"{mode}: {stats['requests']:>5} requests {stats['bytes'] / 1024:8.1f} KB in {elapsed:5.1f} s"
+                f"   latency p50 {_percentile(latencies, 0.5) * 1e3:7.1f} ms"
+                f" p95 {_percentile(latencies, 0.95) * 1e3:7.1f} ms ({len(latencies)} deliveries)"
+            )
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    saves = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = sys.argv[3] if len(sys.argv) > 3 else "1"
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'events.db')}",
+            "BCRYPT_ROUNDS": "4",
+            "HOST": "127.0.0.1",
+            "PORT": str(port),
+            "WEB_CONCURRENCY": workers,
+            "CHANGE_FEED_MAX_SUBSCRIBERS": str(clients),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "serve.py"], cwd=BACKEND, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        base = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(300):
+                try:
+                    if httpx.get(f"{base}/ready").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.1)
+            asyncio.run(_run(base, clients, saves))
+        finally:
+            server.terminate()
+            server.wait(30)
+
+
+if __name__ == "__main__":
+    main()
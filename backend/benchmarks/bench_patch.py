@@ -0,0 +1,85 @@
+"""
+整篇 PUT 与增量 PATCH 保存笔记的对比
+
+在临时数据库上创建不同大小的笔记，模拟编辑器自动保存（每次改动一处），
+分别用 PUT（上传整篇正文，响应也包含整篇正文）和 PATCH（只上传改动）保存，
+比较每次保存的上传/下载字节数和耗时。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_patch.py [每种大小的保存次数，默认 50]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIZES_KB = (4, 64, 512, 2048)
+
+
+def _content(size: int) -> str:
+    paragraph = "这是一段 Markdown 正文，包含 `code`、[链接](https://example.com) 和列表。\n"
+    return paragraph * (size // len(paragraph.encode()) + 1)
+
+
+def _median(values: list) -> float:
+    return sorted(values)[len(values) // 2]
+
+
+def main() -> None:
+    saves = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'patch.db')}"
+        os.environ["BCRYPT_ROUNDS"] = "4"
+
+        from fastapi.testclient import TestClient
+
+        import main as app_main
+
+        with TestClient(app_main.app) as client:
+            client.post("/api/users/", json={"username": "bench", "email": "bench@example.com", "password": "bench123"})
+            token = client.post("/api/users/login", json={"username": "bench", "password": "bench123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            for size_kb in SIZES_KB:
+                content = _content(size_kb * 1024)
+                note_id = client.post("/api/notes/", json={"title": "基准", "content": content}, headers=headers).json()["id"]
+                results = {}
+                for method in ("PUT", "PATCH"):
+                    etag = client.get(f"/api/notes/{note_id}", headers=headers).headers["etag"]
+                    sent, received, elapsed = [], [], []
+                    for i in range(saves):
+                        # 在正文中间插入几个字
+                        position = len(content) // 2
+                        content = content[:position] + f"改{i}" + content[position:]
+                        if method == "PUT":
+                            body = json.dumps({"content": content}, ensure_ascii=False).encode()
+                        else:
+                            # 正文是 BMP 字符，UTF-16 位置与 Python 下标相同
+                            body = json.dumps({
+                                "base_etag": etag,
+                                "ops": [{"start": position, "end": position, "text": f"改{i}"}]
+                            }, ensure_ascii=False).encode()
+                        start = time.perf_counter()
+                        response = client.request(
+                            method, f"/api/notes/{note_id}", content=body,
+                            headers={**headers, "Content-Type": "application/json"}
+                        )
+                        elapsed.append(time.perf_counter() - start)
+                        assert response.status_code == 200, response.text
+                        etag = response.headers.get("etag", etag)
+                        sent.append(len(body))
+                        received.append(len(response.content))
+                    results[method] = (_median(sent), _median(received), _median(elapsed))
+
+                cells = [
+                    f"{method} up {up / 1024:8.1f} KB down {down / 1024:8.1f} KB {seconds * 1e3:7.2f} ms"
+                    for method, (up, down, seconds) in results.items()
+                ]
+                print(f"{size_kb:>5} KB note   " + "   ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+笔记检索索引的建立、增量更新与检索耗时
+
+在临时数据库上创建一个笔记本，然后：
+- 第一次检索时建立索引（切分 + 嵌入 + 写入内存映射文件）的耗时
+- 改动少量笔记后增量更新的耗时
+- 全量扫描（矩阵乘法）与 IVF 的单条/批量检索耗时，以及 IVF 相对全量扫描的 top-k 召回率
+- POST /api/assistant/retrieve 的端到端耗时
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_retrieval.py [笔记数，默认 5000] [每次改动的笔记数，默认 10]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 每篇笔记属于一个主题：大部分词来自主题词表，少量来自公共词表
+TOPICS = 40
+TOPIC_WORDS = 30
+COMMON = "的 了 和 是 在 也 就 都 而 及 与 或 但 如果 因为 所以 这个 那个 一个 可以".split()
+QUERY_COUNT = 8
+TOP_K = 10
+REPEAT = 50
+
+
+def _vocabulary(rng: random.Random) -> list:
+    # 随机生成的词，不同主题之间有少量重叠
+    return [
+        [f"t{rng.randrange(TOPICS * TOPIC_WORDS // 2)}w" for _ in range(TOPIC_WORDS)]
+        for _ in range(TOPICS)
+    ]
+
+
+def _content(rng: random.Random, vocabulary: list) -> str:
+    words = rng.choice(vocabulary)
+    paragraphs = [
+        " ".join(rng.choice(words) if rng.random() < 0.7 else rng.choice(COMMON) for _ in range(rng.randint(20, 80)))
+        for _ in range(rng.randint(1, 6))
+    ]
+    return "\n\n".join(paragraphs)
+
+
+def _median_ms(fn, repeat: int = REPEAT) -> float:
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed.append(time.perf_counter() - start)
+    return sorted(elapsed)[len(elapsed) // 2] * 1e3
+
+
+def main() -> None:
+    note_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'retrieval.db')}"
+        os.environ["BCRYPT_ROUNDS"] = "4"
+
+        from fastapi.testclient import TestClient
+
+        import main as app_main
+        import crud
+        from database import SessionLocal
+        from retrieval import IndexManager, store as store_module
+
+        rng = random.Random(0)
+        vocabulary = _vocabulary(rng)
+        queries = [" ".join(rng.sample(rng.choice(vocabulary), 3)) for _ in range(QUERY_COUNT)]
+        with TestClient(app_main.app) as client:
+            client.post("/api/users/", json={"username": "bench", "email": "bench@example.com", "password": "bench123"})
+            token = client.post("/api/users/login", json={"username": "bench", "password": "bench123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for start in range(0, note_count, 1000):
+                client.post("/api/notes/batch", json={"operations": [
+                    {"op": "create", "note": {"title": f"笔记 {i}", "content": _content(rng, vocabulary)}}
+                    for i in range(start, min(start + 1000, note_count))
+                ]}, headers=headers)
+            owner_id = client.get("/api/users/me", headers=headers).json()["id"]
+
+            def change_seq() -> int:
+                with SessionLocal() as db:
+                    return crud.get_change_seq(db, owner_id)
+
+            # 全量扫描与 IVF 各用一份索引
+            flat = IndexManager(index_dir=os.path.join(tmp, "flat"), ivf_min_rows=10 ** 9)
+            start = time.perf_counter()
+            store = flat.refresh(owner_id)
+            build_seconds = time.perf_counter() - start
+            # 文件按容量预留（稀疏文件），统计实际占用的块
+            size = sum(os.stat(os.path.join(store.path, name)).st_blocks * 512 for name in os.listdir(store.path))
+            print(
+                f"{note_count} notes -> {store.live_rows} chunks, build {build_seconds * 1e3:.0f} ms, "
+                f"{size / 1024 / 1024:.1f} MB on disk ({store.dim}-dim float32)"
+            )
+
+            ivf = IndexManager(index_dir=os.path.join(tmp, "ivf"), ivf_min_rows=0)
+            start = time.perf_counter()
+            ivf_store = ivf.refresh(owner_id)
+            print(f"IVF build {(time.perf_counter() - start) * 1e3:.0f} ms, {len(ivf_store._centroids)} lists, nprobe {store_module.IVF_NPROBE}")
+
+            note_ids = [item["id"] for item in client.get("/api/notes/", params={"limit": 200}, headers=headers).json()["items"]]
+            client.post("/api/notes/batch", json={"operations": [
+                {"op": "update", "id": note_id, "note": {"content": _content(rng, vocabulary)}} for note_id in rng.sample(note_ids, edits)
+            ]}, headers=headers)
+            start = time.perf_counter()
+            flat.refresh(owner_id)
+            print(f"incremental update after editing {edits} notes: {(time.perf_counter() - start) * 1e3:.1f} ms")
+            ivf.refresh(owner_id)
+
+            seq = change_seq()
+            for name, manager in (("flat", flat), ("IVF ", ivf)):
+                single = _median_ms(lambda: manager.search(owner_id, seq, queries[:1], TOP_K))
+                batch = _median_ms(lambda: manager.search(owner_id, seq, queries, TOP_K))
+                print(f"{name} search: 1 query {single:6.2f} ms, {len(queries)} queries {batch:6.2f} ms")
+
+            flat_hits = flat.search(owner_id, seq, queries, TOP_K)
+            ivf_hits = ivf.search(owner_id, seq, queries, TOP_K)
+            recall = sum(
+                len({hit[:3] for hit in exact} & {hit[:3] for hit in approximate}) / max(1, len(exact))
+                for exact, approximate in zip(flat_hits, ivf_hits)
+            ) / len(queries)
+            print(f"IVF recall@{TOP_K} vs flat: {recall:.2f}")
+
+            client.post("/api/assistant/retrieve", json={"query": queries[0]}, headers=headers)
+            endpoint = _median_ms(lambda: client.post(
+                "/api/assistant/retrieve", json={"query": queries[0], "top_k": 5}, headers=headers
+            ))
+            print(f"POST /api/assistant/retrieve: {endpoint:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
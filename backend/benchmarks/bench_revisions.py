@@ -0,0 +1,88 @@
+"""
+历史版本的存储开销和还原耗时
+
+在临时数据库上模拟一篇 Markdown 笔记的多次保存（每次改动一两处），统计：
+- 每次保存写入 note_revisions 的字节数（相对整篇正文的比例，即写放大）
+- update_note 的耗时（带历史版本记录）
+- 还原最新/最旧/快照之间最远的版本的耗时，应与版本总数无关
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_revisions.py [正文 KB，默认 32] [保存次数，默认 500]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _paragraphs(size: int) -> list:
+    paragraph = "这是一段 Markdown 正文，包含 `code`、[链接](https://example.com) 和列表。"
+    lines, total, i = [], 0, 0
+    while total < size:
+        line = f"{i}. {paragraph}\n" if i % 5 else f"\n## 小节 {i}\n\n"
+        lines.append(line)
+        total += len(line.encode())
+        i += 1
+    return lines
+
+
+def main() -> None:
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    saves = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'revisions.db')}"
+
+        from sqlalchemy import func
+
+        import crud
+        import models
+        import schemas
+        from crud import revision
+        from database import SessionLocal, create_tables
+
+        create_tables()
+        # 模拟每次保存间隔都超过合并窗口，每次都留下一个版本
+        revision.REVISION_COALESCE_SECONDS = -1
+        random.seed(0)
+        db = SessionLocal()
+        owner = models.User(username="bench", email="bench@example.com", hashed_password="-")
+        db.add(owner)
+        db.commit()
+        lines = _paragraphs(size_kb * 1024)
+        note = crud.create_note(db, schemas.NoteCreate(title="基准", content="".join(lines)), owner.id)
+
+        elapsed = []
+        for i in range(saves):
+            for _ in range(random.randint(1, 2)):
+                position = random.randrange(len(lines))
+                lines[position] = lines[position].rstrip("\n") + f" 修改{i}\n"
+            start = time.perf_counter()
+            crud.update_note(db, note.id, owner.id, schemas.NoteUpdate(content="".join(lines)))
+            elapsed.append(time.perf_counter() - start)
+
+        content_bytes = len("".join(lines).encode())
+        count, stored, keyframes = db.query(
+            func.count(models.NoteRevision.id),
+            func.sum(func.length(models.NoteRevision.data)),
+            func.count(models.NoteRevision.id).filter(models.NoteRevision.kind == revision.REVISION_FULL)
+        ).filter(models.NoteRevision.note_id == note.id).one()
+        elapsed.sort()
+        print(f"content {content_bytes / 1024:.0f} KB, {saves} saves -> {count} revisions ({keyframes} keyframes)")
+        print(f"stored {stored / 1024:.1f} KB, {stored / count:.0f} B per revision ({stored / count / content_bytes:.2%} of content)")
+        print(f"update_note p50 {elapsed[len(elapsed) // 2] * 1e3:.2f} ms, p99 {elapsed[int(len(elapsed) * 0.99)] * 1e3:.2f} ms")
+
+        seqs = [row.seq for row in crud.get_revisions(db, note.id, owner.id)]
+        deepest = max(seqs, key=lambda seq: (seq % revision.REVISION_KEYFRAME_INTERVAL, -seq))
+        for label, seq in (("newest", seqs[0]), ("oldest", seqs[-1]), ("deepest", deepest)):
+            start = time.perf_counter()
+            for _ in range(20):
+                crud.get_revision(db, note.id, owner.id, seq)
+            print(f"reconstruct {label:<7} (seq {seq:>4}) {(time.perf_counter() - start) / 20 * 1e3:.2f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+列表接口序列化开销的微基准：默认路径（response_model 逐行校验 + Pydantic 序列化）
+对比 FAST_JSON 路径（只选列的行直接用 orjson 编码）。
+
+在临时数据库中写入 N 个文件夹和 N 篇笔记，分别测量每行的序列化耗时（不含查询），
+并检查两条路径输出的 JSON 内容一致。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_serialization.py [行数，默认 5000]
+"""
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import crud  # noqa: E402
+import fast_json  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+from database import Base  # noqa: E402
+from database.migrations import upgrade  # noqa: E402
+
+
+def _seed(db, rows: int) -> int:
+    user = models.User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    now = datetime.utcnow()
+    db.execute(insert(models.Folder), [
+        {"name": f"folder {i}", "description": "描述" * 5, "owner_id": user.id, "path": f"/{i + 1}/",
+         "note_count": i % 17, "total_content_bytes": i * 31, "last_note_updated_at": now,
+         "created_at": now - timedelta(seconds=i), "updated_at": now}
+        for i in range(rows)
+    ])
+    db.execute(insert(models.Note), [
+        {"title": f"笔记 {i}", "content": "Markdown 正文 " * 40, "owner_id": user.id, "folder_id": i % 50 + 1,
+         "created_at": now - timedelta(seconds=i), "updated_at": now - timedelta(seconds=i)}
+        for i in range(rows)
+    ])
+    db.commit()
+    return user.id
+
+
+def _best(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def _report(name: str, rows: int, default_fn, fast_fn) -> None:
+    default_out, fast_out = default_fn(), fast_fn()
+    assert json.loads(default_out) == json.loads(fast_out), f"{name}: outputs differ"
+    default_time, fast_time = _best(default_fn), _best(fast_fn)
+    print(
+        f"{name:<28} default {default_time / rows * 1e6:6.2f} us/row   "
+        f"fast {fast_time / rows * 1e6:6.2f} us/row   x{default_time / fast_time:.1f}"
+    )
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        upgrade(engine)
+        db = sessionmaker(bind=engine)()
+        owner_id = _seed(db, rows)
+
+        # FastAPI 对 response_model 的处理：validate_python + dump_json
+        folder_list = TypeAdapter(List[schemas.FolderRead])
+        note_page = TypeAdapter(schemas.NotePage)
+
+        orm_folders = db.query(models.Folder).filter(models.Folder.owner_id == owner_id).all()
+        folder_rows = crud.get_folders_by_owner(db, owner_id)
+        summaries, _ = crud.get_note_summaries(db, owner_id, limit=rows)
+        page = {"items": summaries, "next_cursor": None}
+
+        print(f"{rows} rows, orjson {orjson.__version__}")
+        _report(
+            "folders (ORM objects)", rows,
+            lambda: folder_list.dump_json(folder_list.validate_python(orm_folders, from_attributes=True)),
+            lambda: fast_json.dumps(folder_rows),
+        )
+        _report(
+            "folders (column rows)", rows,
+            lambda: folder_list.dump_json(folder_list.validate_python(folder_rows, from_attributes=True)),
+            lambda: fast_json.dumps(folder_rows),
+        )
+        _report(
+            "note summaries page", rows,
+            lambda: note_page.dump_json(note_page.validate_python(page, from_attributes=True)),
+            lambda: fast_json.dumps(page),
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
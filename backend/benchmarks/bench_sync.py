@@ -0,0 +1,108 @@
+"""
+全量重新加载与增量同步的传输量对比
+
+在临时数据库上创建一个笔记本（若干文件夹和笔记），然后模拟客户端两次打开之间的
+少量改动（修改、移动、删除几篇笔记），比较：
+- 全量重新加载：GET /api/folders/ + 翻完 GET /api/notes/ 的所有页（只有摘要）
+- 增量同步：GET /api/sync?since=<上次的 change_seq>（包含改动笔记的完整正文）
+两者的响应字节数和耗时。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_sync.py [笔记数，默认 2000] [每次改动的笔记数，默认 5]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FOLDERS = 20
+CONTENT = "这是一段 Markdown 正文，包含 `code`、[链接](https://example.com) 和列表。\n" * 40
+
+
+def _full_reload(client, headers) -> tuple:
+    """返回 (响应字节数, 请求数)"""
+    size = len(client.get("/api/folders/", headers=headers).content)
+    requests, cursor = 1, None
+    while True:
+        params = {"limit": 200, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/notes/", params=params, headers=headers)
+        size += len(response.content)
+        requests += 1
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            return size, requests
+
+
+def _sync(client, headers, since: int) -> tuple:
+    """返回 (响应字节数, 请求数, 新的 since)"""
+    size, requests, cursor = 0, 0, None
+    while True:
+        params = {"cursor": cursor} if cursor else {"since": since}
+        response = client.get("/api/sync", params=params, headers=headers)
+        size += len(response.content)
+        requests += 1
+        page = response.json()
+        if not page["has_more"]:
+            return size, requests, page["change_seq"]
+        cursor = page["next_cursor"]
+
+
+def main() -> None:
+    note_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'sync.db')}"
+        os.environ["BCRYPT_ROUNDS"] = "4"
+
+        from fastapi.testclient import TestClient
+
+        import main as app_main
+
+        random.seed(0)
+        with TestClient(app_main.app) as client:
+            client.post("/api/users/", json={"username": "bench", "email": "bench@example.com", "password": "bench123"})
+            token = client.post("/api/users/login", json={"username": "bench", "password": "bench123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            folder_ids = [
+                client.post("/api/folders/", json={"name": f"文件夹 {i}"}, headers=headers).json()["id"]
+                for i in range(FOLDERS)
+            ]
+            for start in range(0, note_count, 1000):
+                client.post("/api/notes/batch", json={"operations": [
+                    {"op": "create", "note": {"title": f"笔记 {i}", "content": CONTENT, "folder_id": random.choice(folder_ids)}}
+                    for i in range(start, min(start + 1000, note_count))
+                ]}, headers=headers)
+
+            start = time.perf_counter()
+            size, requests, since = _sync(client, headers, 0)
+            print(f"initial full sync     {size / 1024:9.1f} KB in {requests:>3} requests {(time.perf_counter() - start) * 1e3:8.1f} ms")
+
+            note_ids = [item["id"] for item in client.get("/api/notes/", params={"limit": 200}, headers=headers).json()["items"]]
+            for round_ in range(3):
+                changed = random.sample(note_ids, edits * 3)
+                note_ids = [note_id for note_id in note_ids if note_id not in changed[2 * edits:]]
+                client.post("/api/notes/batch", json={"operations": [
+                    {"op": "update", "id": note_id, "note": {"title": f"改动 {round_}"}} for note_id in changed[:edits]
+                ] + [
+                    {"op": "move", "id": note_id, "folder_id": random.choice(folder_ids)} for note_id in changed[edits:2 * edits]
+                ] + [
+                    {"op": "delete", "id": note_id} for note_id in changed[2 * edits:]
+                ]}, headers=headers)
+
+                start = time.perf_counter()
+                full_size, full_requests = _full_reload(client, headers)
+                full_ms = (time.perf_counter() - start) * 1e3
+                start = time.perf_counter()
+                delta_size, delta_requests, since = _sync(client, headers, since)
+                delta_ms = (time.perf_counter() - start) * 1e3
+                print(
+                    f"round {round_}: full reload {full_size / 1024:9.1f} KB in {full_requests:>3} requests {full_ms:8.1f} ms"
+                    f"   delta sync {delta_size / 1024:7.1f} KB in {delta_requests} request(s) {delta_ms:6.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
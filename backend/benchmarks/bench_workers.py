@@ -0,0 +1,129 @@
+"""
+多 worker 吞吐量和平滑重载
+
+用 serve.py 分别以 1 个和 N 个 worker 启动，在临时数据库上以多个并发客户端请求
+GET /api/notes/{id} 和 GET /api/notes/，比较每秒请求数（CPU 数足够时应接近线性增长）。
+最后在压测过程中向主进程发送 SIGHUP，统计重载期间失败的请求数（应为 0）。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/bench_workers.py [worker 数，默认为可用 CPU 数] [每轮秒数，默认 5]
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from serve import available_cpus  # noqa: E402
+
+CLIENTS = 32
+STARTUP_TIMEOUT = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen) -> None:
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=0.5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError("server did not become ready")
+
+
+def _seed(base_url: str) -> tuple:
+    """注册用户并创建一些笔记，返回 (认证头, 笔记 id 列表)"""
+    with httpx.Client(base_url=base_url) as client:
+        client.post("/api/users/", json={"username": "bench", "email": "bench@example.com", "password": "bench123"})
+        token = client.post("/api/users/login", json={"username": "bench", "password": "bench123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        note_ids = [
+            client.post("/api/notes/", json={"title": f"笔记 {i}", "content": "正文 " * 200}, headers=headers).json()["id"]
+            for i in range(20)
+        ]
+    return headers, note_ids
+
+
+def _load(base_url: str, headers: dict, note_ids: list, seconds: float, on_halfway=None) -> tuple:
+    """CLIENTS 个线程并发请求 seconds 秒，返回 (成功数, 失败数)"""
+    ok, failed = [0] * CLIENTS, [0] * CLIENTS
+    stop_at = time.perf_counter() + seconds
+
+    def client_loop(index: int) -> None:
+        with httpx.Client(base_url=base_url, headers=headers, timeout=30) as client:
+            i = index
+            while time.perf_counter() < stop_at:
+                path = f"/api/notes/{note_ids[i % len(note_ids)]}" if i % 4 else "/api/notes/?limit=20"
+                i += 1
+                try:
+                    if client.get(path).status_code == 200:
+                        ok[index] += 1
+                        continue
+                except httpx.HTTPError:
+                    pass
+                failed[index] += 1
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    if on_halfway is not None:
+        time.sleep(seconds / 2)
+        on_halfway()
+    for thread in threads:
+        thread.join()
+    return sum(ok), sum(failed)
+
+
+def _run(database_url: str, workers: int, seconds: float, reload: bool = False) -> None:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ, "DATABASE_URL": database_url, "PORT": str(port), "HOST": "127.0.0.1",
+        "WEB_CONCURRENCY": str(workers), "BCRYPT_ROUNDS": "4",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "serve.py"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(base_url, process)
+        headers, note_ids = _seed(base_url)
+        _load(base_url, headers, note_ids, 1)  # 预热
+        on_halfway = (lambda: process.send_signal(signal.SIGHUP)) if reload else None
+        ok, failed = _load(base_url, headers, note_ids, seconds, on_halfway)
+        label = f"{workers} worker(s)" + (", SIGHUP reload" if reload else "")
+        print(f"{label:<28} {ok / seconds:8.0f} req/s   failed {failed}")
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else available_cpus()
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"available CPUs: {available_cpus()}, clients: {CLIENTS}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sorted({1, workers}):
+            _run(f"sqlite:///{os.path.join(tmp, f'workers-{count}.db')}", count, seconds)
+        _run(f"sqlite:///{os.path.join(tmp, 'reload.db')}", workers, max(seconds, 8), reload=True)
+
+
+if __name__ == "__main__":
+    main()
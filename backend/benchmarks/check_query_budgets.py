@@ -0,0 +1,124 @@
+"""
+检查每个路由的 SQL 条数是否在 diagnostics.QUERY_BUDGETS 的预算之内。
+
+在临时数据库上以诊断模式（DIAGNOSTICS=1）启动应用，用 TestClient 按前端的使用方式
+调用一遍接口，列出每个路由的查询条数和预算。有路由超出预算时以非零状态退出，
+可以放进 CI，在查询条数回退（如引入 N+1）时及时发现。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/check_query_budgets.py [--async | --sync]
+"""
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _BudgetCollector(logging.Handler):
+    """收集诊断中间件每个请求的摘要日志：(路由, 查询条数, 预算)"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.results = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno == logging.INFO and record.msg.startswith("%s: %d queries"):
+            label, count, _, budget = record.args
+            previous = self.results.get(label, (0, budget))[0]
+            self.results[label] = (max(previous, count), budget)
+
+
+def _exercise_api(client) -> None:
+    """按前端的使用方式调用一遍接口"""
+    client.post("/api/users/", json={"username": "budget", "email": "budget@example.com", "password": "budget123"})
+    token = client.post("/api/users/login", json={"username": "budget", "password": "budget123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/api/users/me", headers=headers)
+
+    folder_id = client.post("/api/folders/", json={"name": "预算"}, headers=headers).json()["id"]
+    child_id = client.post("/api/folders/", json={"name": "子目录", "parent_id": folder_id}, headers=headers).json()["id"]
+    client.put(f"/api/folders/{child_id}", json={"name": "子目录 2"}, headers=headers)
+    client.get("/api/folders/", headers=headers)
+    client.get("/api/folders/tree", headers=headers)
+    client.get(f"/api/folders/{folder_id}", headers=headers)
+
+    note_ids = [
+        client.post("/api/notes/", json={"title": f"笔记 {i}", "content": "查询预算", "folder_id": folder_id}, headers=headers).json()["id"]
+        for i in range(5)
+    ]
+    client.get("/api/notes/", headers=headers)
+    client.get("/api/notes/?limit=2", headers=headers)
+    client.get(f"/api/notes/folder/{folder_id}", headers=headers)
+    client.get("/api/notes/search", params={"q": "预算"}, headers=headers)
+    response = client.get(f"/api/notes/{note_ids[0]}", headers=headers)
+    client.get(f"/api/notes/{note_ids[0]}", headers={**headers, "If-None-Match": response.headers["etag"]})
+    client.put(f"/api/notes/{note_ids[0]}", json={"title": "改名", "folder_id": child_id}, headers=headers)
+    client.put(f"/api/notes/{note_ids[0]}", json={"content": "查询预算 2"}, headers=headers)
+    etag = client.get(f"/api/notes/{note_ids[0]}", headers=headers).headers["etag"]
+    client.patch(f"/api/notes/{note_ids[0]}", json={"base_etag": etag, "ops": [{"start": 0, "end": 0, "text": "增量"}]}, headers=headers)
+    client.get(f"/api/notes/{note_ids[0]}/revisions", headers=headers)
+    client.get(f"/api/notes/{note_ids[0]}/revisions/1", headers=headers)
+    client.post(f"/api/notes/{note_ids[0]}/revisions/1/restore", headers=headers)
+    # 附件：第二个与第一个内容相同（去重），删除的笔记带着附件
+    files = {"file": ("预算.txt", b"attachment budget", "text/plain")}
+    attachment = client.post(f"/api/attachments/?note_id={note_ids[0]}", files=files, headers=headers).json()
+    client.post(f"/api/attachments/?note_id={note_ids[1]}", files=files, headers=headers)
+    client.get(f"/api/attachments/?note_id={note_ids[0]}", headers=headers)
+    client.get(attachment["url"], headers={**headers, "Range": "bytes=0-9"})
+    client.get(attachment["url"], headers={**headers, "If-None-Match": f'"{attachment["sha256"]}"'})
+    client.delete(attachment["url"], headers=headers)
+    client.delete(f"/api/notes/{note_ids[1]}", headers=headers)
+    client.post("/api/notes/batch", json={"operations": [
+        {"op": "create", "note": {"title": "批量", "folder_id": folder_id}},
+        {"op": "update", "id": note_ids[2], "note": {"title": "批量 2"}},
+        {"op": "move", "id": note_ids[3], "folder_id": None},
+        {"op": "delete", "id": note_ids[4]},
+    ]}, headers=headers)
+    client.get("/api/stats", headers=headers)
+    client.get("/api/export", headers=headers)
+    since = client.get("/api/sync", headers=headers).json()["change_seq"]
+    client.delete(f"/api/folders/{folder_id}", headers=headers)
+    client.get("/api/sync", params={"since": since}, headers=headers)
+    # 第一次检索建立索引，改动笔记后再检索走增量更新
+    client.post("/api/assistant/retrieve", json={"query": "查询预算"}, headers=headers)
+    client.put(f"/api/notes/{note_ids[2]}", json={"content": "检索预算"}, headers=headers)
+    client.post("/api/assistant/retrieve", json={"query": "检索预算"}, headers=headers)
+    # 对话的查询都在开始生成之前（检索上下文）；没有模型服务时事件流里只有 error，不影响统计
+    client.post("/api/assistant/chat", json={"messages": [{"role": "user", "content": "检索预算"}]}, headers=headers)
+    client.get("/health")
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'budget.db')}"
+        os.environ["DIAGNOSTICS"] = "1"
+        os.environ["QUERY_BUDGET_STRICT"] = "0"
+        if "--sync" in sys.argv:
+            os.environ["DB_ASYNC"] = "0"
+        elif "--async" in sys.argv:
+            os.environ["DB_ASYNC"] = "1"
+
+        from fastapi.testclient import TestClient
+
+        import diagnostics
+        import main as app_main
+
+        collector = _BudgetCollector()
+        logging.getLogger(diagnostics.__name__).addHandler(collector)
+        with TestClient(app_main.app) as client:
+            _exercise_api(client)
+
+    over = 0
+    for label, (count, budget) in sorted(collector.results.items()):
+        status = "ok" if count <= budget else "OVER"
+        over += count > budget
+        marker = "" if label in diagnostics.QUERY_BUDGETS else "  (default budget)"
+        print(f"{status:<4} {count:>3} / {budget:<3} {label}{marker}")
+    print(f"checked {len(collector.results)} routes, {over} over budget")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+检查 CRUD 层的每条 SQL 是否都走索引。
+
+在临时数据库上建表、执行迁移并写入少量数据，然后依次调用 CRUD 函数，记录它们
+发出的所有语句，对每条语句执行 EXPLAIN QUERY PLAN。出现对普通表的全表扫描
+（SCAN <table>）时列出该语句并以非零状态退出，可以放进 CI 防止索引回退。
+
+用法（在 backend 目录下执行）：
+    python benchmarks/check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import crud  # noqa: E402
+import schemas  # noqa: E402
+from database import Base  # noqa: E402
+from database.migrations import upgrade  # noqa: E402
+from database.search import create_search_index  # noqa: E402
+from database.sqlite_profile import configure_sqlite_engine  # noqa: E402
+
+
+def _exercise_crud(db) -> None:
+    """按路由的使用方式调用一遍 CRUD 函数"""
+    user = crud.create_user(db, schemas.UserCreate(username="planner", email="planner@example.com", password="plan123"), hashed_password="x")
+    crud.get_user_by_email(db, email=user.email)
+    crud.get_user_by_username(db, username=user.username)
+    crud.get_user_by_id(db, user.id)
+
+    folder = crud.create_folder(db, schemas.FolderCreate(name="plans"), owner_id=user.id)
+    crud.get_folder_by_id(db, folder.id, user.id)
+    crud.get_folders_by_owner(db, user.id)
+    crud.update_folder(db, folder.id, user.id, schemas.FolderUpdate(name="plans 2"))
+    child = crud.create_folder(db, schemas.FolderCreate(name="child", parent_id=folder.id), owner_id=user.id)
+    other = crud.create_folder(db, schemas.FolderCreate(name="other"), owner_id=user.id)
+    crud.update_folder(db, child.id, user.id, schemas.FolderUpdate(parent_id=other.id))
+    crud.get_folder_tree(db, user.id)
+    crud.get_account_stats(db, user.id)
+
+    notes = [
+        crud.create_note(db, schemas.NoteCreate(title=f"note {i}", content="查询计划 content", folder_id=folder.id), owner_id=user.id)
+        for i in range(3)
+    ]
+    crud.get_note_by_id(db, notes[0].id, user.id)
+    _, cursor = crud.get_note_summaries(db, user.id, limit=1)
+    crud.get_note_summaries(db, user.id, limit=1, cursor=cursor)
+    crud.get_note_summaries(db, user.id, folder_id=folder.id, limit=1, cursor=cursor)
+    crud.search_notes(db, user.id, "查询计划")
+    crud.search_notes(db, user.id, "查询")
+    crud.search_notes(db, user.id, "co")
+    crud.update_note(db, notes[0].id, user.id, schemas.NoteUpdate(title="renamed"))
+    crud.delete_note(db, notes[0].id, user.id)
+    crud.batch_note_operations(db, user.id, schemas.NoteBatchRequest(operations=[
+        {"op": "create", "note": {"title": "batch", "folder_id": folder.id}},
+        {"op": "update", "id": notes[1].id, "note": {"title": "batch 2"}},
+        {"op": "move", "id": notes[2].id, "folder_id": None},
+        {"op": "delete", "id": notes[1].id},
+    ]).operations)
+    db.execute(crud.export_folders_query(user.id)).all()
+    db.execute(crud.export_notes_query(user.id)).all()
+    crud.delete_folder(db, other.id, user.id)
+    crud.import_records(db, user.id, [
+        schemas.ExportFolder(type="folder", id=1, name="imported"),
+        schemas.ExportFolder(type="folder", id=2, name="imported child", parent_id=1),
+        schemas.ExportNote(type="note", id=1, title="imported", folder_id=1),
+    ], {})
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+        configure_sqlite_engine(engine, {})
+        Base.metadata.create_all(engine)
+        upgrade(engine)
+        create_search_index(engine)
+
+        statements = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                statements.append((statement, parameters))
+
+        db = sessionmaker(bind=engine)()
+        try:
+            _exercise_crud(db)
+        finally:
+            db.close()
+        event.remove(engine, "before_cursor_execute", _record)
+
+        failures = 0
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                details = [row[3] for row in plan]
+                scans = [d for d in details if d.startswith("SCAN ") and "VIRTUAL TABLE" not in d]
+                if scans:
+                    failures += 1
+                    print("FULL SCAN:", " ".join(statement.split()))
+                    for detail in details:
+                        print("    ", detail)
+        print(f"checked {len(statements)} statements, {failures} without index")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
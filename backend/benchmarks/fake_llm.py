@@ -0,0 +1,86 @@
+"""
+模拟的 OpenAI 兼容模型服务，用于在没有 GPU 的环境下测试 /api/assistant/chat
+
+POST /v1/chat/completions（stream=true）按固定的首 token 延迟和生成速度逐个返回 token，
+格式与 vLLM / llama.cpp 相同（data: {...} 行，最后是 usage 和 data: [DONE]）。
+GET /stats 返回服务端观察到的情况，用来验证代理的行为：
+- requests / completed / cancelled：请求数、完整生成的数量、客户端中途断开的数量
+- active / max_active：当前和最多同时进行的生成数（验证并发上限）
+- connections：收到请求的不同 TCP 连接数（验证 keep-alive 连接复用）
+
+用法（在 backend 目录下执行）：
+    python benchmarks/fake_llm.py [--port 8001] [--ttft 0.2] [--rate 50] [--tokens 64]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = "这 是 一段 模拟 的 回答 ， 用于 测试 流式 输出 、 并发 限制 和 取消 。".split()
+
+
+def create_app(ttft: float, rate: float, tokens: int) -> FastAPI:
+    app = FastAPI()
+    stats = {"requests": 0, "completed": 0, "cancelled": 0, "active": 0, "max_active": 0}
+    connections = set()
+
+    async def generate(payload: dict):
+        count = min(tokens, payload.get("max_tokens") or tokens)
+        created = int(time.time())
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        try:
+            await asyncio.sleep(ttft)
+            for i in range(count):
+                if i:
+                    await asyncio.sleep(1 / rate)
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": payload.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": WORDS[i % len(WORDS)]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            reason = "length" if count < tokens else "stop"
+            yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': reason}]})}\n\n"
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'choices': [], 'usage': {'prompt_tokens': 0, 'completion_tokens': count}})}\n\n"
+            yield "data: [DONE]\n\n"
+            stats["completed"] += 1
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        finally:
+            stats["active"] -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        stats["requests"] += 1
+        connections.add((request.client.host, request.client.port))
+        if not payload.get("stream"):
+            return JSONResponse({"error": {"message": "only stream=true is supported"}}, status_code=400)
+        return StreamingResponse(generate(payload), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "connections": len(connections)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=0.2, help="首个 token 前的延迟（秒）")
+    parser.add_argument("--rate", type=float, default=50.0, help="生成速度（tokens/s）")
+    parser.add_argument("--tokens", type=int, default=64, help="每个回答的 token 数")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.ttft, args.rate, args.tokens), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+跨 worker 的失效通知
+
+多 worker 部署（serve.py）时每个进程各有一份内存缓存。数据变更时：
+1. 当前进程直接让本地缓存失效；
+2. 在同一个数据库事务中调用 publish 写入 bus_events；
+3. 其余进程的 BusPoller 每 BUS_POLL_INTERVAL 秒读取新事件，调用 subscribe 注册的回调。
+
+其他进程看到变更的延迟不超过一个轮询周期；缓存自身的 TTL 仍然是兜底。
+SQLite 是所有 worker 共享的，不需要额外的消息服务。
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import Connection, Engine
+
+from database.bus import last_event_id, prune_events, publish_event, read_events
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔（秒），为 0 时不轮询（单进程部署）
+BUS_POLL_INTERVAL = float(os.getenv("BUS_POLL_INTERVAL", "0.5"))
+# 事件保留时间（秒），远大于轮询间隔即可
+BUS_RETENTION = 3600
+# 清理旧事件的大致间隔（秒），各 worker 加随机抖动，避免同时清理
+BUS_PRUNE_INTERVAL = 300
+# 每次最多读取的事件数
+BUS_BATCH_SIZE = 1000
+
+_subscribers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+
+
+def subscribe(channel: str, callback: Callable[[str], None]) -> None:
+    """注册回调，收到其他进程发布的 channel 事件时以 payload 调用"""
+    _subscribers[channel].append(callback)
+
+
+def publish(conn: Connection, channel: str, payload: str) -> None:
+    """在调用方的事务中发布事件（例如 ORM 事件里拿到的 connection）"""
+    publish_event(conn, channel, payload)
+
+
+def dispatch(channel: str, payload: str) -> None:
+    for callback in _subscribers.get(channel, ()):
+        try:
+            callback(payload)
+        except Exception:
+            logger.exception("Bus subscriber for %r failed", channel)
+
+
+class BusPoller:
+    """在后台任务中轮询 bus_events，把新事件分发给订阅者"""
+
+    def __init__(self, engine: Engine, interval: float = BUS_POLL_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self._last_id = 0
+        self._next_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _poll(self) -> list:
+        with self.engine.connect() as conn:
+            events = read_events(conn, self._last_id, BUS_BATCH_SIZE)
+        if time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + BUS_PRUNE_INTERVAL * random.uniform(0.5, 1.5)
+            with self.engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+                prune_events(conn, time.time() - BUS_RETENTION)
+        return events
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                events = await run_in_threadpool(self._poll)
+            except Exception:
+                logger.exception("Bus poll failed")
+                events = []
+            for event_id, channel, payload in events:
+                self._last_id = event_id
+                dispatch(channel, payload)
+            # 一批没读完时立即继续
+            if len(events) < BUS_BATCH_SIZE:
+                await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.interval <= 0:
+            return
+        # 只关心启动之后的事件：启动前的变更不会出现在新进程的缓存里
+        def _latest() -> int:
+            with self.engine.connect() as conn:
+                return last_event_id(conn)
+        self._last_id = await run_in_threadpool(_latest)
+        self._next_prune = time.monotonic() + BUS_PRUNE_INTERVAL * random.uniform(0.5, 1.5)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,335 @@
+"""
+实时变更推送（GET /api/events 的 SSE 和 /api/events/ws 的 WebSocket）
+
+每个写事务只递增一次用户的 change_seq（crud/user.py 的 bump_change_seq），一个事务内的
+全部改动组成一批事件，以 change_seq 为序号：
+1. bump_change_seq 调用 open_batch，crud 再用 record_change 逐条记下改动
+   （note.created / note.updated / note.moved / note.deleted，文件夹同理）；
+2. 事务提交后，本进程的 ChangeHub 把这批事件放进该用户每个订阅者的队列；
+3. 多 worker 部署时，同一批事件在提交前写入 bus_events（与数据在同一个事务中），
+   其余进程的 BusPoller 读到后交给各自的 ChangeHub。
+
+事件只说明哪些数据变了，客户端用 GET /api/sync?since=<序号> 取改动后的内容。
+
+每个订阅者的队列有上限（CHANGE_FEED_QUEUE_SIZE），跟不上的订阅者会被断开，
+客户端重连时带上 Last-Event-ID 从断开处继续：ChangeHub 为每个用户保留最近
+CHANGE_FEED_REPLAY_SIZE 批事件，能接上就直接补发，接不上时发送 resync 事件，
+让客户端用增量同步补齐，而不是全量重新加载。
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import bus
+
+logger = logging.getLogger(__name__)
+
+# 每个订阅者最多积压的批数，超过后断开该订阅者
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "256"))
+# 每个用户保留的最近批数，用于重连后补发
+CHANGE_FEED_REPLAY_SIZE = int(os.getenv("CHANGE_FEED_REPLAY_SIZE", "512"))
+# 最多为多少个用户保留补发记录（按最近使用淘汰，有在线订阅者的用户不淘汰）
+CHANGE_FEED_MAX_OWNERS = int(os.getenv("CHANGE_FEED_MAX_OWNERS", "1024"))
+# 每个用户同时在线的连接数上限
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "16"))
+# 一批事件最多列出的改动数，超过时只发送 truncated，客户端直接增量同步
+CHANGE_FEED_MAX_CHANGES = int(os.getenv("CHANGE_FEED_MAX_CHANGES", "200"))
+# 心跳间隔（秒），让代理和客户端知道连接还活着
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+# 单个连接最长保持的时间（秒），到期后客户端重连，令牌随之重新校验
+CHANGE_FEED_MAX_SECONDS = float(os.getenv("CHANGE_FEED_MAX_SECONDS", "1800"))
+# 多 worker 时才需要经过 bus_events 转发（与 hashing.py 一样按 WEB_CONCURRENCY 判断）
+CROSS_WORKER = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+BUS_CHANNEL = "changes"
+
+_PENDING_KEY = "change_feed_pending"
+_COMMITTED_KEY = "change_feed_committed"
+
+
+# --- 在写事务中收集事件 ---
+
+def open_batch(db: Session, owner_id: int, change_seq: int) -> None:
+    """登记本事务的 change_seq；即使没有记下具体改动，提交后也会发出这一批（保持序号连续）"""
+    db.info.setdefault(_PENDING_KEY, {})[owner_id] = {
+        "owner_id": owner_id,
+        "change_seq": change_seq,
+        "changes": [],
+        "truncated": False,
+    }
+
+
+def record_change(db: Session, owner_id: int, change_type: str, object_id: int, **fields) -> None:
+    """记下一条改动，必须在同一事务的 bump_change_seq 之后调用"""
+    batch = db.info[_PENDING_KEY][owner_id]
+    if batch["truncated"]:
+        return
+    if len(batch["changes"]) >= CHANGE_FEED_MAX_CHANGES:
+        batch["changes"], batch["truncated"] = [], True
+        return
+    batch["changes"].append({"type": change_type, "id": object_id, **fields})
+
+
+def mark_truncated(db: Session, owner_id: int) -> None:
+    """本事务的改动不逐条列出（如导入），客户端收到后直接增量同步"""
+    batch = db.info[_PENDING_KEY][owner_id]
+    batch["changes"], batch["truncated"] = [], True
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    batches = list(pending.values())
+    if CROSS_WORKER:
+        connection = session.connection()
+        for batch in batches:
+            bus.publish(connection, BUS_CHANNEL, json.dumps(batch, separators=(",", ":")))
+    session.info[_COMMITTED_KEY] = batches
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session: Session) -> None:
+    batches = session.info.pop(_COMMITTED_KEY, None)
+    if batches:
+        hub.publish_threadsafe(batches)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTED_KEY, None)
+
+
+# --- 进程内分发 ---
+
+class Subscriber:
+    """一个 SSE / WebSocket 连接。队列中的 None 表示连接应当结束"""
+
+    def __init__(self, owner_id: int, position: int):
+        self.owner_id = owner_id
+        # 已经发给（或通过 resync 交给）客户端的最大序号
+        self.position = position
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self.evicted = False
+
+    def close(self) -> None:
+        # 清空积压，保证结束标记放得进去
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class _OwnerState:
+    def __init__(self, last_seq: int):
+        # 已处理的最大序号，recent 中的批次从这里往前连续
+        self.last_seq = last_seq
+        self.recent: Deque[dict] = deque(maxlen=CHANGE_FEED_REPLAY_SIZE)
+        self.subscribers: Set[Subscriber] = set()
+
+
+class SubscriberLimitExceeded(Exception):
+    """该用户在线连接数已达上限"""
+
+
+class ChangeHub:
+    """
+    把提交后的事件分发给本进程的订阅者。除 publish_threadsafe 外都在事件循环中调用。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._owners: "OrderedDict[int, _OwnerState]" = OrderedDict()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        _chain_shutdown_signals(self._close_all_threadsafe)
+
+    def stop(self) -> None:
+        self._close_all()
+        self._loop = None
+        self._owners.clear()
+
+    # 事件来源
+    def publish_threadsafe(self, batches: List[dict]) -> None:
+        """写事务提交后调用（可能在写线程中）。按调用顺序投递，与提交顺序一致"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._deliver_all, batches, True)
+        except RuntimeError:
+            # 事件循环已关闭（进程退出中）
+            pass
+
+    def on_bus_event(self, payload: str) -> None:
+        self._deliver(json.loads(payload), local=False)
+
+    def _deliver_all(self, batches: List[dict], local: bool) -> None:
+        for batch in batches:
+            self._deliver(batch, local)
+
+    def _deliver(self, batch: dict, local: bool) -> None:
+        state = self._owners.get(batch["owner_id"])
+        if state is None:
+            # 没有订阅者、也没有补发记录的用户不需要处理
+            return
+        seq = batch["change_seq"]
+        if seq <= state.last_seq:
+            # bus 转发回来的本进程事件，或已经处理过的事件
+            return
+        if local and CROSS_WORKER and seq != state.last_seq + 1:
+            # 中间还有其他 worker 的事件没通过 bus 到达，等 bus 按顺序送来
+            return
+        state.last_seq = seq
+        state.recent.append(batch)
+        self._owners.move_to_end(batch["owner_id"])
+        for subscriber in list(state.subscribers):
+            if seq <= subscriber.position:
+                continue
+            try:
+                subscriber.queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                logger.info("Evicting slow change feed subscriber of user %s", subscriber.owner_id)
+                subscriber.evicted = True
+                state.subscribers.discard(subscriber)
+                subscriber.close()
+                continue
+            subscriber.position = seq
+
+    # 订阅
+    def subscribe(self, owner_id: int, since: int, current_seq: int) -> tuple:
+        """
+        登记订阅者，并计算重连时需要补发的内容。
+
+        参数:
+        - since: 客户端已经处理到的序号（Last-Event-ID），新连接为当前序号
+        - current_seq: 刚从数据库读到的用户当前序号
+
+        返回: (订阅者, 需要补发的批列表；为 None 时客户端应从 since 增量同步)
+        异常: SubscriberLimitExceeded
+        """
+        state = self._owners.get(owner_id)
+        if state is None:
+            # 之前的事件没有记录，从当前序号开始接收
+            state = self._owners[owner_id] = _OwnerState(current_seq)
+            self._evict_idle_owners()
+        elif len(state.subscribers) >= CHANGE_FEED_MAX_SUBSCRIBERS:
+            raise SubscriberLimitExceeded()
+        self._owners.move_to_end(owner_id)
+
+        replay: Optional[List[dict]] = []
+        position = since
+        if since < current_seq:
+            # 记录中的批次序号是连续的，从 since + 1 开始才能保证没有遗漏；
+            # 最新的几批可能还没送达本进程（bus 延迟），到达后照常推送
+            replay = [batch for batch in state.recent if batch["change_seq"] > since]
+            if replay and replay[0]["change_seq"] == since + 1:
+                position = replay[-1]["change_seq"]
+            else:
+                replay, position = None, current_seq
+        elif since > current_seq:
+            # 客户端的序号比数据库还新（例如数据库被还原），交给增量同步判断
+            replay, position = None, current_seq
+        subscriber = Subscriber(owner_id, position)
+        state.subscribers.add(subscriber)
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        state = self._owners.get(subscriber.owner_id)
+        if state is not None:
+            state.subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return sum(len(state.subscribers) for state in self._owners.values())
+
+    def _evict_idle_owners(self) -> None:
+        for owner_id in list(self._owners):
+            if len(self._owners) <= CHANGE_FEED_MAX_OWNERS:
+                break
+            if not self._owners[owner_id].subscribers:
+                del self._owners[owner_id]
+
+    # 关闭
+    def _close_all(self) -> None:
+        for state in self._owners.values():
+            for subscriber in state.subscribers:
+                subscriber.close()
+            state.subscribers.clear()
+
+    def _close_all_threadsafe(self) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._close_all)
+
+
+async def iter_messages(
+    subscriber: Subscriber,
+    replay: Optional[List[dict]],
+    since: int
+) -> AsyncIterator[Tuple[str, Optional[int], Optional[dict]]]:
+    """
+    按推送顺序产出 (事件名, 序号, 数据)，SSE 和 WebSocket 各自编码：
+    - resync：补发不了 since 之后的事件，客户端应调用 GET /api/sync?since=<since>
+    - change：一批改动，序号为 change_seq
+    - ping：心跳
+
+    订阅者被关闭（跟不上、进程退出）或连接到达最长时间时结束。
+    """
+    if replay is None:
+        yield "resync", subscriber.position, {"since": since}
+    else:
+        for batch in replay:
+            yield "change", batch["change_seq"], _public(batch)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + CHANGE_FEED_MAX_SECONDS
+    while True:
+        timeout = min(CHANGE_FEED_HEARTBEAT, deadline - loop.time())
+        if timeout <= 0:
+            return
+        try:
+            batch = await asyncio.wait_for(subscriber.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            yield "ping", None, None
+            continue
+        if batch is None:
+            return
+        yield "change", batch["change_seq"], _public(batch)
+
+
+def _public(batch: dict) -> dict:
+    return {"change_seq": batch["change_seq"], "changes": batch["changes"], "truncated": batch["truncated"]}
+
+
+def _chain_shutdown_signals(callback) -> None:
+    """
+    收到 SIGTERM / SIGINT 时先结束所有推送连接，再交给 uvicorn 原来的处理函数。
+
+    uvicorn 平滑关闭时会等待进行中的请求完成，推送连接不会自己结束，不处理的话每次
+    重启都要等满 GRACEFUL_TIMEOUT。连接结束后客户端按 retry 自动重连到其他 worker。
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            callback()
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+hub = ChangeHub()
+bus.subscribe(BUS_CHANNEL, hub.on_bus_event)
@@ -0,0 +1,181 @@
+"""
+响应压缩（ASGI 中间件）
+
+按 Accept-Encoding 协商 zstd / br / gzip（zstd、br 需要安装 zstandard、brotli，
+未安装时只提供 gzip）。只压缩文本类响应，且响应体不小于 COMPRESSION_MIN_SIZE；
+超过 COMPRESSION_OFFLOAD_SIZE 的响应体放到线程池压缩，不阻塞事件循环。
+流式响应（如 /api/export）原样透传。
+
+压缩后 ETag 改为弱校验（W/"..."），同一资源的不同编码不会被当作字节相同。
+
+单篇笔记的压缩结果可以缓存：路由把 (笔记ID, updated_at) 写入
+request.state.compressed_cache_key，中间件压缩后按 (键, 编码) 存入
+compressed_body_cache；笔记内容不变时下一次请求直接返回缓存的字节。
+"""
+import gzip
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache import TTLCache
+from http_cache import set_cache_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+# 小于该字节数的响应不压缩
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# 不小于该字节数的响应在线程池中压缩
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(64 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# 压缩结果缓存的条目数，为 0 时关闭
+COMPRESSED_CACHE_SIZE = int(os.getenv("COMPRESSED_CACHE_SIZE", "256"))
+COMPRESSED_CACHE_TTL = 3600  # 秒；键里带 updated_at，内容变化后旧条目自然失效
+
+compressed_body_cache = TTLCache(maxsize=max(COMPRESSED_CACHE_SIZE, 1), ttl=COMPRESSED_CACHE_TTL)
+
+# 可压缩的内容类型
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 让同样的输入得到同样的输出
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# 服务端偏好顺序：压缩率和速度更好的在前
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+ENCODERS["gzip"] = _gzip
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    从 Accept-Encoding 中选出服务端支持的编码，没有可用编码时返回 None。
+
+    q=0 表示拒绝；客户端给出的 q 值相同时按服务端偏好顺序选择。
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODERS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](body)
+
+
+def cache_key(request_state: dict) -> Optional[tuple]:
+    return request_state.get("compressed_cache_key") if COMPRESSED_CACHE_SIZE > 0 else None
+
+
+def cached_response(body: bytes, encoding: str, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """用缓存的压缩结果构造响应，中间件看到 Content-Encoding 后不会再次压缩"""
+    response = Response(content=body, media_type="application/json")
+    set_cache_headers(response, weak_etag(etag), last_modified)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def _is_compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, offload_size: int = COMPRESSION_OFFLOAD_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # 先扣下响应头，看到响应体后再决定是否压缩
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            compressible = _is_compressible(headers)
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+            if not compressible or message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= self.offload_size:
+                compressed = await run_in_threadpool(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+
+            key = cache_key(scope.get("state", {}))
+            if key is not None:
+                compressed_body_cache.set((*key, encoding), compressed)
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if "etag" in headers:
+                headers["ETag"] = weak_etag(headers["etag"])
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
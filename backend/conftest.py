@@ -0,0 +1,51 @@
+"""
+pytest 公共 fixture
+
+导入应用模块之前把 DATABASE_URL 指向临时目录中的数据库（不读写 database/notes.db），
+并对引擎调用 diagnostics.instrument_engine，测试中可以用 max_queries 限定查询条数：
+
+    def test_get_note(db, max_queries):
+        with max_queries(1):
+            crud.get_note_by_id(db, note_id, owner_id)
+
+超出预算时抛出 diagnostics.QueryBudgetExceeded（AssertionError），测试失败并列出全部语句。
+"""
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import diagnostics  # noqa: E402
+from database import ASYNC_DB, SessionLocal, async_engine, create_tables, engine  # noqa: E402
+
+diagnostics.instrument_engine(engine)
+if ASYNC_DB:
+    diagnostics.instrument_engine(async_engine.sync_engine)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _database():
+    """整个测试会话共用一个临时数据库，建表和迁移只执行一次"""
+    create_tables()
+    yield
+    engine.dispose()
+    _tmp.cleanup()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def max_queries():
+    """diagnostics.query_budget：with max_queries(n): ... 块内超过 n 条 SQL 时测试失败"""
+    return diagnostics.query_budget
@@ -2,6 +2,13 @@
 from .user import *
 from .folder import *  
 from .note import *
+from .revision import *
+from .backup import *
+from .stats import *
+from .sync import *
+from .retrieval import *
+from .attachment import *
+from . import aio
 
 
 __all__ = [
@@ -0,0 +1,182 @@
+"""
+CRUD 函数的异步版本，供 async 路由使用。
+
+每个函数复用同步 CRUD 的实现，根据传入的会话类型选择执行方式：
+- AsyncSession：通过 run_sync 在异步驱动上执行，不占用线程池
+- Session（DB_ASYNC=0）：放到线程池中执行，不阻塞事件循环
+
+写操作（write=True）经过单写者队列串行执行：SQLite 同一时刻只允许一个写者，
+进程内先排队可以避免写者之间互相等待 busy_timeout，读操作不受影响。
+写事务以 BEGIN IMMEDIATE 开启，跨进程的写冲突交给 busy_timeout 等待。
+"""
+import asyncio
+import contextvars
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import schemas
+from hashing import password_hasher
+from . import attachment, backup, folder, note, retrieval, revision, stats, sync, user
+
+
+# 同步模式下的写队列：单线程执行器
+_sync_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+# 异步模式下的写锁，每个事件循环一把
+_async_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _write_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _async_write_locks.get(loop)
+    if lock is None:
+        lock = _async_write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+def _run_write(fn, session: Session, *args, **kwargs):
+    # 结束之前的只读事务（如认证时的查询），让写事务以 BEGIN IMMEDIATE 重新开始，
+    # 而不是从读事务升级
+    if session.in_transaction():
+        session.commit()
+    session.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+    transaction = session.get_transaction()
+    try:
+        result = fn(session, *args, **kwargs)
+    except Exception:
+        session.rollback()
+        raise
+    # 未提交就返回（例如记录不存在）时及时释放写锁
+    if session.get_transaction() is transaction:
+        session.rollback()
+    return result
+
+
+def _make_async(fn, write: bool = False):
+    @wraps(fn)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            if not write:
+                return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+            async with _write_lock():
+                return await db.run_sync(lambda session: _run_write(fn, session, *args, **kwargs))
+        if not write:
+            return await run_in_threadpool(fn, db, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        # run_in_executor 不会传递 contextvars，手动带上（请求级 SQL 统计依赖它）
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_sync_writer, context.run, partial(_run_write, fn, db, *args, **kwargs))
+    return wrapper
+
+
+# --- 用户 (User) ---
+get_user_id = _make_async(user.get_user_id)
+get_user_by_username = _make_async(user.get_user_by_username)
+get_user_by_email = _make_async(user.get_user_by_email)
+get_user_by_id = _make_async(user.get_user_by_id)
+get_change_seq = _make_async(user.get_change_seq)
+update_password_hash = _make_async(user.update_password_hash, write=True)
+_insert_user = _make_async(user.create_user, write=True)
+
+# --- 文件夹 (Folder) ---
+create_folder = _make_async(folder.create_folder, write=True)
+get_folder_by_id = _make_async(folder.get_folder_by_id)
+get_folder_version = _make_async(folder.get_folder_version)
+get_folders_by_owner = _make_async(folder.get_folders_by_owner)
+get_folder_tree = _make_async(folder.get_folder_tree)
+update_folder = _make_async(folder.update_folder, write=True)
+delete_folder = _make_async(folder.delete_folder, write=True)
+
+# --- 笔记 (Note) ---
+create_note = _make_async(note.create_note, write=True)
+get_note_by_id = _make_async(note.get_note_by_id)
+get_note_version = _make_async(note.get_note_version)
+get_notes_by_owner = _make_async(note.get_notes_by_owner)
+get_notes_in_folder = _make_async(note.get_notes_in_folder)
+get_note_summaries = _make_async(note.get_note_summaries)
+search_notes = _make_async(note.search_notes)
+update_note = _make_async(note.update_note, write=True)
+patch_note = _make_async(note.patch_note, write=True)
+delete_note = _make_async(note.delete_note, write=True)
+batch_note_operations = _make_async(note.batch_note_operations, write=True)
+
+# --- 历史版本 (Revisions) ---
+get_revisions = _make_async(revision.get_revisions)
+get_revision = _make_async(revision.get_revision)
+restore_revision = _make_async(note.restore_revision, write=True)
+
+# --- 增量同步 (Sync) ---
+get_changes = _make_async(sync.get_changes)
+
+# --- 检索 (Retrieval) ---
+get_passage_sources = _make_async(retrieval.get_passage_sources)
+
+# --- 附件 (Attachments) ---
+get_attachment = _make_async(attachment.get_attachment)
+get_note_attachments = _make_async(attachment.get_note_attachments)
+create_attachment = _make_async(attachment.create_attachment, write=True)
+delete_attachment = _make_async(attachment.delete_attachment, write=True)
+
+# --- 统计 (Stats) ---
+get_account_stats = _make_async(stats.get_account_stats)
+reconcile_counters = _make_async(stats.reconcile_counters, write=True)
+
+# --- 备份 (Backup) ---
+import_records = _make_async(backup.import_records, write=True)
+
+
+async def release(db) -> None:
+    """
+    结束会话的读事务并归还连接。长时间保持的推送连接在开始推送前调用，
+    避免一直占着连接和 WAL 快照（SQLite 的读事务不结束，检查点就无法完成）。
+    """
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+async def stream_rows(db, statement, batch_size: int):
+    """
+    分批读取查询结果（yield_per），每次产出一批行，内存占用与结果总量无关。
+
+    同一会话中连续调用时读取的是同一个读事务的快照。
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if isinstance(db, AsyncSession):
+        result = await db.stream(statement)
+        async for partition in result.partitions():
+            yield partition
+        return
+    result = await run_in_threadpool(db.execute, statement)
+    try:
+        while True:
+            partition = await run_in_threadpool(result.fetchmany, batch_size)
+            if not partition:
+                break
+            yield partition
+    finally:
+        result.close()
+
+
+async def create_user(db, user: schemas.UserCreate):
+    """创建用户 - 密码在哈希进程池中计算，队列满时抛出 HashingBusyError"""
+    hashed_password = await password_hasher.hash(user.password)
+    return await _insert_user(db, user=user, hashed_password=hashed_password)
+
+
+async def authenticate_user(db, username: str, password: str):
+    """用户登录验证 - 哈希参数变更时顺带更新存储的密码哈希"""
+    db_user = await get_user_by_username(db, username=username)
+    if not db_user:
+        return None
+    verified, new_hash = await password_hasher.verify_and_update(password, db_user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        db_user = await update_password_hash(db, user_id=db_user.id, hashed_password=new_hash)
+    return db_user
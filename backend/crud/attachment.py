@@ -0,0 +1,190 @@
+"""
+笔记附件（attachments）和按内容寻址的附件内容（blobs）
+
+上传的内容按 SHA-256 去重：同样的内容（不论属于哪个用户）只有一行 blobs 和一个文件，
+blobs.ref_count 记录引用它的附件数，由本模块的写操作增量维护
+（python -m database reconcile 可以从 attachments 重新计算）。
+
+文件的放置和删除都在写事务中进行（写事务以 BEGIN IMMEDIATE 开启，彼此串行）：
+- 上传：先增加引用计数，再把临时文件放到最终位置（内容已存在时丢弃临时文件）
+- 垃圾回收：删除无人引用超过宽限期的行，同时删除文件
+因此不会出现上传看到文件已存在而跳过写入、随后文件又被垃圾回收删掉的情况。
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from attachments.store import BlobWriter, blob_store
+
+# IN (...) 子句每次携带的 ID 数
+ATTACHMENT_ID_CHUNK = 500
+# 垃圾回收每个事务最多删除的内容数
+GC_BATCH_SIZE = 500
+
+ATTACHMENT_COLUMNS = (
+    models.Attachment.id,
+    models.Attachment.note_id,
+    models.Attachment.filename,
+    models.Attachment.content_type,
+    models.Attachment.created_at,
+    models.Blob.sha256,
+    models.Blob.size,
+)
+
+
+def _chunks(values: list):
+    for start in range(0, len(values), ATTACHMENT_ID_CHUNK):
+        yield values[start:start + ATTACHMENT_ID_CHUNK]
+
+def _release_blobs(db: Session, blob_refs: Dict[int, int]) -> None:
+    """减少引用计数；updated_at 随之更新，降为 0 的内容从这时开始计算宽限期"""
+    now = datetime.utcnow()
+    for blob_id, count in blob_refs.items():
+        db.query(models.Blob).filter(models.Blob.id == blob_id).update(
+            {models.Blob.ref_count: models.Blob.ref_count - count, models.Blob.updated_at: now},
+            synchronize_session=False
+        )
+
+# --- 查询 (Read) ---
+def get_attachment(db: Session, attachment_id: int, owner_id: int):
+    """附件及其内容的哈希和大小，不存在或不属于该用户时返回 None"""
+    return db.query(*ATTACHMENT_COLUMNS).join(
+        models.Blob, models.Blob.id == models.Attachment.blob_id
+    ).filter(
+        models.Attachment.id == attachment_id,
+        models.Attachment.owner_id == owner_id
+    ).first()
+
+def get_note_attachments(db: Session, note_id: int, owner_id: int) -> list:
+    """笔记的附件，按上传顺序"""
+    return db.query(*ATTACHMENT_COLUMNS).join(
+        models.Blob, models.Blob.id == models.Attachment.blob_id
+    ).filter(
+        models.Attachment.note_id == note_id,
+        models.Attachment.owner_id == owner_id
+    ).order_by(models.Attachment.id).all()
+
+# --- 创建 (Create) ---
+def create_attachment(
+    db: Session,
+    owner_id: int,
+    note_id: int,
+    writer: BlobWriter,
+    filename: str,
+    content_type: str
+) -> Optional[dict]:
+    """
+    为笔记添加附件，内容来自已写完的临时文件（writer.finish 之后）。
+
+    返回: 新附件；笔记不存在或不属于该用户时返回 None（临时文件由调用方删除）
+    """
+    note = db.query(models.Note.id).filter(
+        models.Note.id == note_id,
+        models.Note.owner_id == owner_id
+    ).first()
+    if note is None:
+        return None
+
+    blob = db.query(models.Blob).filter(models.Blob.sha256 == writer.sha256).first()
+    if blob is None:
+        blob = models.Blob(sha256=writer.sha256, size=writer.size, ref_count=1)
+        db.add(blob)
+    else:
+        blob.ref_count = models.Blob.ref_count + 1
+    db.flush()
+    # 引用计数已经写入（持有写锁），此时再放置文件
+    blob_store.place(writer)
+
+    attachment = models.Attachment(
+        owner_id=owner_id,
+        note_id=note_id,
+        blob_id=blob.id,
+        filename=filename,
+        content_type=content_type
+    )
+    db.add(attachment)
+    db.commit()
+    return {
+        "id": attachment.id,
+        "note_id": note_id,
+        "filename": filename,
+        "content_type": content_type,
+        "created_at": attachment.created_at,
+        "sha256": writer.sha256,
+        "size": writer.size,
+    }
+
+# --- 删除 (Delete) ---
+def delete_attachment(db: Session, attachment_id: int, owner_id: int) -> bool:
+    """
+    删除附件，内容的引用计数减一（文件由垃圾回收删除）。
+
+    返回: 如果成功删除则返回 True，否则返回 False
+    """
+    attachment = db.query(models.Attachment).filter(
+        models.Attachment.id == attachment_id,
+        models.Attachment.owner_id == owner_id
+    ).first()
+    if attachment is None:
+        return False
+    db.delete(attachment)
+    _release_blobs(db, {attachment.blob_id: 1})
+    db.commit()
+    return True
+
+def delete_note_attachments(db: Session, note_ids: List[int]) -> None:
+    """删除笔记时一并删除其附件（调用方已校验所有权，在调用方的事务中执行）"""
+    blob_refs: Dict[int, int] = {}
+    for chunk in _chunks(note_ids):
+        rows = db.query(models.Attachment.blob_id, func.count(models.Attachment.id)).filter(
+            models.Attachment.note_id.in_(chunk)
+        ).group_by(models.Attachment.blob_id).all()
+        if not rows:
+            continue
+        for blob_id, count in rows:
+            blob_refs[blob_id] = blob_refs.get(blob_id, 0) + count
+        db.query(models.Attachment).filter(
+            models.Attachment.note_id.in_(chunk)
+        ).delete(synchronize_session=False)
+    _release_blobs(db, blob_refs)
+
+# --- 垃圾回收 (GC) ---
+def collect_unreferenced_blobs(db: Session, before: datetime, limit: int = GC_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    删除在 before 之前就已无人引用的内容（行和文件），最多 limit 条，并提交。
+
+    返回: (删除的条数, 释放的字节数)
+    """
+    rows = db.query(models.Blob.id, models.Blob.sha256).filter(
+        models.Blob.ref_count <= 0,
+        models.Blob.updated_at < before
+    ).limit(limit).all()
+    if not rows:
+        return 0, 0
+    db.query(models.Blob).filter(
+        models.Blob.id.in_([row.id for row in rows])
+    ).delete(synchronize_session=False)
+    # 在提交之前删除文件：提交失败时留下的是没有文件的零引用行，下次上传同样内容时会重新写入文件
+    freed = sum(blob_store.remove(row.sha256) for row in rows)
+    db.commit()
+    return len(rows), freed
+
+def remove_orphan_files(db: Session, sha256s: Iterable[str]) -> Tuple[int, int]:
+    """
+    删除数据库中没有记录的内容文件（写事务回滚或进程崩溃留下的）。
+
+    必须在写事务中调用，与上传串行；调用方只传入修改时间早于宽限期的文件。
+    返回: (删除的文件数, 释放的字节数)
+    """
+    removed = freed = 0
+    for chunk in _chunks(list(sha256s)):
+        known = {row.sha256 for row in db.query(models.Blob.sha256).filter(models.Blob.sha256.in_(chunk))}
+        for sha256 in chunk:
+            if sha256 not in known:
+                removed += 1
+                freed += blob_store.remove(sha256)
+    db.commit()
+    return removed, freed
@@ -0,0 +1,168 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from typing import Dict, List, Tuple
+from datetime import datetime, timezone
+
+import models
+import schemas
+from change_feed import mark_truncated
+from database.search import update_cjk_index
+from retrieval.hooks import mark_stale
+from .folder import folder_path
+from .note import add_counter_delta, apply_note_counters, content_bytes
+from .user import bump_change_seq
+
+# 导出时每次从游标取出的行数（笔记含正文，不宜过大）
+EXPORT_BATCH_SIZE = 100
+# 导入时每个事务写入的记录数
+IMPORT_BATCH_SIZE = 500
+
+# 导出的列（不包含 owner_id，导入时归属当前用户）
+FOLDER_EXPORT_COLUMNS = (
+    models.Folder.id,
+    models.Folder.name,
+    models.Folder.description,
+    models.Folder.color,
+    models.Folder.is_default,
+    models.Folder.parent_id,
+    models.Folder.created_at,
+    models.Folder.updated_at,
+)
+NOTE_EXPORT_COLUMNS = (
+    models.Note.id,
+    models.Note.title,
+    models.Note.content,
+    models.Note.folder_id,
+    models.Note.created_at,
+    models.Note.updated_at,
+)
+
+# --- 导出 (Export) ---
+def export_folders_query(owner_id: int):
+    """
+    导出用户全部文件夹的查询语句，配合 yield_per 分批读取。
+    只选择列而不加载 ORM 对象，不会在会话的 identity map 中累积。
+
+    按物化路径排序，父文件夹总是排在子文件夹之前。
+    """
+    return (
+        select(*FOLDER_EXPORT_COLUMNS)
+        .where(models.Folder.owner_id == owner_id)
+        .order_by(models.Folder.path)
+    )
+
+def export_notes_query(owner_id: int):
+    """
+    导出用户全部笔记（含正文）的查询语句。
+
+    按 (updated_at, id) 排序以直接沿 ix_notes_owner_updated 索引读取；
+    按 id 排序会让 SQLite 先把所有行（含正文）放进临时 B 树排序。
+    """
+    return (
+        select(*NOTE_EXPORT_COLUMNS)
+        .where(models.Note.owner_id == owner_id)
+        .order_by(models.Note.updated_at, models.Note.id)
+    )
+
+# --- 导入 (Import) ---
+def _utc(value: datetime, default: datetime) -> datetime:
+    # 数据库中统一存 UTC 的 naive datetime
+    if value is None:
+        return default
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def import_records(db: Session, owner_id: int, records: list, folder_map: Dict[int, int]) -> Tuple[int, int]:
+    """
+    在一个事务中批量写入一批已校验的导入记录（ExportFolder / ExportNote）。
+
+    folder_map 记录 导出文件中的文件夹ID -> 新文件夹ID，由调用方在各批次之间共享，
+    文件夹的 parent_id 和笔记的 folder_id 按它重新映射。父文件夹必须出现在子文件夹之前，
+    文件夹必须出现在引用它的笔记之前。
+
+    返回: (导入的文件夹数, 导入的笔记数)
+    异常: ValueError - 引用了未导入的文件夹（整批回滚）
+    """
+    folders: List[schemas.ExportFolder] = [r for r in records if r.type == "folder"]
+    notes: List[schemas.ExportNote] = [r for r in records if r.type == "note"]
+    now = datetime.utcnow()
+    change_seq = bump_change_seq(db, owner_id)
+    # 导入的记录可能很多，实时事件不逐条列出，客户端收到后增量同步
+    mark_truncated(db, owner_id)
+    mark_stale(db, owner_id)
+
+    if folders:
+        new_ids = db.execute(
+            insert(models.Folder).returning(models.Folder.id, sort_by_parameter_order=True),
+            [
+                {
+                    **folder.model_dump(include={"name", "description", "color", "is_default"}),
+                    "owner_id": owner_id,
+                    "change_seq": change_seq,
+                    "created_at": _utc(folder.created_at, now),
+                    "updated_at": _utc(folder.updated_at, now),
+                }
+                for folder in folders
+            ]
+        ).scalars().all()
+        for folder, new_id in zip(folders, new_ids):
+            folder_map[folder.id] = new_id
+
+        # 新ID确定后再补上 parent_id 和物化路径；之前批次导入的父文件夹从库中取路径
+        batch_ids = set(new_ids)
+        earlier_parents = {
+            folder_map[folder.parent_id] for folder in folders
+            if folder.parent_id in folder_map and folder_map[folder.parent_id] not in batch_ids
+        }
+        paths = dict(db.query(models.Folder.id, models.Folder.path).filter(
+            models.Folder.owner_id == owner_id,
+            models.Folder.id.in_(earlier_parents)
+        ).all()) if earlier_parents else {}
+        links = []
+        for folder, new_id in zip(folders, new_ids):
+            parent_id = None
+            if folder.parent_id is not None:
+                parent_id = folder_map.get(folder.parent_id)
+                if parent_id not in paths:
+                    raise ValueError(f"Folder {folder.id} references unknown parent {folder.parent_id}")
+            paths[new_id] = folder_path(paths.get(parent_id), new_id)
+            links.append({
+                "id": new_id,
+                "parent_id": parent_id,
+                "path": paths[new_id],
+                # 显式写入，避免 onupdate 覆盖导入的时间
+                "updated_at": _utc(folder.updated_at, now),
+            })
+        db.execute(update(models.Folder), links)
+
+    if notes:
+        rows = []
+        for note in notes:
+            folder_id = None
+            if note.folder_id is not None:
+                if note.folder_id not in folder_map:
+                    raise ValueError(f"Note {note.id} references unknown folder {note.folder_id}")
+                folder_id = folder_map[note.folder_id]
+            rows.append({
+                "title": note.title,
+                "content": note.content,
+                "folder_id": folder_id,
+                "owner_id": owner_id,
+                "change_seq": change_seq,
+                "created_at": _utc(note.created_at, now),
+                "updated_at": _utc(note.updated_at, now),
+            })
+        new_ids = db.execute(
+            insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+        update_cjk_index(db, added=[(note_id, row["title"], row["content"]) for row, note_id in zip(rows, new_ids)])
+
+        deltas = {}
+        for row in rows:
+            add_counter_delta(deltas, row["folder_id"], 1, content_bytes(row["content"]))
+        apply_note_counters(db, owner_id, deltas)
+
+    db.commit()
+    return len(folders), len(notes)
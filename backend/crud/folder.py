@@ -1,8 +1,53 @@
+from sqlalchemy import delete, func, literal, select, update
 from sqlalchemy.orm import Session
 
 import models
 import schemas
-from typing import List, Optional
+from change_feed import record_change
+from typing import List, Optional, Tuple
+from .note import apply_note_counters
+from .sync import TOMBSTONE_FOLDER, record_tombstones
+from .user import bump_change_seq
+
+# FolderRead 的字段，列表和目录树只查询这些列
+FOLDER_READ_COLUMNS = (
+    models.Folder.id,
+    models.Folder.name,
+    models.Folder.description,
+    models.Folder.color,
+    models.Folder.is_default,
+    models.Folder.parent_id,
+    models.Folder.owner_id,
+    models.Folder.note_count,
+    models.Folder.last_note_updated_at,
+    models.Folder.total_content_bytes,
+    models.Folder.created_at,
+    models.Folder.updated_at,
+)
+
+# --- 物化路径 (Path) ---
+def folder_path(parent_path: Optional[str], folder_id: int) -> str:
+    """
+    文件夹的物化路径：父路径 + 自身ID，顶层文件夹为 "/<id>/"。
+    """
+    return f"{parent_path or '/'}{folder_id}/"
+
+def subtree_bounds(path: str) -> Tuple[str, str]:
+    """
+    子树（含自身）的路径范围 [lower, upper)。
+
+    路径只由数字和 "/" 组成，而 "0" 紧跟在 "/" 之后，所以以 "/3/17/" 开头的路径
+    都落在 ["/3/17/", "/3/170") 之间，可以用 (owner_id, path) 索引做范围扫描。
+    """
+    return path, path[:-1] + "0"
+
+def _subtree_filter(owner_id: int, path: str):
+    lower, upper = subtree_bounds(path)
+    return (
+        models.Folder.owner_id == owner_id,
+        models.Folder.path >= lower,
+        models.Folder.path < upper,
+    )
 
 # --- 创建 (Create) ---
 def create_folder(db: Session, folder: schemas.FolderCreate, owner_id: int) -> models.Folder:
@@ -16,12 +61,27 @@ def create_folder(db: Session, folder: schemas.FolderCreate, owner_id: int) -> m
     
     返回:
     - 创建的 Folder 数据库对象
+    
+    异常:
+    - ValueError: 父文件夹不存在
     """
+    parent_path = None
+    if folder.parent_id is not None:
+        parent = get_folder_by_id(db, folder.parent_id, owner_id)
+        if not parent:
+            raise ValueError("Parent folder not found")
+        parent_path = parent.path
+    
     db_folder = models.Folder(
         **folder.model_dump(),
-        owner_id=owner_id
+        owner_id=owner_id,
+        change_seq=bump_change_seq(db, owner_id)
     )
     db.add(db_folder)
+    # 路径包含自身ID，需要先 flush 拿到ID
+    db.flush()
+    db_folder.path = folder_path(parent_path, db_folder.id)
+    record_change(db, owner_id, "folder.created", db_folder.id, parent_id=db_folder.parent_id)
     db.commit()
     db.refresh(db_folder)
     return db_folder
@@ -39,14 +99,49 @@ def get_folder_by_id(db: Session, folder_id: int, owner_id: int) -> Optional[mod
         models.Folder.owner_id == owner_id
     ).first()
 
-def get_folders_by_owner(db: Session, owner_id: int) -> List[models.Folder]:
+def get_folder_version(db: Session, folder_id: int, owner_id: int):
+    """
+    只查询文件夹的 id 和 updated_at，用于 ETag 校验。
+    
+    返回:
+    - (id, updated_at) 行，如果不存在则返回 None
+    """
+    return db.query(models.Folder.id, models.Folder.updated_at).filter(
+        models.Folder.id == folder_id,
+        models.Folder.owner_id == owner_id
+    ).first()
+
+def get_folders_by_owner(db: Session, owner_id: int) -> list:
     """
     获取属于特定用户的所有文件夹。
     
+    只查询 FolderRead 需要的列，不构造 ORM 对象。
+    
     返回:
-    - Folder 对象列表
+    - 行列表，字段与 FolderRead 一致
+    """
+    return db.query(*FOLDER_READ_COLUMNS).filter(
+        models.Folder.owner_id == owner_id
+    ).order_by(models.Folder.id).all()
+
+def get_folder_tree(db: Session, owner_id: int) -> List[dict]:
     """
-    return db.query(models.Folder).filter(models.Folder.owner_id == owner_id).all()
+    一次查询取出用户的全部文件夹（含冗余的笔记计数），在内存中组装成树。
+    
+    返回:
+    - 顶层文件夹列表，每个节点带 children（按ID排序）
+    """
+    rows = db.query(*FOLDER_READ_COLUMNS).filter(
+        models.Folder.owner_id == owner_id
+    ).order_by(models.Folder.id).all()
+
+    # 先建好全部节点再连接，父文件夹的 ID 比子文件夹大（移动过）时也能挂上
+    nodes = {row.id: {**row._mapping, "children": []} for row in rows}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
 
 # --- 更新 (Update) ---
 def update_folder(db: Session, folder_id: int, owner_id: int, folder_data: schemas.FolderUpdate) -> Optional[models.Folder]:
@@ -55,6 +150,9 @@ def update_folder(db: Session, folder_id: int, owner_id: int, folder_data: schem
     
     返回:
     - 更新后的 Folder 对象，如果文件夹不存在则返回 None
+    
+    异常:
+    - ValueError: 新的父文件夹不存在，或者是该文件夹自身/子孙文件夹
     """
     db_folder = get_folder_by_id(db, folder_id, owner_id)
     if not db_folder:
@@ -62,17 +160,50 @@ def update_folder(db: Session, folder_id: int, owner_id: int, folder_data: schem
     
     # 使用 Pydantic 的 model_dump(exclude_unset=True) 只更新传入的字段
     update_data = folder_data.model_dump(exclude_unset=True)
+    moved = False
+    if "parent_id" in update_data:
+        new_parent_id = update_data.pop("parent_id")
+        if new_parent_id != db_folder.parent_id:
+            _move_subtree(db, db_folder, new_parent_id, owner_id)
+            moved = True
     for key, value in update_data.items():
         setattr(db_folder, key, value)
+    # 子孙文件夹只有物化路径变化，同步不返回路径，不需要标记
+    db_folder.change_seq = bump_change_seq(db, owner_id)
+    record_change(
+        db, owner_id, "folder.moved" if moved and not update_data else "folder.updated",
+        db_folder.id, parent_id=db_folder.parent_id
+    )
     
     db.commit()
     db.refresh(db_folder)
     return db_folder
 
+def _move_subtree(db: Session, db_folder: models.Folder, new_parent_id: Optional[int], owner_id: int) -> None:
+    """
+    把文件夹连同整棵子树移到新的父文件夹下：一条 UPDATE 替换子树所有路径的前缀。
+    """
+    parent_path = None
+    if new_parent_id is not None:
+        parent = get_folder_by_id(db, new_parent_id, owner_id)
+        if not parent:
+            raise ValueError("Parent folder not found")
+        if parent.path.startswith(db_folder.path):
+            raise ValueError("Cannot move a folder into itself or its subfolders")
+        parent_path = parent.path
+    
+    old_path = db_folder.path
+    new_path = folder_path(parent_path, db_folder.id)
+    db.query(models.Folder).filter(*_subtree_filter(owner_id, old_path)).update(
+        {models.Folder.path: literal(new_path) + func.substr(models.Folder.path, len(old_path) + 1)},
+        synchronize_session=False
+    )
+    db_folder.parent_id = new_parent_id
+
 # --- 删除 (Delete) ---
 def delete_folder(db: Session, folder_id: int, owner_id: int) -> bool:
     """
-    删除现有文件夹。
+    删除现有文件夹及其全部子文件夹。
     
     返回:
     - 如果成功删除则返回 True，否则返回 False
@@ -81,15 +212,28 @@ def delete_folder(db: Session, folder_id: int, owner_id: int) -> bool:
     if not db_folder:
         return False
     
-    # ⚠️ 关联处理：在删除文件夹前，需要处理与它关联的笔记。
-    # 选项1: 删除所有关联的笔记
-    # db.query(models.Note).filter(models.Note.folder_id == folder_id).delete()
-    # 选项2: 将关联笔记的 folder_id 设为 None
-    # db.query(models.Note).filter(models.Note.folder_id == folder_id).update({"folder_id": None})
-    
-    # 在这个例子中，假设你的数据库外键关系是 CASCADE ON DELETE，会自动处理
-    # 如果不是，你需要显式地处理关联笔记。
+    # 子文件夹一起删除；其中的笔记不删除，移到顶层（folder_id 设为 None）。
+    # 两条语句都按路径范围批量执行，不逐个加载子文件夹和笔记。
+    change_seq = bump_change_seq(db, owner_id)
+    subtree = _subtree_filter(owner_id, db_folder.path)
+    note_ids = db.execute(
+        update(models.Note).where(
+            models.Note.owner_id == owner_id,
+            models.Note.folder_id.in_(select(models.Folder.id).where(*subtree))
+        ).values(folder_id=None, change_seq=change_seq).returning(models.Note.id),
+        execution_options={"synchronize_session": False}
+    ).scalars().all()
+    folder_ids = db.execute(
+        delete(models.Folder).where(*subtree).returning(models.Folder.id),
+        execution_options={"synchronize_session": False}
+    ).scalars().all()
+    record_tombstones(db, owner_id, TOMBSTONE_FOLDER, folder_ids, change_seq)
+    for folder_id in folder_ids:
+        record_change(db, owner_id, "folder.deleted", folder_id)
+    for note_id in note_ids:
+        record_change(db, owner_id, "note.moved", note_id, folder_id=None)
+    # 移动的笔记 updated_at 已变化，刷新账户级的 last_note_updated_at
+    apply_note_counters(db, owner_id, {None: [0, 0]})
     
-    db.delete(db_folder)
     db.commit()
-    return True
\ No newline at end of file
+    return True
@@ -1,8 +1,99 @@
+from sqlalchemy import table as sql_table
+from sqlalchemy import DateTime, Float, Integer, LargeBinary, String, and_, cast, column, delete, func, insert, literal_column, or_, text, update
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import html
+import re
 import models 
 
 import schemas
+from change_feed import record_change
+from database.search import CJK_RUN, NOTES_CJK_FTS_TABLE, NOTES_FTS_TABLE, update_cjk_index
+from http_cache import resource_etag
+from retrieval.hooks import mark_stale
+from text_patch import apply_text_ops, apply_unified_diff
+from .attachment import delete_note_attachments
+from .revision import delete_revisions, get_revision, record_revisions
+from .sync import TOMBSTONE_NOTE, record_tombstones
+from .user import bump_change_seq
+
+# 列表摘要截取的正文长度（字符）
+SNIPPET_LENGTH = 120
+
+# 搜索结果高亮标记
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+# 先用控制字符标出命中位置，整段文本转义 HTML 之后再换成 <mark>，笔记内容中的 HTML 不会被当作标签
+_MATCH_OPEN = "\x02"
+_MATCH_CLOSE = "\x03"
+_MATCHED = re.compile(f"{_MATCH_OPEN}([^{_MATCH_OPEN}{_MATCH_CLOSE}]*){_MATCH_CLOSE}")
+# trigram 索引只能匹配不少于 3 个字符的词；更短的中日韩文字词用单字/双字索引，
+# 其余更短的词（如 "AI"）逐行匹配
+MIN_FTS_TERM_LENGTH = 3
+# 没有可用索引时逐行匹配，每条语句检查的笔记数
+SEARCH_SCAN_ROWS = 2000
+# 搜索片段的长度（FTS 按词元计，逐行匹配按字符计）
+SEARCH_SNIPPET_TOKENS = 24
+# 标题命中相对正文命中的权重
+TITLE_WEIGHT = 10.0
+# 批量操作时 IN (...) 子句每次携带的 ID 数，低于 SQLite 的参数个数上限
+BATCH_ID_CHUNK = 500
+
+# --- 计数 (Counters) ---
+_FOLDER_COUNTERS_SQL = text("""
+    UPDATE folders SET
+        note_count = note_count + :notes,
+        total_content_bytes = total_content_bytes + :bytes,
+        last_note_updated_at = (
+            SELECT max(updated_at) FROM notes WHERE owner_id = :owner_id AND folder_id = :folder_id
+        )
+    WHERE id = :folder_id AND owner_id = :owner_id
+""")
+
+_USER_COUNTERS_SQL = text("""
+    UPDATE users SET
+        note_count = note_count + :notes,
+        total_content_bytes = total_content_bytes + :bytes,
+        last_note_updated_at = (SELECT max(updated_at) FROM notes WHERE owner_id = :owner_id)
+    WHERE id = :owner_id
+""")
+
+def content_bytes(content: Optional[str]) -> int:
+    """正文按 UTF-8 编码后的字节数，与 CONTENT_BYTES_SQL 一致"""
+    return len(content.encode("utf-8")) if content else 0
+
+def apply_note_counters(db: Session, owner_id: int, deltas: Dict[Optional[int], List[int]]) -> None:
+    """
+    在写笔记的事务中、提交前更新文件夹和用户上的冗余计数。
+
+    deltas: folder_id -> [笔记数变化, 正文字节数变化]，folder_id 为 None 表示不在文件夹中的笔记。
+    受影响的文件夹即使变化为 0 也要传入，last_note_updated_at 会按索引重新取最大值。
+    """
+    if not deltas:
+        return
+    # 先把笔记的改动写入，下面的 max(updated_at) 才能看到
+    db.flush()
+    folder_rows = [
+        {"owner_id": owner_id, "folder_id": folder_id, "notes": notes, "bytes": size}
+        for folder_id, (notes, size) in deltas.items()
+        if folder_id is not None
+    ]
+    if folder_rows:
+        db.execute(_FOLDER_COUNTERS_SQL, folder_rows)
+    db.execute(_USER_COUNTERS_SQL, {
+        "owner_id": owner_id,
+        "notes": sum(notes for notes, _ in deltas.values()),
+        "bytes": sum(size for _, size in deltas.values()),
+    })
+
+def add_counter_delta(deltas: Dict[Optional[int], List[int]], folder_id: Optional[int], notes: int, size: int) -> None:
+    """累加某个文件夹的计数变化"""
+    delta = deltas.setdefault(folder_id, [0, 0])
+    delta[0] += notes
+    delta[1] += size
 
 # --- 创建 (Create) ---
 def create_note(db: Session, note: schemas.NoteCreate, owner_id: int) -> models.Note:
@@ -11,9 +102,14 @@ def create_note(db: Session, note: schemas.NoteCreate, owner_id: int) -> models.
     """
     db_note = models.Note(
         **note.model_dump(exclude_unset=True),
-        owner_id=owner_id
+        owner_id=owner_id,
+        change_seq=bump_change_seq(db, owner_id)
     )
     db.add(db_note)
+    apply_note_counters(db, owner_id, {db_note.folder_id: [1, content_bytes(db_note.content)]})
+    record_change(db, owner_id, "note.created", db_note.id, folder_id=db_note.folder_id)
+    mark_stale(db, owner_id)
+    update_cjk_index(db, added=[(db_note.id, db_note.title, db_note.content)])
     db.commit()
     db.refresh(db_note)
     return db_note
@@ -30,6 +126,17 @@ def get_note_by_id(db: Session, note_id: int, owner_id: int) -> Optional[models.
         models.Note.owner_id == owner_id
     ).first()
 
+def get_note_version(db: Session, note_id: int, owner_id: int):
+    """
+    只查询笔记的 id 和 updated_at（不加载 content），用于 ETag 校验。
+    
+    返回: (id, updated_at) 行，如果不存在则返回 None
+    """
+    return db.query(models.Note.id, models.Note.updated_at).filter(
+        models.Note.id == note_id,
+        models.Note.owner_id == owner_id
+    ).first()
+
 def get_notes_by_owner(db: Session, owner_id: int) -> List[models.Note]:
     """
     获取属于特定用户的所有笔记。
@@ -49,24 +156,369 @@ def get_notes_in_folder(db: Session, folder_id: int, owner_id: int) -> List[mode
         models.Note.owner_id == owner_id
     ).all()
 
+def encode_note_cursor(updated_at: datetime, note_id: int) -> str:
+    """
+    将 (updated_at, id) 编码为不透明的分页游标。
+    """
+    raw = f"{updated_at.isoformat()}|{note_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_note_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析分页游标。
+    
+    异常: 游标格式不合法时抛出 ValueError
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        updated_at, note_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+def get_note_summaries(
+    db: Session,
+    owner_id: int,
+    folder_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    按 (updated_at, id) 倒序分页获取笔记摘要，只查询列表需要的列，不加载 content。
+    
+    参数:
+    - folder_id: 为 None 时返回用户的全部笔记，否则只返回该文件夹中的笔记
+    - limit: 每页条数
+    - cursor: 上一页返回的 next_cursor，为 None 时从第一页开始
+    
+    返回: (摘要行列表, 下一页游标)，没有更多数据时游标为 None
+    """
+    query = db.query(
+        models.Note.id,
+        models.Note.title,
+        func.substr(models.Note.content, 1, SNIPPET_LENGTH).label("snippet"),
+        models.Note.owner_id,
+        models.Note.folder_id,
+        models.Note.created_at,
+        models.Note.updated_at
+    ).filter(models.Note.owner_id == owner_id)
+    
+    if folder_id is not None:
+        query = query.filter(models.Note.folder_id == folder_id)
+    
+    if cursor:
+        cursor_updated_at, cursor_id = decode_note_cursor(cursor)
+        query = query.filter(or_(
+            models.Note.updated_at < cursor_updated_at,
+            and_(models.Note.updated_at == cursor_updated_at, models.Note.id < cursor_id)
+        ))
+    
+    # 多取一条用于判断是否还有下一页
+    rows = query.order_by(
+        models.Note.updated_at.desc(),
+        models.Note.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_note_cursor(last.updated_at, last.id)
+    return rows, next_cursor
+
+# --- 搜索 (Search) ---
+_FTS_SEARCH_SQL = text(f"""
+    SELECT
+        n.id AS id,
+        highlight({NOTES_FTS_TABLE}, 0, :hl_open, :hl_close) AS title,
+        snippet({NOTES_FTS_TABLE}, 1, :hl_open, :hl_close, '…', :snippet_tokens) AS snippet,
+        n.folder_id AS folder_id,
+        n.updated_at AS updated_at,
+        -bm25({NOTES_FTS_TABLE}, :title_weight, 1.0) AS score
+    FROM {NOTES_FTS_TABLE}
+    JOIN notes AS n ON n.id = {NOTES_FTS_TABLE}.rowid
+    WHERE {NOTES_FTS_TABLE} MATCH :match AND n.owner_id = :owner_id
+    ORDER BY bm25({NOTES_FTS_TABLE}, :title_weight, 1.0)
+    LIMIT :limit
+""").columns(
+    id=Integer,
+    title=String,
+    snippet=String,
+    folder_id=Integer,
+    updated_at=DateTime,
+    score=Float
+)
+
+def search_notes(db: Session, owner_id: int, query: str, limit: int = 20) -> list:
+    """
+    在用户自己的笔记中全文搜索标题和正文。
+    
+    多个以空格分隔的词之间为 AND 关系。所有词都不短于 3 个字符时使用 trigram 索引按 BM25 排序；
+    否则 1~2 个字的中日韩文字词走单字/双字索引，其余短词在索引命中的笔记中逐行匹配，同样按
+    BM25 排序。没有任何词能用索引时按更新时间从新到旧分批逐行匹配，返回最近的匹配结果。
+    
+    返回: 搜索结果列表，标题和片段已转义 HTML，命中部分用 <mark> 标记
+    """
+    terms = query.split()
+    if not terms:
+        return []
+    
+    if all(len(term) >= MIN_FTS_TERM_LENGTH for term in terms):
+        try:
+            return _search_notes_fts(db, owner_id, terms, limit)
+        except OperationalError:
+            # 索引表不存在或 SQLite 不支持 FTS5
+            db.rollback()
+            return _search_notes_scan(db, owner_id, terms, limit, use_index=False)
+    try:
+        return _search_notes_scan(db, owner_id, terms, limit)
+    except OperationalError:
+        db.rollback()
+        return _search_notes_scan(db, owner_id, terms, limit, use_index=False)
+
+def _fts_match(terms: List[str]) -> str:
+    # 每个词作为 FTS5 字符串处理，避免用户输入被解析成查询语法
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def _search_notes_fts(db: Session, owner_id: int, terms: List[str], limit: int) -> List[dict]:
+    rows = db.execute(_FTS_SEARCH_SQL, {
+        "match": _fts_match(terms),
+        "owner_id": owner_id,
+        "limit": limit,
+        "hl_open": _MATCH_OPEN,
+        "hl_close": _MATCH_CLOSE,
+        "snippet_tokens": SEARCH_SNIPPET_TOKENS,
+        "title_weight": TITLE_WEIGHT
+    }).all()
+    return [
+        {**row._mapping, "title": _marked_html(row.title), "snippet": _marked_html(row.snippet)}
+        for row in rows
+    ]
+
+def _search_notes_scan(db: Session, owner_id: int, terms: List[str], limit: int, use_index: bool = True) -> List[dict]:
+    query = db.query(
+        models.Note.id,
+        models.Note.title,
+        models.Note.content,
+        models.Note.folder_id,
+        models.Note.updated_at
+    ).filter(models.Note.owner_id == owner_id)
+
+    long_terms = [term for term in terms if len(term) >= MIN_FTS_TERM_LENGTH]
+    cjk_terms = [
+        term for term in terms
+        if len(term) < MIN_FTS_TERM_LENGTH and CJK_RUN.fullmatch(term)
+    ]
+    if not use_index:
+        long_terms, cjk_terms = [], []
+    # 能用索引的词连接对应的 FTS 表，按各表 BM25 之和排序
+    rank = None
+    for table, table_terms in ((NOTES_FTS_TABLE, long_terms), (NOTES_CJK_FTS_TABLE, cjk_terms)):
+        if not table_terms:
+            continue
+        fts = sql_table(table, column("rowid"))
+        query = query.join(fts, fts.c.rowid == models.Note.id).filter(
+            literal_column(table).op("MATCH")(_fts_match(table_terms))
+        )
+        bm25 = func.bm25(literal_column(table), TITLE_WEIGHT, 1.0)
+        rank = bm25 if rank is None else rank + bm25
+    for term in terms:
+        if term in long_terms or term in cjk_terms:
+            continue
+        query = query.filter(or_(
+            models.Note.title.contains(term, autoescape=True),
+            models.Note.content.contains(term, autoescape=True)
+        ))
+    if rank is None:
+        rows = _scan_recent(db, query, owner_id, limit)
+    else:
+        query = query.add_columns(rank.label("rank"))
+        rows = query.order_by(rank).limit(limit).all()
+    
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    hits = []
+    for row in rows:
+        content = row.content or ""
+        if rank is None:
+            score = TITLE_WEIGHT * len(pattern.findall(row.title)) + len(pattern.findall(content))
+        else:
+            score = -row.rank
+        hits.append({
+            "id": row.id,
+            "title": _highlight(pattern, row.title),
+            "snippet": _highlight(pattern, _snippet_window(pattern, content)),
+            "folder_id": row.folder_id,
+            "updated_at": row.updated_at,
+            "score": score
+        })
+    if rank is None:
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits
+
+def _note_key_before(key) -> list:
+    """按 (updated_at, id) 排在 key 之前（更早）的笔记；第一个条件让索引做范围扫描"""
+    return [models.Note.updated_at <= key.updated_at, or_(
+        models.Note.updated_at < key.updated_at,
+        and_(models.Note.updated_at == key.updated_at, models.Note.id < key.id)
+    )]
+
+def _note_key_from(key) -> list:
+    """按 (updated_at, id) 不早于 key 的笔记"""
+    return [models.Note.updated_at >= key.updated_at, or_(
+        models.Note.updated_at > key.updated_at,
+        and_(models.Note.updated_at == key.updated_at, models.Note.id >= key.id)
+    )]
+
+def _scan_recent(db: Session, query, owner_id: int, limit: int) -> list:
+    """
+    最后的手段：没有词能用索引时，按更新时间从新到旧分批逐行匹配，每条语句只检查
+    SEARCH_SCAN_ROWS 篇笔记，直到找到 limit 条结果或检查完所有笔记（不会漏掉较早的笔记）。
+    """
+    rows = []
+    after = None
+    while True:
+        window = db.query(models.Note.updated_at, models.Note.id).filter(models.Note.owner_id == owner_id)
+        batch = query
+        if after is not None:
+            window = window.filter(*_note_key_before(after))
+            batch = batch.filter(*_note_key_before(after))
+        # 本批最早的一篇笔记，也是下一批的起点
+        edge = window.order_by(
+            models.Note.updated_at.desc(),
+            models.Note.id.desc()
+        ).offset(SEARCH_SCAN_ROWS - 1).first()
+        if edge is not None:
+            batch = batch.filter(*_note_key_from(edge))
+        rows.extend(batch.order_by(
+            models.Note.updated_at.desc(),
+            models.Note.id.desc()
+        ).limit(limit - len(rows)).all())
+        if len(rows) >= limit or edge is None:
+            return rows
+        after = edge
+
+def _marked_html(value: Optional[str]) -> Optional[str]:
+    """
+    转义 HTML 特殊字符，再把成对的命中标记换成 <mark> 标签。
+    新写入的笔记不含标记字符；旧数据中残留的单个标记字符直接去掉，不会产生不成对的标签。
+    """
+    if value is None:
+        return None
+    value = _MATCHED.sub(lambda m: f"{HIGHLIGHT_OPEN}{m.group(1)}{HIGHLIGHT_CLOSE}", html.escape(value))
+    return value.replace(_MATCH_OPEN, "").replace(_MATCH_CLOSE, "")
+
+def _highlight(pattern: re.Pattern, value: str) -> str:
+    # 正文中原有的标记字符先去掉，避免被当作命中位置
+    value = value.replace(_MATCH_OPEN, "").replace(_MATCH_CLOSE, "")
+    return _marked_html(pattern.sub(lambda m: f"{_MATCH_OPEN}{m.group(0)}{_MATCH_CLOSE}", value))
+
+def _snippet_window(pattern: re.Pattern, content: str) -> str:
+    match = pattern.search(content)
+    start = max(match.start() - SEARCH_SNIPPET_TOKENS, 0) if match else 0
+    end = start + SEARCH_SNIPPET_TOKENS * 3
+    return ("…" if start > 0 else "") + content[start:end] + ("…" if end < len(content) else "")
+
 
 # --- 更新 (Update) ---
-def update_note(db: Session, note_id: int, owner_id: int, note_data: schemas.NoteUpdate) -> Optional[models.Note]:
+def update_note(
+    db: Session,
+    note_id: int,
+    owner_id: int,
+    note_data: schemas.NoteUpdate,
+    coalesce_revisions: bool = True
+) -> Optional[models.Note]:
     """
-    更新现有笔记。
+    更新现有笔记。标题或正文有变化时，被覆盖的版本存入历史版本。
+    
+    参数:
+    - coalesce_revisions: 为 False 时被覆盖的版本总是单独保留，不与最近的自动保存合并
     
     返回: 更新后的 Note 对象，如果笔记不存在则返回 None
     """
     db_note = get_note_by_id(db, note_id, owner_id)
     if not db_note:
         return None
-    
     # 使用 Pydantic 的 model_dump(exclude_unset=True) 只更新传入的字段
     update_data = note_data.model_dump(exclude_unset=True)
+    return _apply_note_changes(db, db_note, owner_id, update_data, coalesce_revisions)
+
+class NoteVersionConflict(Exception):
+    """增量更新的基准版本已不是笔记的当前版本"""
+
+    def __init__(self, current_etag: str):
+        super().__init__("Note has been modified since the base version")
+        self.current_etag = current_etag
+
+def patch_note(
+    db: Session,
+    note_id: int,
+    owner_id: int,
+    patch: schemas.NotePatch,
+    base_etag: str
+) -> Optional[models.Note]:
+    """
+    在笔记的当前版本上应用增量改动（文本操作或 unified diff），客户端不必上传整篇正文。
+    
+    在写事务中先核对 base_etag 再应用，核对和写入之间不会有其他写入。正文按改动后的
+    结果原样保存（不做 NoteUpdate 的首尾空白处理），客户端本地的文本与服务器保持一致。
     
-    for key, value in update_data.items():
+    返回: 更新后的 Note 对象，如果笔记不存在则返回 None
+    异常: 基准版本不是当前版本时抛出 NoteVersionConflict，改动无法应用时抛出 PatchError
+    """
+    db_note = get_note_by_id(db, note_id, owner_id)
+    if not db_note:
+        return None
+    current_etag = resource_etag("note", db_note.id, db_note.updated_at)
+    if base_etag.removeprefix("W/") != current_etag:
+        raise NoteVersionConflict(current_etag)
+    
+    values = {}
+    if patch.title is not None:
+        values["title"] = patch.title
+    if patch.ops is not None:
+        values["content"] = apply_text_ops(db_note.content or "", patch.ops) or None
+    elif patch.diff is not None:
+        values["content"] = apply_unified_diff(db_note.content or "", patch.diff) or None
+    return _apply_note_changes(db, db_note, owner_id, values)
+
+def _apply_note_changes(
+    db: Session,
+    db_note: models.Note,
+    owner_id: int,
+    values: dict,
+    coalesce_revisions: bool = True
+) -> models.Note:
+    old_folder_id, old_bytes = db_note.folder_id, content_bytes(db_note.content)
+    old_title, old_content, old_updated_at = db_note.title, db_note.content, db_note.updated_at
+    
+    for key, value in values.items():
         setattr(db_note, key, value)
+    db_note.change_seq = bump_change_seq(db, owner_id)
+    
+    edited = (db_note.title, db_note.content) != (old_title, old_content)
+    if edited:
+        mark_stale(db, owner_id)
+        update_cjk_index(
+            db,
+            removed=[(db_note.id, old_title, old_content)],
+            added=[(db_note.id, db_note.title, db_note.content)]
+        )
+        record_revisions(
+            db, owner_id,
+            [(db_note.id, old_title, old_content, old_updated_at, db_note.content)],
+            coalesce=coalesce_revisions
+        )
+    moved = db_note.folder_id != old_folder_id
+    record_change(
+        db, owner_id, "note.moved" if moved and not edited else "note.updated",
+        db_note.id, folder_id=db_note.folder_id
+    )
     
+    deltas = {}
+    add_counter_delta(deltas, old_folder_id, -1, -old_bytes)
+    add_counter_delta(deltas, db_note.folder_id, 1, content_bytes(db_note.content))
+    apply_note_counters(db, owner_id, deltas)
     db.commit()
     db.refresh(db_note)
     return db_note
@@ -83,5 +535,215 @@ def delete_note(db: Session, note_id: int, owner_id: int) -> bool:
         return False
     
     db.delete(db_note)
+    delete_revisions(db, [note_id])
+    delete_note_attachments(db, [note_id])
+    record_tombstones(db, owner_id, TOMBSTONE_NOTE, [note_id], bump_change_seq(db, owner_id))
+    record_change(db, owner_id, "note.deleted", note_id, folder_id=db_note.folder_id)
+    mark_stale(db, owner_id)
+    update_cjk_index(db, removed=[(note_id, db_note.title, db_note.content)])
+    apply_note_counters(db, owner_id, {db_note.folder_id: [-1, -content_bytes(db_note.content)]})
+    db.commit()
+    return True
+
+# --- 历史版本 (Revisions) ---
+def restore_revision(db: Session, note_id: int, owner_id: int, seq: int) -> Optional[models.Note]:
+    """
+    把笔记恢复为指定的历史版本。恢复前的内容作为一个新的历史版本保留，恢复操作本身可以撤销。
+    
+    返回: 更新后的 Note 对象，笔记或版本不存在时返回 None
+    """
+    revision = get_revision(db, note_id, owner_id, seq)
+    if revision is None:
+        return None
+    db_note = get_note_by_id(db, note_id, owner_id)
+    if not db_note:
+        return None
+    # 直接写回记录的标题和正文，不经过 NoteUpdate 的校验（会去掉首尾空白），恢复后与该版本逐字节相同
+    return _apply_note_changes(
+        db, db_note, owner_id,
+        {"title": revision["title"], "content": revision["content"]},
+        coalesce_revisions=False
+    )
+
+# --- 批量操作 (Batch) ---
+def _chunks(values: list, size: int = BATCH_ID_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _owned_ids(db: Session, model, owner_id: int, ids: set) -> set:
+    """返回 ids 中属于该用户的记录ID"""
+    owned = set()
+    for chunk in _chunks(sorted(ids)):
+        rows = db.query(model.id).filter(
+            model.owner_id == owner_id,
+            model.id.in_(chunk)
+        )
+        owned.update(row.id for row in rows)
+    return owned
+
+def _note_states(db: Session, owner_id: int, ids: set) -> Dict[int, List]:
+    """返回 ids 中属于该用户的笔记的 [folder_id, 正文字节数]，不加载正文"""
+    states = {}
+    for chunk in _chunks(sorted(ids)):
+        rows = db.query(
+            models.Note.id,
+            models.Note.folder_id,
+            func.coalesce(func.length(cast(models.Note.content, LargeBinary)), 0)
+        ).filter(
+            models.Note.owner_id == owner_id,
+            models.Note.id.in_(chunk)
+        )
+        states.update((note_id, [folder_id, size]) for note_id, folder_id, size in rows)
+    return states
+
+def _revision_changes(db: Session, updates: Dict[int, dict]) -> list:
+    """批量更新中标题或正文有变化的笔记：(note_id, 旧标题, 旧正文, 旧更新时间, 新正文)"""
+    ids = [note_id for note_id, values in updates.items() if "title" in values or "content" in values]
+    changes = []
+    for chunk in _chunks(sorted(ids)):
+        rows = db.query(
+            models.Note.id,
+            models.Note.title,
+            models.Note.content,
+            models.Note.updated_at
+        ).filter(models.Note.id.in_(chunk))
+        for note_id, title, content, updated_at in rows:
+            values = updates[note_id]
+            new_title, new_content = values.get("title", title), values.get("content", content)
+            if (new_title, new_content) != (title, content):
+                changes.append((note_id, title, content, updated_at, new_content))
+    return changes
+
+def batch_note_operations(db: Session, owner_id: int, operations: list) -> List[dict]:
+    """
+    在一个事务中按顺序执行一组笔记操作（create / update / move / delete）。
+
+    先用少量 IN 查询确认涉及的笔记和文件夹都属于该用户，再把所有新建合并成一条
+    批量 INSERT、所有修改合并成按主键的批量 UPDATE、所有删除合并成一条 DELETE，
+    最后只提交一次。某一项校验失败只会让该项失败，不影响其他项。
+
+    返回: 与 operations 一一对应的结果列表 {index, op, ok, id, error}
+    """
+    note_ids = {op.id for op in operations if op.op != "create"}
+    folder_ids = set()
+    for op in operations:
+        if op.op == "create" and op.note.folder_id is not None:
+            folder_ids.add(op.note.folder_id)
+        elif op.op == "update" and op.note.folder_id is not None:
+            folder_ids.add(op.note.folder_id)
+        elif op.op == "move" and op.folder_id is not None:
+            folder_ids.add(op.folder_id)
+
+    note_states = _note_states(db, owner_id, note_ids)
+    owned_folders = _owned_ids(db, models.Folder, owner_id, folder_ids)
+
+    results = []
+    inserts = []      # (结果下标, 字段)
+    updates = {}      # note_id -> 合并后的字段
+    deletes = {}      # note_id -> 删除前所在的文件夹
+    deltas = {}       # 文件夹计数的变化
+
+    for index, op in enumerate(operations):
+        result = {"index": index, "op": op.op, "ok": False, "id": getattr(op, "id", None), "error": None}
+        results.append(result)
+
+        if op.op == "create":
+            values = op.note.model_dump(exclude_unset=True)
+            folder_id = values.get("folder_id")
+        elif op.id not in note_states:
+            result["error"] = "Note not found"
+            continue
+        elif op.op == "update":
+            values = op.note.model_dump(exclude_unset=True)
+            folder_id = values.get("folder_id")
+        elif op.op == "move":
+            values = {"folder_id": op.folder_id}
+            folder_id = op.folder_id
+        else:
+            old_folder_id, old_bytes = note_states.pop(op.id)
+            add_counter_delta(deltas, old_folder_id, -1, -old_bytes)
+            updates.pop(op.id, None)
+            deletes[op.id] = old_folder_id
+            result["ok"] = True
+            continue
+
+        if folder_id is not None and folder_id not in owned_folders:
+            result["error"] = "Folder not found"
+            continue
+
+        result["ok"] = True
+        if op.op == "create":
+            inserts.append((len(results) - 1, values))
+            add_counter_delta(deltas, folder_id, 1, content_bytes(values.get("content")))
+        else:
+            updates.setdefault(op.id, {}).update(values)
+            state = note_states[op.id]
+            add_counter_delta(deltas, state[0], -1, -state[1])
+            if "folder_id" in values:
+                state[0] = values["folder_id"]
+            if "content" in values:
+                state[1] = content_bytes(values["content"])
+            add_counter_delta(deltas, state[0], 1, state[1])
+
+    if not (inserts or updates or deletes):
+        return results
+
+    now = datetime.utcnow()
+    change_seq = bump_change_seq(db, owner_id)
+    if inserts or deletes or any("title" in values or "content" in values for values in updates.values()):
+        mark_stale(db, owner_id)
+    indexed, unindexed = [], []   # 单字/双字索引的加入和删除，最后合并为一条语句
+    if inserts:
+        rows = [
+            {**values, "owner_id": owner_id, "created_at": now, "updated_at": now, "change_seq": change_seq}
+            for _, values in inserts
+        ]
+        new_ids = db.execute(
+            insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+        for (result_index, values), note_id in zip(inserts, new_ids):
+            results[result_index]["id"] = note_id
+            record_change(db, owner_id, "note.created", note_id, folder_id=values.get("folder_id"))
+        indexed.extend(
+            (note_id, values["title"], values.get("content"))
+            for (_, values), note_id in zip(inserts, new_ids)
+        )
+    if updates:
+        changes = _revision_changes(db, updates)
+        record_revisions(db, owner_id, changes)
+        unindexed.extend((note_id, title, content) for note_id, title, content, _, _ in changes)
+        indexed.extend(
+            (note_id, updates[note_id].get("title", title), new_content)
+            for note_id, title, _, _, new_content in changes
+        )
+        # 按主键的 ORM 批量 UPDATE；所有权已在上面校验过
+        db.execute(update(models.Note), [
+            {**values, "id": note_id, "updated_at": now, "change_seq": change_seq}
+            for note_id, values in updates.items()
+        ])
+        for note_id, values in updates.items():
+            edited = "title" in values or "content" in values
+            record_change(
+                db, owner_id, "note.updated" if edited else "note.moved",
+                note_id, folder_id=note_states[note_id][0]
+            )
+    for note_id, folder_id in deletes.items():
+        record_change(db, owner_id, "note.deleted", note_id, folder_id=folder_id)
+    delete_revisions(db, list(deletes))
+    delete_note_attachments(db, list(deletes))
+    record_tombstones(db, owner_id, TOMBSTONE_NOTE, deletes, change_seq)
+    for chunk in _chunks(list(deletes)):
+        # 返回删除前的标题和正文，用于从单字/双字索引中删除
+        unindexed.extend(db.execute(
+            delete(models.Note).where(
+                models.Note.owner_id == owner_id,
+                models.Note.id.in_(chunk)
+            ).returning(models.Note.id, models.Note.title, models.Note.content),
+            execution_options={"synchronize_session": False}
+        ))
+    update_cjk_index(db, removed=unindexed, added=indexed)
+
+    apply_note_counters(db, owner_id, deltas)
     db.commit()
-    return True
\ No newline at end of file
+    return results
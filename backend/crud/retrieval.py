@@ -0,0 +1,77 @@
+"""
+检索索引（retrieval 包）读取笔记的查询
+
+索引记下已索引到的 change_seq，更新时只读取之后修改过的笔记和删除记录，
+与增量同步使用同样的 (owner_id, change_seq) 索引。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from .sync import TOMBSTONE_NOTE
+
+# 更新索引时每次读取的笔记数
+INDEX_PAGE_SIZE = 200
+
+
+def get_index_state(db: Session, owner_id: int) -> Tuple[int, int]:
+    """返回 (change_seq, sync_floor)；索引停在 sync_floor 之前时删除记录可能已被清理，只能全量重建"""
+    row = db.query(models.User.change_seq, models.User.sync_floor).filter(models.User.id == owner_id).one()
+    return row.change_seq, row.sync_floor
+
+def get_notes_for_index(
+    db: Session,
+    owner_id: int,
+    since: Optional[int],
+    after: Optional[Tuple[int, int]] = None,
+    limit: int = INDEX_PAGE_SIZE
+) -> list:
+    """
+    读取 change_seq 大于 since 的笔记 (id, title, content, change_seq)，按 (change_seq, id) 分页。
+
+    参数:
+    - since: 索引已索引到的 change_seq，None 表示全部笔记
+    - after: 上一页最后一行的 (change_seq, id)
+    """
+    query = db.query(
+        models.Note.id,
+        models.Note.title,
+        models.Note.content,
+        models.Note.change_seq
+    ).filter(models.Note.owner_id == owner_id)
+    if since is not None:
+        query = query.filter(models.Note.change_seq > since)
+    if after is not None:
+        change_seq, note_id = after
+        query = query.filter(
+            (models.Note.change_seq > change_seq)
+            | ((models.Note.change_seq == change_seq) & (models.Note.id > note_id))
+        )
+    return query.order_by(models.Note.change_seq, models.Note.id).limit(limit).all()
+
+def get_deleted_note_ids(db: Session, owner_id: int, since: int) -> List[int]:
+    """since 之后删除的笔记"""
+    rows = db.query(models.Tombstone.object_id).filter(
+        models.Tombstone.owner_id == owner_id,
+        models.Tombstone.kind == TOMBSTONE_NOTE,
+        models.Tombstone.change_seq > since
+    ).all()
+    return [row.object_id for row in rows]
+
+def get_passage_sources(db: Session, owner_id: int, note_ids: Iterable[int]) -> Dict[int, tuple]:
+    """检索命中的笔记 {id: (title, content, folder_id, updated_at)}，已删除的不返回"""
+    ids = list(set(note_ids))
+    if not ids:
+        return {}
+    rows = db.query(
+        models.Note.id,
+        models.Note.title,
+        models.Note.content,
+        models.Note.folder_id,
+        models.Note.updated_at
+    ).filter(
+        models.Note.owner_id == owner_id,
+        models.Note.id.in_(ids)
+    ).all()
+    return {row.id: (row.title, row.content, row.folder_id, row.updated_at) for row in rows}
@@ -0,0 +1,295 @@
+"""
+笔记历史版本（note_revisions）
+
+当前版本就是 notes 中的行，note_revisions 只存更早的版本。每次保存把被覆盖的旧版本
+存为一个压缩的反向差异：从下一个更新的版本还原出旧版本，通常只有几十字节。
+- 每隔 REVISION_KEYFRAME_INTERVAL 条存一份完整快照，还原任何版本最多应用这么多个差异
+- 距上一个历史版本不到 REVISION_COALESCE_SECONDS 的保存（自动保存）不单独留版本，
+  只改写最新一条差异的基准，连续编辑时大约每分钟留一个版本
+- 删除最旧的版本不影响其余版本（差异只依赖更新的版本）；每新增 REVISION_COMPACT_EVERY
+  个版本按保留策略稀疏化一次
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+
+import models
+
+REVISION_FULL = "full"
+REVISION_DELTA = "delta"
+
+# 每隔多少条差异存一份完整快照
+REVISION_KEYFRAME_INTERVAL = 20
+# 与上一个历史版本间隔小于该秒数的保存合并
+REVISION_COALESCE_SECONDS = 60
+# 每新增多少个版本对该笔记做一次稀疏化
+REVISION_COMPACT_EVERY = 50
+# 保留策略：最近 1 天的版本全部保留，30 天内每小时保留一个，更早的每天保留一个，
+# 超过 1 年的删除；每篇笔记最多保留 REVISION_MAX_PER_NOTE 个
+REVISION_KEEP_ALL = timedelta(days=1)
+REVISION_KEEP_HOURLY = timedelta(days=30)
+REVISION_RETENTION = timedelta(days=365)
+REVISION_MAX_PER_NOTE = 200
+# 差异超过正文字节数的这个比例时改存完整快照
+REVISION_FULL_RATIO = 0.5
+# IN (...) 子句每次携带的 ID 数
+REVISION_ID_CHUNK = 500
+
+# (note_id, 旧标题, 旧正文, 旧版本的保存时间, 新正文)
+RevisionChange = Tuple[int, str, Optional[str], datetime, Optional[str]]
+
+# --- 差异编码 (Delta) ---
+def _lines(content: Optional[str]) -> List[str]:
+    return (content or "").splitlines(keepends=True)
+
+def encode_delta(newer: Optional[str], older: Optional[str]) -> bytes:
+    """
+    计算从 newer 还原 older 的差异（按行），zlib 压缩后返回。
+
+    解压后是 JSON 数组：[i, j] 表示复制 newer 的第 i 到 j-1 行，字符串表示插入的文本。
+    """
+    base, target = _lines(newer), _lines(older)
+    # 一次保存通常只改动一处：先去掉首尾相同的行，只对中间部分做匹配
+    limit = min(len(base), len(target))
+    prefix = 0
+    while prefix < limit and base[prefix] == target[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and base[-1 - suffix] == target[-1 - suffix]:
+        suffix += 1
+
+    ops = [[0, prefix]] if prefix else []
+    matcher = SequenceMatcher(None, base[prefix:len(base) - suffix], target[prefix:len(target) - suffix])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([prefix + i1, prefix + i2])
+        elif j2 > j1:
+            ops.append("".join(target[prefix + j1:prefix + j2]))
+    if suffix:
+        ops.append([len(base) - suffix, len(base)])
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def apply_delta(newer: Optional[str], delta: bytes) -> str:
+    """用 encode_delta 的结果从 newer 还原出旧版本"""
+    base = _lines(newer)
+    return "".join(
+        "".join(base[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(delta))
+    )
+
+def _encode(newer: Optional[str], older: Optional[str], run: int) -> Tuple[str, bytes, int]:
+    """
+    选择存储方式，返回 (kind, data, run)。
+
+    run 为这一条作为差异时的连续差异条数，达到 REVISION_KEYFRAME_INTERVAL 或者差异
+    不比完整正文小多少时存完整快照。
+    """
+    older_bytes = (older or "").encode("utf-8")
+    if run < REVISION_KEYFRAME_INTERVAL:
+        delta = encode_delta(newer, older)
+        if len(delta) < max(len(older_bytes) * REVISION_FULL_RATIO, 64):
+            return REVISION_DELTA, delta, run
+    return REVISION_FULL, zlib.compress(older_bytes), 0
+
+def _decode(row: models.NoteRevision, newer: Optional[str]) -> str:
+    if row.kind == REVISION_FULL:
+        return zlib.decompress(row.data).decode("utf-8")
+    return apply_delta(newer, row.data)
+
+# --- 记录 (Record) ---
+def _chunks(values: list):
+    for start in range(0, len(values), REVISION_ID_CHUNK):
+        yield values[start:start + REVISION_ID_CHUNK]
+
+def _latest_revisions(db: Session, note_ids: List[int]) -> Dict[int, models.NoteRevision]:
+    """每篇笔记最新的一条历史版本"""
+    # 相关子查询：每篇笔记按 ix_note_revisions_note_seq 直接取最大的 seq，
+    # 不物化 GROUP BY 的结果再连接回来
+    newer = aliased(models.NoteRevision)
+    newest_seq = db.query(func.max(newer.seq)).filter(
+        newer.note_id == models.NoteRevision.note_id
+    ).correlate(models.NoteRevision).scalar_subquery()
+    latest = {}
+    for chunk in _chunks(note_ids):
+        rows = db.query(models.NoteRevision).filter(
+            models.NoteRevision.note_id.in_(chunk),
+            models.NoteRevision.seq == newest_seq
+        )
+        latest.update((row.note_id, row) for row in rows)
+    return latest
+
+def record_revisions(db: Session, owner_id: int, changes: List[RevisionChange], coalesce: bool = True) -> None:
+    """
+    在更新笔记的事务中、提交前把被覆盖的旧版本存为历史版本。
+
+    每篇笔记一次查询最新的历史版本（批量时合并成 IN 查询），再写入一条差异或者
+    改写最新一条差异；coalesce 为 False 时不合并（例如恢复历史版本之前的状态必须保留）。
+    """
+    if not changes:
+        return
+    latest = _latest_revisions(db, [change[0] for change in changes])
+    compact = []
+    for note_id, old_title, old_content, saved_at, new_content in changes:
+        previous = latest.get(note_id)
+        if coalesce and previous is not None and saved_at - previous.saved_at < timedelta(seconds=REVISION_COALESCE_SECONDS):
+            # 不保留被覆盖的版本：最新一条差异原本以它为基准，改为以新正文为基准
+            if previous.kind == REVISION_DELTA:
+                content = apply_delta(old_content, previous.data)
+                previous.kind, previous.data, previous.run = _encode(new_content, content, previous.run)
+            continue
+
+        seq = previous.seq + 1 if previous is not None else 1
+        kind, data, run = _encode(new_content, old_content, (previous.run if previous is not None else 0) + 1)
+        db.add(models.NoteRevision(
+            note_id=note_id,
+            owner_id=owner_id,
+            seq=seq,
+            kind=kind,
+            run=run,
+            title=old_title,
+            data=data,
+            content_bytes=len((old_content or "").encode("utf-8")),
+            saved_at=saved_at
+        ))
+        if seq % REVISION_COMPACT_EVERY == 0:
+            compact.append((note_id, new_content))
+
+    db.flush()
+    for note_id, head_content in compact:
+        compact_revisions(db, note_id, head_content)
+
+# --- 稀疏化 (Compact) ---
+def _kept_indexes(rows: List[models.NoteRevision], now: datetime) -> List[int]:
+    """按保留策略选出要保留的版本，rows 按从新到旧排列"""
+    kept = []
+    buckets = set()
+    for index, row in enumerate(rows):
+        age = now - row.saved_at
+        if age > REVISION_RETENTION or len(kept) >= REVISION_MAX_PER_NOTE:
+            break
+        if age > REVISION_KEEP_ALL:
+            # 同一个小时/同一天内只保留最新的一个
+            if age > REVISION_KEEP_HOURLY:
+                bucket = ("day", row.saved_at.date())
+            else:
+                bucket = ("hour", row.saved_at.replace(minute=0, second=0, microsecond=0))
+            if bucket in buckets:
+                continue
+            buckets.add(bucket)
+        kept.append(index)
+    return kept
+
+def compact_revisions(db: Session, note_id: int, head_content: Optional[str], now: Optional[datetime] = None) -> int:
+    """
+    按保留策略删除一篇笔记的部分历史版本。不提交。
+
+    只有紧挨在被删除版本之后（更旧一侧）的保留版本需要改为相对新的邻居重新编码；
+    只删除最旧的版本时不需要还原任何正文。被删除的区间里有完整快照时，重新编码的
+    版本改存快照，还原任何版本需要应用的差异数不会因为删除而变多。
+
+    head_content: 笔记当前的正文
+    返回: 删除的版本数
+    """
+    rows = db.query(models.NoteRevision).filter(
+        models.NoteRevision.note_id == note_id
+    ).order_by(models.NoteRevision.seq.desc()).all()
+    kept = _kept_indexes(rows, now or datetime.utcnow())
+    if len(kept) == len(rows):
+        return 0
+
+    # (保留版本的下标, 新邻居的下标，-1 表示当前正文)
+    stale = []
+    for position, index in enumerate(kept):
+        newer = kept[position - 1] if position > 0 else -1
+        if index != newer + 1:
+            stale.append((index, newer))
+
+    if stale:
+        # 从新到旧依次还原，直到最旧的一个需要重新编码的版本
+        contents = []
+        newer_content = head_content
+        for row in rows[:stale[-1][0] + 1]:
+            newer_content = _decode(row, newer_content)
+            contents.append(newer_content)
+        for index, newer in stale:
+            row = rows[index]
+            if row.kind == REVISION_FULL:
+                continue
+            dropped_keyframe = any(rows[i].kind == REVISION_FULL for i in range(newer + 1, index))
+            run = REVISION_KEYFRAME_INTERVAL if dropped_keyframe else row.run
+            row.kind, row.data, row.run = _encode(
+                contents[newer] if newer >= 0 else head_content, contents[index], run
+            )
+
+    kept_set = set(kept)
+    for index, row in enumerate(rows):
+        if index not in kept_set:
+            db.delete(row)
+    db.flush()
+    return len(rows) - len(kept)
+
+# --- 读取 (Read) ---
+def get_revisions(db: Session, note_id: int, owner_id: int) -> list:
+    """
+    列出笔记的历史版本（不含正文），从新到旧。
+    """
+    return db.query(
+        models.NoteRevision.seq,
+        models.NoteRevision.title,
+        models.NoteRevision.content_bytes,
+        models.NoteRevision.saved_at
+    ).filter(
+        models.NoteRevision.note_id == note_id,
+        models.NoteRevision.owner_id == owner_id
+    ).order_by(models.NoteRevision.seq.desc()).all()
+
+def get_revision(db: Session, note_id: int, owner_id: int, seq: int) -> Optional[dict]:
+    """
+    还原指定的历史版本。
+
+    只读取从该版本到较新一侧最近的完整快照之间的行（不超过 REVISION_KEYFRAME_INTERVAL 条）；
+    中间没有快照时以笔记当前的正文为起点。
+
+    返回: {note_id, seq, title, content, content_bytes, saved_at}，版本不存在时返回 None
+    """
+    keyframe = db.query(func.min(models.NoteRevision.seq)).filter(
+        models.NoteRevision.note_id == note_id,
+        models.NoteRevision.seq >= seq,
+        models.NoteRevision.kind == REVISION_FULL
+    ).scalar_subquery()
+    rows = db.query(models.NoteRevision).filter(
+        models.NoteRevision.note_id == note_id,
+        models.NoteRevision.owner_id == owner_id,
+        models.NoteRevision.seq >= seq,
+        models.NoteRevision.seq <= func.coalesce(keyframe, models.NoteRevision.seq)
+    ).order_by(models.NoteRevision.seq.desc()).all()
+    if not rows or rows[-1].seq != seq:
+        return None
+
+    content = None
+    if rows[0].kind == REVISION_DELTA:
+        content = db.query(models.Note.content).filter(models.Note.id == note_id).scalar()
+    for row in rows:
+        content = _decode(row, content)
+    target = rows[-1]
+    return {
+        "note_id": note_id,
+        "seq": seq,
+        "title": target.title,
+        "content": content or None,
+        "content_bytes": target.content_bytes,
+        "saved_at": target.saved_at,
+    }
+
+# --- 删除 (Delete) ---
+def delete_revisions(db: Session, note_ids: List[int]) -> None:
+    """删除笔记时一并删除其历史版本（调用方已校验所有权）"""
+    for chunk in _chunks(note_ids):
+        db.query(models.NoteRevision).filter(
+            models.NoteRevision.note_id.in_(chunk)
+        ).delete(synchronize_session=False)
@@ -0,0 +1,40 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Optional
+
+import models
+from database.counters import reconcile_counters as _reconcile_counters
+
+# --- 读取 (Read) ---
+def get_account_stats(db: Session, owner_id: int) -> dict:
+    """
+    从 users / folders 上的冗余计数汇总账户统计，只读用户行和该用户的文件夹行，
+    与笔记数量无关。
+    """
+    user = db.query(
+        models.User.note_count,
+        models.User.total_content_bytes,
+        models.User.last_note_updated_at
+    ).filter(models.User.id == owner_id).one()
+    folder_count, filed_notes = db.query(
+        func.count(models.Folder.id),
+        func.coalesce(func.sum(models.Folder.note_count), 0)
+    ).filter(models.Folder.owner_id == owner_id).one()
+    return {
+        "folder_count": folder_count,
+        "note_count": user.note_count,
+        "unfiled_note_count": user.note_count - filed_notes,
+        "total_content_bytes": user.total_content_bytes,
+        "last_note_updated_at": user.last_note_updated_at,
+    }
+
+# --- 对账 (Reconcile) ---
+def reconcile_counters(db: Session, owner_id: Optional[int] = None) -> int:
+    """
+    按 notes 表重新计算计数并提交，owner_id 为空时处理所有用户。
+    
+    返回: 被修正的行数
+    """
+    fixed = _reconcile_counters(db.connection(), owner_id)
+    db.commit()
+    return fixed
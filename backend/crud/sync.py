@@ -0,0 +1,176 @@
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+from typing import Iterable, List, Optional, Tuple
+import base64
+
+import models
+
+# 删除记录的类型
+TOMBSTONE_NOTE = "note"
+TOMBSTONE_FOLDER = "folder"
+
+# 同一个 change_seq 内的排序：先文件夹（笔记可能引用新文件夹），再笔记，最后删除记录
+_RANK_FOLDER, _RANK_NOTE, _RANK_TOMBSTONE = 0, 1, 2
+
+# 同步返回的文件夹字段，不含冗余计数（计数随笔记变化，不改变文件夹的 change_seq）
+SYNC_FOLDER_COLUMNS = (
+    models.Folder.id,
+    models.Folder.name,
+    models.Folder.description,
+    models.Folder.color,
+    models.Folder.is_default,
+    models.Folder.parent_id,
+    models.Folder.created_at,
+    models.Folder.updated_at,
+    models.Folder.change_seq,
+)
+
+SYNC_NOTE_COLUMNS = (
+    models.Note.id,
+    models.Note.title,
+    models.Note.content,
+    models.Note.folder_id,
+    models.Note.created_at,
+    models.Note.updated_at,
+    models.Note.change_seq,
+)
+
+
+class SyncResetRequired(Exception):
+    """since 早于已清理的删除记录（或晚于当前版本），客户端需要从 since=0 全量重新同步"""
+
+
+# --- 写入 (Write) ---
+def record_tombstones(db: Session, owner_id: int, kind: str, object_ids: Iterable[int], change_seq: int) -> None:
+    """在删除笔记/文件夹的事务中写入删除记录"""
+    rows = [
+        {"owner_id": owner_id, "kind": kind, "object_id": object_id, "change_seq": change_seq}
+        for object_id in object_ids
+    ]
+    if rows:
+        db.execute(insert(models.Tombstone), rows)
+
+# --- 游标 (Cursor) ---
+def encode_sync_cursor(base: int, change_seq: int, rank: int, object_id: int) -> str:
+    """
+    将删除记录的起点和位置 (change_seq, 类型, id) 编码为不透明的分页游标。
+    """
+    raw = f"{base}|{change_seq}|{rank}|{object_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_sync_cursor(cursor: str) -> Tuple[int, Tuple[int, int, int]]:
+    """
+    解析分页游标。
+
+    异常: 游标格式不合法时抛出 ValueError
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        base, change_seq, rank, object_id = (int(part) for part in raw.split("|"))
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if rank not in (_RANK_FOLDER, _RANK_NOTE, _RANK_TOMBSTONE):
+        raise ValueError("Invalid cursor")
+    return base, (change_seq, rank, object_id)
+
+# --- 读取 (Read) ---
+def _after(seq_column, id_column, rank: int, position: Tuple[int, int, int]):
+    """(change_seq, rank, id) 严格大于游标位置的条件"""
+    change_seq, cursor_rank, cursor_id = position
+    if rank > cursor_rank:
+        return seq_column >= change_seq
+    if rank < cursor_rank:
+        return seq_column > change_seq
+    return or_(seq_column > change_seq, and_(seq_column == change_seq, id_column > cursor_id))
+
+def get_changes(
+    db: Session,
+    owner_id: int,
+    since: int = 0,
+    limit: int = 200,
+    cursor: Optional[str] = None
+) -> dict:
+    """
+    返回 change_seq 大于 since 的文件夹、笔记和删除记录，按 (change_seq, 类型, id) 分页。
+
+    三张表各走一次 (owner_id, change_seq) 索引范围扫描，最多各取 limit + 1 行，合并后
+    截取前 limit 条。同一页内，同一ID的删除记录如果早于该页返回的行（ID 被复用），
+    就不再返回。
+
+    全量同步（since=0）时客户端本地没有数据，只返回同步开始之后的删除记录：删除记录的
+    起点 base 记在游标中，增量同步是 since，全量同步是开始时用户的 change_seq。
+
+    参数:
+    - since: 客户端上次同步结束时的 change_seq，0 表示全量同步
+    - cursor: 上一页返回的 next_cursor，优先于 since
+
+    返回: {change_seq, folders, notes, deleted, has_more, next_cursor}；
+    没有更多数据时客户端把 change_seq 保存为下次的 since
+
+    异常: 游标不合法时抛出 ValueError，需要全量同步时抛出 SyncResetRequired
+    """
+    user = db.query(models.User.change_seq, models.User.sync_floor).filter(models.User.id == owner_id).one()
+    if cursor:
+        base, position = decode_sync_cursor(cursor)
+        if max(base, position[0]) > user.change_seq:
+            raise ValueError("Invalid cursor")
+    else:
+        # 比 since 之前的任何客户端数据都新的版本号，或 since 之后的删除记录已被清理
+        if since > user.change_seq or 0 < since < user.sync_floor:
+            raise SyncResetRequired()
+        base = since or user.change_seq
+        # 位置排在 since 的所有类型之后，即 change_seq > since
+        position = (since, _RANK_TOMBSTONE + 1, 0)
+
+    folders = db.query(*SYNC_FOLDER_COLUMNS).filter(
+        models.Folder.owner_id == owner_id,
+        _after(models.Folder.change_seq, models.Folder.id, _RANK_FOLDER, position)
+    ).order_by(models.Folder.change_seq, models.Folder.id).limit(limit + 1).all()
+    notes = db.query(*SYNC_NOTE_COLUMNS).filter(
+        models.Note.owner_id == owner_id,
+        _after(models.Note.change_seq, models.Note.id, _RANK_NOTE, position)
+    ).order_by(models.Note.change_seq, models.Note.id).limit(limit + 1).all()
+    tombstones = db.query(
+        models.Tombstone.id,
+        models.Tombstone.kind,
+        models.Tombstone.object_id,
+        models.Tombstone.change_seq
+    ).filter(
+        models.Tombstone.owner_id == owner_id,
+        models.Tombstone.change_seq > base,
+        _after(models.Tombstone.change_seq, models.Tombstone.id, _RANK_TOMBSTONE, position)
+    ).order_by(models.Tombstone.change_seq, models.Tombstone.id).limit(limit + 1).all()
+
+    merged: List[tuple] = sorted(
+        [(row.change_seq, _RANK_FOLDER, row.id, row) for row in folders]
+        + [(row.change_seq, _RANK_NOTE, row.id, row) for row in notes]
+        + [(row.change_seq, _RANK_TOMBSTONE, row.id, row) for row in tombstones],
+        key=lambda item: item[:3]
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    page = {_RANK_FOLDER: [], _RANK_NOTE: [], _RANK_TOMBSTONE: []}
+    for _, rank, _, row in merged:
+        page[rank].append(row)
+    present = {(TOMBSTONE_FOLDER, row.id) for row in page[_RANK_FOLDER]}
+    present.update((TOMBSTONE_NOTE, row.id) for row in page[_RANK_NOTE])
+    deleted = [
+        {"type": row.kind, "id": row.object_id, "change_seq": row.change_seq}
+        for row in page[_RANK_TOMBSTONE]
+        if (row.kind, row.object_id) not in present
+    ]
+
+    next_cursor = None
+    if has_more:
+        change_seq, rank, object_id, _ = merged[-1]
+        next_cursor = encode_sync_cursor(base, change_seq, rank, object_id)
+    return {
+        "change_seq": user.change_seq,
+        "folders": page[_RANK_FOLDER],
+        "notes": page[_RANK_NOTE],
+        "deleted": deleted,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
@@ -1,20 +1,19 @@
 import select
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 import models 
 import models
 import schemas
+import change_feed
+from hashing import get_pwd_context
 
 
-# 密码哈希工具
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
+# 密码哈希工具（同步版本，会阻塞当前线程；路由中请使用 crud.aio 中的异步版本）
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 # 用户id
 def get_user_id(db: Session, username: str):
@@ -29,11 +28,12 @@ def get_user_by_username(db: Session, username: str):
 
 
 # 创建user
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    """创建用户 - 未传入 hashed_password 时在当前线程中计算哈希"""
     db_user = models.User(
         username=user.username,
         email=user.email,
-        hashed_password=hash_password(user.password)
+        hashed_password=hashed_password or hash_password(user.password)
     )
     db.add(db_user)
     db.commit()
@@ -56,4 +56,30 @@ def authenticate_user(db: Session, username: str, password: str):
         return None
     return user
 
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """写入新的密码哈希 - 用于登录时按新的哈希参数重新哈希"""
+    user = get_user_by_id(db, user_id)
+    if user:
+        user.hashed_password = hashed_password
+        db.commit()
+        db.refresh(user)
+    return user
 
+def get_change_seq(db: Session, owner_id: int) -> int:
+    """获取用户数据的版本号 - 用于列表的 ETag"""
+    return db.query(models.User.change_seq).filter(models.User.id == owner_id).scalar() or 0
+
+def bump_change_seq(db: Session, owner_id: int) -> int:
+    """
+    递增用户数据的版本号 - 在写笔记/文件夹的事务中、提交前调用。
+
+    返回递增后的版本号，本事务写入的笔记/文件夹/删除记录都标记为这个值（增量同步用）。
+    """
+    # 用原生 SQL，避免触发 updated_at 的 onupdate 和 User 的 ORM 事件
+    change_seq = db.execute(
+        text("UPDATE users SET change_seq = change_seq + 1 WHERE id = :id RETURNING change_seq"),
+        {"id": owner_id}
+    ).scalar_one()
+    # 提交后作为一批实时事件推送，具体改动由调用方用 change_feed.record_change 记下
+    change_feed.open_batch(db, owner_id, change_seq)
+    return change_seq
@@ -1 +1,5 @@
-from .connection import engine, SessionLocal, Base, get_db, create_tables
+from .connection import (
+    engine, SessionLocal, Base, get_db, create_tables,
+    ASYNC_DB, async_engine, AsyncSessionLocal, get_async_db,
+    check_database, check_async_database, schema_is_current
+)
@@ -0,0 +1,30 @@
+"""数据库维护命令行：python -m database [upgrade|current|reconcile|reindex|prune-tombstones [天数]]"""
+import logging
+import sys
+
+from .connection import engine
+from .counters import reconcile_blob_refs, reconcile_counters
+from .migrations import current_version, latest_version, upgrade
+from .search import rebuild_cjk_index
+from .tombstones import prune_tombstones
+
+logging.basicConfig(level=logging.INFO)
+command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+if command == "current":
+    with engine.connect() as conn:
+        print(f"current: {current_version(conn)}, latest: {latest_version()}")
+elif command == "upgrade":
+    print(f"upgraded to version {upgrade(engine)}")
+elif command == "reconcile":
+    with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+        print(f"reconciled {reconcile_counters(conn) + reconcile_blob_refs(conn)} rows")
+elif command == "reindex":
+    # 用 sqlite3 等外部工具修改过 notes 表后重建单字/双字索引（trigram 索引由触发器同步，不受影响）
+    with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+        print(f"reindexed {rebuild_cjk_index(conn)} notes")
+elif command == "prune-tombstones":
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+        print(f"pruned {prune_tombstones(conn, days)} tombstones")
+else:
+    sys.exit(f"unknown command: {command}")
@@ -0,0 +1,50 @@
+"""
+跨进程事件总线的存储（bus_events 表）
+
+多 worker 部署时每个进程有自己的内存缓存。某个进程修改数据时往 bus_events 追加一行
+（与数据修改在同一个事务中），其余进程轮询新行并让本地缓存失效，见 bus.py。
+
+id 使用 AUTOINCREMENT，不会复用；SQLite 的写事务是串行提交的，按 id 递增读取不会漏行。
+表只追加，旧事件由 prune_events 定期删除。
+"""
+import time
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Row
+
+BUS_TABLE = "bus_events"
+
+BUS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {BUS_TABLE} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def publish_event(conn: Connection, channel: str, payload: str) -> None:
+    """在调用方的事务中追加一条事件，随事务一起提交或回滚"""
+    conn.execute(
+        text(f"INSERT INTO {BUS_TABLE} (channel, payload, created_at) VALUES (:channel, :payload, :created_at)"),
+        {"channel": channel, "payload": payload, "created_at": time.time()}
+    )
+
+
+def read_events(conn: Connection, after_id: int, limit: int) -> List[Row]:
+    """读取 id 大于 after_id 的事件，按 id 递增"""
+    return conn.execute(
+        text(f"SELECT id, channel, payload FROM {BUS_TABLE} WHERE id > :after_id ORDER BY id LIMIT :limit"),
+        {"after_id": after_id, "limit": limit}
+    ).all()
+
+
+def last_event_id(conn: Connection) -> int:
+    return conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {BUS_TABLE}")).scalar()
+
+
+def prune_events(conn: Connection, before: float) -> int:
+    """删除 created_at 早于 before（unix 秒）的事件，返回删除的行数"""
+    return conn.execute(text(f"DELETE FROM {BUS_TABLE} WHERE created_at < :before"), {"before": before}).rowcount
@@ -1,24 +1,59 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker  # ✅ 新的导入方式
+from contextlib import contextmanager
+import logging
 import os
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 
+from .migrations import current_version, latest_version, upgrade as run_migrations
+from .search import create_search_index, search_index_available
+from .sqlite_profile import configure_sqlite_engine, get_sqlite_pragmas, pool_options
 
-# 确保 database 目录存在
+logger = logging.getLogger(__name__)
+
+# 默认数据库文件所在目录（目录在建表时创建，导入模块时不触碰文件系统）
 database_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database")
-os.makedirs(database_dir, exist_ok=True)
 
-# 使用绝对路径
-DATABASE_URL = f"sqlite:///{os.path.join(database_dir, 'notes.db')}"
+# 使用绝对路径，可通过 DATABASE_URL 环境变量覆盖
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(database_dir, 'notes.db')}")
+
+# 是否使用异步数据库访问；DB_ASYNC=0 时回退到同步 Session + 线程池
+ASYNC_DB = os.getenv("DB_ASYNC", "1") != "0"
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# 每个新连接都会应用的 SQLite PRAGMA（见 sqlite_profile.py）
+SQLITE_PRAGMAS = get_sqlite_pragmas()
 
 engine = create_engine(
     DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    **pool_options(DATABASE_URL)
 )
+configure_sqlite_engine(engine, SQLITE_PRAGMAS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()  # ✅ 新的方式
 
+# 异步引擎只在启用时创建，避免同步模式下依赖异步驱动
+async_engine = (
+    create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+    if ASYNC_DB else None
+)
+if async_engine is not None:
+    configure_sqlite_engine(async_engine.sync_engine, SQLITE_PRAGMAS)
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if ASYNC_DB else None
+)
+
 # 数据库依赖函数
 def get_db():
     db = SessionLocal()
@@ -27,11 +62,75 @@ def get_db():
     finally:
         db.close()
 
+# 异步数据库依赖函数
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# 就绪检查：确认数据库可以查询且迁移已全部应用
+def check_database() -> bool:
+    with engine.connect() as conn:
+        return current_version(conn) >= latest_version()
+
+async def check_async_database() -> bool:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return True
+
+# 建表/迁移是否已经完成：只读检查，不需要写锁
+def schema_is_current() -> bool:
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.connect() as conn:
+        if current_version(conn) < latest_version():
+            return False
+    return search_index_available(engine)
+
+@contextmanager
+def _startup_lock():
+    """
+    跨进程的文件锁，多个 worker 同时启动时只有一个执行建表和迁移。
+    迁移可能超过 busy_timeout，单靠 BEGIN IMMEDIATE 排队会让其余 worker 报 "database is locked"。
+    锁文件与数据库文件分开：对数据库文件本身加锁会干扰 SQLite 自己的 POSIX 锁。
+    """
+    path = engine.url.database
+    if fcntl is None or engine.dialect.name != "sqlite" or not path or path == ":memory:":
+        yield
+        return
+    with open(f"{path}.startup-lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 # 创建表的函数
-def create_tables():
-    Base.metadata.create_all(bind=engine)
-    print(f"数据库文件位置: {DATABASE_URL}")
+def create_tables() -> bool:
+    """
+    建表并执行迁移。数据库已是最新结构时只做一次只读检查就返回，
+    因此第一个 worker 之后的进程启动几乎没有额外开销。
+
+    返回: 本进程是否实际执行了建表/迁移
+    """
+    path = engine.url.database
+    if engine.dialect.name == "sqlite" and path and path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if schema_is_current():
+        return False
+    with _startup_lock():
+        # 等锁期间其他 worker 可能已经完成
+        if schema_is_current():
+            return False
+        # 以写事务开始建表，避免读事务升级写锁失败
+        with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn:
+            with conn.begin():
+                Base.metadata.create_all(bind=conn)
+        # 已有数据库的结构变更（索引等）由版本迁移负责
+        run_migrations(engine)
+        create_search_index(engine)
+    logger.info("Database schema created/upgraded: %s", DATABASE_URL)
+    return True
 
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    create_tables()
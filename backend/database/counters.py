@@ -0,0 +1,100 @@
+"""
+笔记计数的对账
+
+folders 和 users 上的 note_count / last_note_updated_at / total_content_bytes
+由写笔记的事务增量维护。这里从 notes 表重新计算全部计数，修复可能出现的偏差
+（例如直接改库、旧版本写入）。只更新与实际值不一致的行。
+
+附件内容的引用计数（blobs.ref_count）同理，从 attachments 表重新计算。
+
+手动执行：
+    python -m database reconcile
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# 正文按 UTF-8 编码后的字节数
+CONTENT_BYTES_SQL = "length(CAST(content AS BLOB))"
+
+_RECONCILE_FOLDERS_SQL = f"""
+    UPDATE folders SET
+        note_count = c.note_count,
+        total_content_bytes = c.total_content_bytes,
+        last_note_updated_at = c.last_note_updated_at
+    FROM (
+        SELECT
+            f.id AS folder_id,
+            count(n.id) AS note_count,
+            coalesce(sum({CONTENT_BYTES_SQL}), 0) AS total_content_bytes,
+            max(n.updated_at) AS last_note_updated_at
+        FROM folders f
+        LEFT JOIN notes n ON n.owner_id = f.owner_id AND n.folder_id = f.id
+        WHERE :owner_id IS NULL OR f.owner_id = :owner_id
+        GROUP BY f.id
+    ) AS c
+    WHERE folders.id = c.folder_id
+      AND (folders.note_count IS NOT c.note_count
+           OR folders.total_content_bytes IS NOT c.total_content_bytes
+           OR folders.last_note_updated_at IS NOT c.last_note_updated_at)
+"""
+
+_RECONCILE_USERS_SQL = f"""
+    UPDATE users SET
+        note_count = c.note_count,
+        total_content_bytes = c.total_content_bytes,
+        last_note_updated_at = c.last_note_updated_at
+    FROM (
+        SELECT
+            u.id AS user_id,
+            count(n.id) AS note_count,
+            coalesce(sum({CONTENT_BYTES_SQL}), 0) AS total_content_bytes,
+            max(n.updated_at) AS last_note_updated_at
+        FROM users u
+        LEFT JOIN notes n ON n.owner_id = u.id
+        WHERE :owner_id IS NULL OR u.id = :owner_id
+        GROUP BY u.id
+    ) AS c
+    WHERE users.id = c.user_id
+      AND (users.note_count IS NOT c.note_count
+           OR users.total_content_bytes IS NOT c.total_content_bytes
+           OR users.last_note_updated_at IS NOT c.last_note_updated_at)
+"""
+
+_RECONCILE_BLOBS_SQL = """
+    UPDATE blobs SET
+        ref_count = c.ref_count,
+        updated_at = :now
+    FROM (
+        SELECT b.id AS blob_id, count(a.id) AS ref_count
+        FROM blobs b
+        LEFT JOIN attachments a ON a.blob_id = b.id
+        GROUP BY b.id
+    ) AS c
+    WHERE blobs.id = c.blob_id
+      AND blobs.ref_count IS NOT c.ref_count
+"""
+
+
+def reconcile_counters(conn: Connection, owner_id: Optional[int] = None) -> int:
+    """
+    重新计算计数（owner_id 为空时处理所有用户），不负责提交。
+
+    返回: 被修正的行数（文件夹 + 用户）
+    """
+    params = {"owner_id": owner_id}
+    fixed = conn.execute(text(_RECONCILE_FOLDERS_SQL), params).rowcount
+    fixed += conn.execute(text(_RECONCILE_USERS_SQL), params).rowcount
+    return fixed
+
+
+def reconcile_blob_refs(conn: Connection) -> int:
+    """
+    重新计算附件内容的引用计数，不负责提交。被修正的行的 updated_at 设为当前时间，
+    降为 0 的内容从这时开始计算垃圾回收的宽限期。
+
+    返回: 被修正的行数
+    """
+    return conn.execute(text(_RECONCILE_BLOBS_SQL), {"now": datetime.utcnow()}).rowcount
@@ -0,0 +1,215 @@
+"""
+数据库版本迁移
+
+create_all 只会创建缺失的表，不会修改已有数据库（例如给旧表补索引）。
+这里用 SQLite 的 PRAGMA user_version 记录库的版本号，启动时按顺序执行
+所有高于当前版本的迁移。每个迁移都必须可以在线、重复执行（IF NOT EXISTS）。
+
+手动执行：
+    python -m database            # 升级到最新版本
+    python -m database current    # 查看当前版本
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .bus import BUS_DDL
+from .counters import reconcile_counters
+from .tombstones import TOMBSTONES_DDL
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+
+class MigrationError(RuntimeError):
+    """迁移无法执行（例如已有数据违反新的约束）"""
+
+
+def migration(version: int, description: str):
+    """注册一个迁移，版本号必须递增"""
+    def decorator(fn: Callable[[Connection], None]):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration versions must increase: {version}")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+# --- 迁移定义 ---
+
+@migration(1, "hot query indexes and unique users.email")
+def _add_query_indexes(conn: Connection) -> None:
+    duplicates = conn.execute(text(
+        "SELECT email FROM users GROUP BY email HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise MigrationError(
+            f"Cannot add unique index on users.email, duplicated emails: {', '.join(duplicates)}"
+        )
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS ix_notes_owner_updated ON notes (owner_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_notes_owner_folder_updated ON notes (owner_id, folder_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_folders_owner_id ON folders (owner_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    ):
+        conn.execute(text(ddl))
+    # 让查询规划器拿到新索引的统计信息
+    conn.execute(text("PRAGMA optimize"))
+
+
+@migration(2, "users.change_seq collection version")
+def _add_change_seq(conn: Connection) -> None:
+    if not _has_column(conn, "users", "change_seq"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"))
+
+
+@migration(3, "folders.parent_id and materialized path")
+def _add_folder_path(conn: Connection) -> None:
+    if not _has_column(conn, "folders", "parent_id"):
+        conn.execute(text("ALTER TABLE folders ADD COLUMN parent_id INTEGER REFERENCES folders (id)"))
+    if not _has_column(conn, "folders", "path"):
+        conn.execute(text("ALTER TABLE folders ADD COLUMN path VARCHAR(500) NOT NULL DEFAULT ''"))
+    # 已有的文件夹都是顶层文件夹
+    conn.execute(text("UPDATE folders SET path = '/' || id || '/' WHERE path = ''"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_folders_owner_path ON folders (owner_id, path)"))
+
+
+@migration(4, "denormalized note counters on folders and users")
+def _add_note_counters(conn: Connection) -> None:
+    for table in ("folders", "users"):
+        for column, ddl in (
+            ("note_count", "INTEGER NOT NULL DEFAULT 0"),
+            ("last_note_updated_at", "DATETIME"),
+            ("total_content_bytes", "INTEGER NOT NULL DEFAULT 0"),
+        ):
+            if not _has_column(conn, table, column):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    # 用现有笔记回填
+    reconcile_counters(conn)
+
+
+@migration(5, "bus_events table for cross-worker cache invalidation")
+def _add_bus_events(conn: Connection) -> None:
+    conn.execute(text(BUS_DDL))
+
+
+@migration(6, "note_revisions history table")
+def _add_note_revisions(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS note_revisions (
+            id INTEGER NOT NULL PRIMARY KEY,
+            note_id INTEGER NOT NULL REFERENCES notes (id),
+            owner_id INTEGER NOT NULL REFERENCES users (id),
+            seq INTEGER NOT NULL,
+            kind VARCHAR(5) NOT NULL,
+            run INTEGER NOT NULL,
+            title VARCHAR(200) NOT NULL,
+            data BLOB NOT NULL,
+            content_bytes INTEGER NOT NULL,
+            saved_at DATETIME NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_note_revisions_id ON note_revisions (id)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_note_revisions_note_seq ON note_revisions (note_id, seq)"))
+
+
+@migration(7, "change_seq on notes/folders and tombstones for delta sync")
+def _add_delta_sync(conn: Connection) -> None:
+    for table in ("notes", "folders"):
+        if not _has_column(conn, table, "change_seq"):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_owner_change_seq ON {table} (owner_id, change_seq)"))
+    if not _has_column(conn, "users", "sync_floor"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN sync_floor INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(TOMBSTONES_DDL))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tombstones_id ON tombstones (id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_tombstones_owner_change_seq ON tombstones (owner_id, change_seq)"
+    ))
+    # 已有数据标记为一个新的版本号，客户端从 since=0 同步时能取到全部数据
+    conn.execute(text("""
+        UPDATE users SET change_seq = change_seq + 1
+        WHERE id IN (SELECT owner_id FROM notes UNION SELECT owner_id FROM folders)
+    """))
+    for table in ("notes", "folders"):
+        conn.execute(text(f"""
+            UPDATE {table} SET change_seq = (SELECT change_seq FROM users WHERE users.id = {table}.owner_id)
+            WHERE change_seq = 0
+        """))
+
+
+@migration(8, "attachments and content-addressed blobs")
+def _add_attachments(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            id INTEGER NOT NULL PRIMARY KEY,
+            sha256 VARCHAR(64) NOT NULL,
+            size BIGINT NOT NULL,
+            ref_count INTEGER NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_blobs_id ON blobs (id)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_blobs_sha256 ON blobs (sha256)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_blobs_ref_count_updated ON blobs (ref_count, updated_at)"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER NOT NULL PRIMARY KEY,
+            owner_id INTEGER NOT NULL REFERENCES users (id),
+            note_id INTEGER NOT NULL REFERENCES notes (id),
+            blob_id INTEGER NOT NULL REFERENCES blobs (id),
+            filename VARCHAR(255) NOT NULL,
+            content_type VARCHAR(100) NOT NULL,
+            created_at DATETIME,
+            updated_at DATETIME
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attachments_id ON attachments (id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attachments_note ON attachments (note_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attachments_blob ON attachments (blob_id)"))
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(text(f"PRAGMA table_info({table})")))
+
+
+# --- 执行 ---
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def upgrade(engine: Engine) -> int:
+    """
+    执行所有未应用的迁移。
+
+    整个过程在一个 BEGIN IMMEDIATE 事务中完成：多个 worker 同时启动时只有一个
+    真正执行迁移，其余的等锁释放后读到最新版本号直接跳过。
+
+    返回: 迁移后的版本号
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+        version = current_version(conn)
+        for target, description, fn in MIGRATIONS:
+            if target <= version:
+                continue
+            logger.info("Applying migration %s: %s", target, description)
+            fn(conn)
+            # user_version 写在库文件头中，随事务一起提交
+            conn.execute(text(f"PRAGMA user_version = {int(target)}"))
+            version = target
+    return version
+
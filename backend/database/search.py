@@ -0,0 +1,214 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from typing import Iterable, List, Optional
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 全文索引表名
+NOTES_FTS_TABLE = "notes_fts"
+# 中日韩文字的单字/双字索引表名
+NOTES_CJK_FTS_TABLE = "notes_cjk_fts"
+# 旧版本用来同步单字/双字索引的触发器（依赖连接上注册的 Python 函数），升级时删除
+_LEGACY_CJK_TRIGGERS = ("notes_cjk_fts_ai", "notes_cjk_fts_ad", "notes_cjk_fts_au")
+# 重建单字/双字索引时每批读取的笔记数
+CJK_REINDEX_BATCH = 500
+
+# 连续的中日韩文字（汉字、假名、谚文）
+CJK_RUN = re.compile(
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002ffff]+"
+)
+
+
+def cjk_ngrams(value):
+    """
+    把文本中的中日韩文字转换为以空格分隔的单字和相邻双字，例如 "机器学习" →
+    "机 器 学 习 机器 器学 学习"；其余文字不进入该索引（由 trigram 索引负责）。
+    """
+    if not value:
+        return ""
+    tokens = []
+    for run in CJK_RUN.findall(value):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return " ".join(tokens)
+
+
+# 已确认建有单字/双字索引表的数据库文件（同步和异步引擎共用），写入时不再检查
+_cjk_index_databases = set()
+
+# 'delete' 行从索引中删除（contentless 表按词元删除），command 为 NULL 的行是普通插入
+_CJK_INDEX_SQL = text(
+    f"INSERT INTO {NOTES_CJK_FTS_TABLE}({NOTES_CJK_FTS_TABLE}, rowid, title, content) "
+    "VALUES (:command, :id, :title, :content)"
+)
+
+
+def _cjk_rows(rows: Iterable, command: Optional[str] = None) -> List[dict]:
+    # 不含中日韩文字的笔记不进入索引，加入和删除时按同样的规则跳过
+    params = []
+    for note_id, title, content in rows:
+        title, content = cjk_ngrams(title), cjk_ngrams(content)
+        if title or content:
+            params.append({"command": command, "id": note_id, "title": title, "content": content})
+    return params
+
+
+def _cjk_index_ready(db) -> bool:
+    bind = db.get_bind()
+    if bind.url.database in _cjk_index_databases:
+        return True
+    if bind.dialect.name != "sqlite" or not _table_exists(db, NOTES_CJK_FTS_TABLE):
+        return False
+    _cjk_index_databases.add(bind.url.database)
+    return True
+
+
+def update_cjk_index(db, removed: Iterable = (), added: Iterable = ()) -> None:
+    """
+    同步单字/双字索引，在写入 notes 的同一事务中调用；删除和加入合并为一条语句。
+
+    参数:
+    - removed: 修改或删除前的 (id, 标题, 正文)。contentless 表按词元删除，必须与加入时的内容一致
+    - added: 新建或修改后的 (id, 标题, 正文)
+    """
+    params = _cjk_rows(removed, "delete") + _cjk_rows(added)
+    if params and _cjk_index_ready(db):
+        db.execute(_CJK_INDEX_SQL, params)
+
+
+def rebuild_cjk_index(conn) -> int:
+    """
+    清空并按 notes 表重新填充单字/双字索引，在写事务中调用。
+    用 sqlite3 等外部工具直接修改过 notes 表后执行（python -m database reindex）。
+
+    返回: 进入索引的笔记数
+    """
+    conn.execute(text(f"INSERT INTO {NOTES_CJK_FTS_TABLE}({NOTES_CJK_FTS_TABLE}) VALUES ('delete-all')"))
+    indexed = last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, title, content FROM notes WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": CJK_REINDEX_BATCH}
+        ).all()
+        if not rows:
+            return indexed
+        params = _cjk_rows(rows)
+        if params:
+            conn.execute(_CJK_INDEX_SQL, params)
+        indexed += len(params)
+        last_id = rows[-1].id
+
+# external content 模式的 FTS5 表：正文只存一份（在 notes 表中），索引通过触发器同步。
+# trigram 分词器按 3 字符滑动窗口切分，不依赖空格分词，可以直接检索中文。
+_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {NOTES_FTS_TABLE} USING fts5(
+        title,
+        content,
+        content='notes',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO {NOTES_FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO {NOTES_FTS_TABLE}({NOTES_FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO {NOTES_FTS_TABLE}({NOTES_FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {NOTES_FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+# trigram 只能匹配不少于 3 个字符的词，而中文的词大多是 1~2 个字。另建一个 contentless
+# FTS5 表，把中日韩文字切成单字和双字作为词元（unicode61 分词器按空格切分），1~2 个字的
+# 中文查询词直接按词元匹配。切分在 Python 中完成，不能用触发器同步：由 crud 在写入 notes 的
+# 同一事务中调用 update_cjk_index，sqlite3 等外部工具照常可以写 notes。
+_CJK_FTS_DDL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {NOTES_CJK_FTS_TABLE} USING fts5(
+        title,
+        content,
+        content='',
+        tokenize='unicode61'
+    )
+"""
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name}
+    ).first() is not None
+
+
+def search_index_available(engine: Engine) -> bool:
+    """检查全文索引表（trigram 和单字/双字）是否都存在"""
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.connect() as conn:
+        available = (
+            _table_exists(conn, NOTES_FTS_TABLE)
+            and _table_exists(conn, NOTES_CJK_FTS_TABLE)
+            and not _legacy_triggers(conn)
+        )
+    if available:
+        _cjk_index_databases.add(engine.url.database)
+    return available
+
+
+def _legacy_triggers(conn) -> List[str]:
+    return conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (:ai, :ad, :au)"),
+        dict(zip(("ai", "ad", "au"), _LEGACY_CJK_TRIGGERS))
+    ).scalars().all()
+
+
+def create_search_index(engine: Engine) -> bool:
+    """
+    创建笔记全文索引（FTS5 虚拟表 + 同步触发器）。
+
+    索引表第一次创建时会用 notes 表中已有的数据填充索引；删除旧版本的单字/双字索引触发器并重建该索引。
+    当前 SQLite 不支持 FTS5/trigram 时只记录警告，搜索会退化为逐行匹配。
+
+    返回: 索引是否可用
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    try:
+        with engine.connect().execution_options(sqlite_begin="IMMEDIATE") as conn, conn.begin():
+            existed = _table_exists(conn, NOTES_FTS_TABLE)
+            for ddl in _FTS_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                conn.execute(text(
+                    f"INSERT INTO {NOTES_FTS_TABLE}({NOTES_FTS_TABLE}) VALUES ('rebuild')"
+                ))
+            existed = _table_exists(conn, NOTES_CJK_FTS_TABLE)
+            conn.execute(text(_CJK_FTS_DDL))
+            legacy = _legacy_triggers(conn)
+            for name in legacy:
+                conn.execute(text(f"DROP TRIGGER {name}"))
+            if not existed or legacy:
+                # 旧触发器为每篇笔记都建了索引行，按现在的规则重建
+                rebuild_cjk_index(conn)
+    except OperationalError as exc:
+        logger.warning("全文索引不可用，搜索将使用逐行匹配: %s", exc)
+        return False
+    _cjk_index_databases.add(engine.url.database)
+    return True
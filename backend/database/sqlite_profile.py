@@ -0,0 +1,85 @@
+"""
+SQLite 存储参数配置
+
+通过 SQLITE_PROFILE 环境变量选择一组 PRAGMA，在每个新连接上执行：
+- production（默认）：WAL 日志、synchronous=NORMAL、较大的页缓存和 mmap、忙等待超时
+- default：不修改 SQLite 默认值（回滚日志模式）
+
+单个参数可以用 SQLITE_<PRAGMA 名大写> 环境变量覆盖，例如 SQLITE_BUSY_TIMEOUT=10000。
+
+同时接管 pysqlite/aiosqlite 的事务开启语句：写事务可以通过
+execution_options(sqlite_begin="IMMEDIATE") 在事务开始时就拿到写锁，
+避免读事务升级为写事务时直接报 "database is locked"。
+"""
+import os
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "production": {
+        "busy_timeout": 5000,               # 毫秒，放在最前面，后续 PRAGMA 也能等待锁
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,               # 负数表示 KiB，即 64MB
+        "mmap_size": 256 * 1024 * 1024,     # 256MB
+        "temp_store": "MEMORY",
+    },
+    "default": {},
+}
+
+# 连接池大小
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def get_sqlite_pragmas(profile: str = None) -> Dict[str, object]:
+    """返回当前生效的 PRAGMA 配置（profile + 环境变量覆盖）"""
+    profile = profile or os.getenv("SQLITE_PROFILE", "production")
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PROFILES["production"]:
+        override = os.getenv(f"SQLITE_{name.upper()}")
+        if override is not None:
+            pragmas[name] = override
+    return pragmas
+
+
+def pool_options(url: str) -> dict:
+    """文件型 SQLite 使用固定大小的连接池，内存库保持 SQLAlchemy 的默认策略"""
+    if url.startswith("sqlite") and ":memory:" not in url:
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    return {}
+
+
+def configure_sqlite_engine(engine: Engine, pragmas: Dict[str, object]) -> None:
+    """
+    为引擎注册连接事件：新连接执行 PRAGMA，事务改由 begin 事件显式开启。
+
+    异步引擎请传入 async_engine.sync_engine。
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # 关闭驱动自带的隐式 BEGIN，由下面的 begin 事件负责
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        mode = conn.get_execution_options().get("sqlite_begin", "DEFERRED")
+        conn.exec_driver_sql(f"BEGIN {mode}")
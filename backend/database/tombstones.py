@@ -0,0 +1,49 @@
+"""
+删除记录（tombstones 表）的清理
+
+每次删除笔记/文件夹都会留下一条删除记录，增量同步靠它告诉客户端哪些数据已删除。
+表只增不减，超过保留期的记录需要定期清理：
+
+    python -m database prune-tombstones [保留天数，默认 TOMBSTONE_RETENTION_DAYS]
+
+清理后，上次同步早于被清理记录的客户端无法再得知这些删除，GET /api/sync 会
+根据用户的 sync_floor 要求它们全量重新同步。
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "90"))
+
+TOMBSTONES_DDL = """
+CREATE TABLE IF NOT EXISTS tombstones (
+    id INTEGER NOT NULL PRIMARY KEY,
+    owner_id INTEGER NOT NULL REFERENCES users (id),
+    kind VARCHAR(10) NOT NULL,
+    object_id INTEGER NOT NULL,
+    change_seq INTEGER NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME
+)
+"""
+
+
+def prune_tombstones(conn: Connection, retention_days: Optional[int] = None) -> int:
+    """
+    删除早于保留期的删除记录，并推进相应用户的 sync_floor。在调用方的事务中执行。
+
+    返回: 删除的行数
+    """
+    days = TOMBSTONE_RETENTION_DAYS if retention_days is None else retention_days
+    params = {"before": datetime.utcnow() - timedelta(days=days)}
+    conn.execute(text("""
+        UPDATE users SET sync_floor = max(sync_floor, (
+            SELECT max(change_seq) FROM tombstones t
+            WHERE t.owner_id = users.id AND t.created_at < :before
+        ))
+        WHERE id IN (SELECT owner_id FROM tombstones WHERE created_at < :before)
+    """), params)
+    return conn.execute(text("DELETE FROM tombstones WHERE created_at < :before"), params).rowcount
@@ -1,32 +1,133 @@
 # 修复版本
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
-from jose import jwt, JWTError
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Union
 
-from database import SessionLocal
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from fastapi import Depends, HTTPException, Query, Request, status
+from fastapi.security.utils import get_authorization_scheme_param
+
+from database import ASYNC_DB, AsyncSessionLocal, SessionLocal
+import bus
+from cache import TTLCache
 import crud
 import models
 from auth import oauth2_scheme, ALGORITHM, SECRET_KEY
 
-def get_db():
-    """数据库会话依赖"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# 认证主体缓存：按 token 的 sub（邮箱）缓存，条目不会比 token 活得更久
+PRINCIPAL_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL = 60  # 秒
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# 路由拿到的数据库会话：异步模式下为 AsyncSession，DB_ASYNC=0 时为同步 Session
+DBSession = Union[AsyncSession, Session]
+
+
+@dataclass(frozen=True)
+class Principal:
+    """已认证用户的只读快照，不绑定数据库会话"""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            created_at=user.created_at,
+            updated_at=user.updated_at
+        )
+
+
+def invalidate_principal(email: str) -> None:
+    """用户信息变更或停用后，使对应的缓存失效"""
+    principal_cache.pop(email)
+
+
+# 其他 worker 修改了用户时，同样让本进程的缓存失效
+bus.subscribe("principal", invalidate_principal)
+
+
+# 本事务中改动过的用户邮箱，提交后才清除本进程的缓存
+_CHANGED_PRINCIPALS_KEY = "changed_principals"
+
 
-def get_current_user(
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # 邮箱本身被修改时，旧邮箱对应的缓存也要清掉
+    history = inspect(target).attrs.email.history
+    emails = object_session(target).info.setdefault(_CHANGED_PRINCIPALS_KEY, set())
+    for email in (target.email, *history.deleted):
+        emails.add(email)
+        # 通知与本事务一起提交，其他 worker 在提交之后才会读到
+        bus.publish(connection, "principal", email)
+
+
+# 刷新之后、提交之前清缓存的话，并发请求可能读到旧行并重新放回缓存，
+# 停用的用户或改掉的邮箱在 TTL 内仍然有效；因此在 after_commit 中清除
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for email in session.info.pop(_CHANGED_PRINCIPALS_KEY, ()):
+        invalidate_principal(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop(_CHANGED_PRINCIPALS_KEY, None)
+
+
+async def get_db():
+    """数据库会话依赖，配合 crud.aio 使用"""
+    if ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: DBSession = Depends(get_db)
+) -> Principal:
     """获取当前认证用户"""
+    return await authenticate_token(token, db)
+
+async def get_stream_user(
+    request: Request,
+    access_token: Optional[str] = Query(None, description="访问令牌；EventSource 不能设置请求头时使用"),
+    db: DBSession = Depends(get_db)
+) -> Principal:
+    """推送连接的认证用户：令牌取自 Authorization 头，或查询参数 access_token"""
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer":
+        token = access_token
+    return await authenticate_token(token or "", db)
+
+async def authenticate_token(token: str, db: DBSession) -> Principal:
+    """校验访问令牌并返回对应的用户，令牌无效或用户已停用时抛出 401"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+    # jose（连带 cryptography）导入较慢，第一次校验令牌时才导入
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_email: str = payload.get("sub")
@@ -34,8 +135,16 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = crud.get_user_by_email(db, email=user_email)
-    if user is None:
+
+    principal = principal_cache.get(user_email)
+    if principal is None:
+        user = await crud.aio.get_user_by_email(db, email=user_email)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        exp = payload.get("exp")
+        principal_cache.set(user_email, principal, ttl=exp - time.time() if exp else None)
+
+    if not principal.is_active:
         raise credentials_exception
-    return user
+    return principal
@@ -0,0 +1,220 @@
+"""
+开发环境的 SQL 诊断（DIAGNOSTICS=1 开启）
+
+- 记录每个请求执行的全部 SQL 及耗时，请求结束时以 INFO 级别输出摘要、DEBUG 级别输出明细
+- 耗时超过 SLOW_QUERY_MS 的语句以 WARNING 级别输出，并附带 EXPLAIN QUERY PLAN
+- 按路由设置查询条数预算（QUERY_BUDGETS，未列出的路由使用 QUERY_BUDGET_DEFAULT），
+  超出时输出警告；QUERY_BUDGET_STRICT=1 时在请求结束后抛出 QueryBudgetExceeded，
+  TestClient 会把它抛给调用方，测试因此失败
+
+直接调用 CRUD 函数时可以用 query_budget() 限定一段代码的查询条数。测试中使用
+conftest.py 提供的 db 和 max_queries fixture（引擎已调用 instrument_engine）：
+
+    def test_get_note(db, max_queries):
+        with max_queries(1):
+            crud.get_note_by_id(db, note_id, owner_id)
+
+生产环境不要开启：每条语句都会被记录，慢查询还会额外执行一次 EXPLAIN。
+"""
+import contextvars
+import logging
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from metrics import is_transaction_control, route_template
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTICS = os.getenv("DIAGNOSTICS", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "20"))
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "10"))
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+# 每个路由允许的最多 SQL 条数（BEGIN / COMMIT 不计），键为 "方法 路由模板"。
+# 需要登录的路由比实测多留 1 条：认证缓存未命中时会多一次用户查询。
+# 用 benchmarks/check_query_budgets.py 检查，确实需要增加查询时同步修改这里。
+QUERY_BUDGETS: Dict[str, int] = {
+    "POST /api/users/": 4,
+    "POST /api/users/login": 1,
+    "GET /api/users/me": 2,
+    "GET /api/folders/": 3,
+    "GET /api/folders/tree": 3,
+    "GET /api/folders/{folder_id}": 2,
+    "POST /api/folders/": 6,
+    "PUT /api/folders/{folder_id}": 5,
+    "DELETE /api/folders/{folder_id}": 7,
+    "GET /api/notes/": 3,
+    "GET /api/notes/search": 2,
+    "GET /api/notes/folder/{folder_id}": 4,
+    "GET /api/notes/{note_id}": 3,
+    # 写笔记的路由：笔记含中日韩文字时多 1 条（同步单字/双字索引）
+    "POST /api/notes/": 7,
+    "PUT /api/notes/{note_id}": 10,
+    "PATCH /api/notes/{note_id}": 10,
+    # 删除的笔记有附件时多 3 条（附件按内容分组、删除附件、减少内容的引用计数）
+    "DELETE /api/notes/{note_id}": 12,
+    "POST /api/notes/batch": 17,
+    "GET /api/notes/{note_id}/revisions": 3,
+    "GET /api/notes/{note_id}/revisions/{seq}": 3,
+    "POST /api/notes/{note_id}/revisions/{seq}/restore": 12,
+    "GET /api/stats": 4,
+    "GET /api/sync": 6,
+    "GET /api/export": 3,
+    # 索引需要更新时多 2~3 条（笔记按页读取，笔记很多的账户第一次建立索引时会超出）
+    "POST /api/assistant/retrieve": 6,
+    "POST /api/assistant/chat": 6,
+    "POST /api/attachments/": 7,
+    "GET /api/attachments/": 2,
+    "GET /api/attachments/{attachment_id}": 2,
+    "DELETE /api/attachments/{attachment_id}": 4,
+    "GET /health": 0,
+}
+
+# 只对这些语句执行 EXPLAIN QUERY PLAN
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def configure_logging() -> None:
+    """uvicorn 不为应用日志配置处理器，诊断模式下单独输出到 stderr"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s [diagnostics] %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(os.getenv("DIAGNOSTICS_LOG_LEVEL", "INFO"))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """查询条数超出预算"""
+
+
+class QueryRecord:
+    __slots__ = ("statement", "parameters", "seconds", "plan")
+
+    def __init__(self, statement: str, parameters, seconds: float, plan: Optional[List[str]] = None):
+        self.statement = statement
+        self.parameters = parameters
+        self.seconds = seconds
+        self.plan = plan
+
+
+class QueryLog(list):
+    """一个请求（或 query_budget 块）内执行的 QueryRecord 列表"""
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(record.seconds for record in self)
+
+    @property
+    def query_count(self) -> int:
+        """不含 BEGIN / COMMIT 等事务语句的条数"""
+        return sum(1 for record in self if not is_transaction_control(record.statement))
+
+
+_query_log: "contextvars.ContextVar[Optional[QueryLog]]" = contextvars.ContextVar("query_log", default=None)
+# 已注册记录事件的引擎（conftest.py 和 main.py 可能都会调用 instrument_engine）
+_instrumented: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    # 用新的 DBAPI 游标执行，不经过 SQLAlchemy，不会再次触发事件
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为引擎注册 SQL 记录事件；异步引擎传入 async_engine.sync_engine。重复调用不会重复记录"""
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("diagnostics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["diagnostics_start"].pop()
+        log = _query_log.get()
+        if log is None:
+            return
+        record = QueryRecord(statement, parameters, elapsed)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            if not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+                record.plan = _explain(conn, statement, parameters)
+            logger.warning(
+                "Slow query (%.1f ms): %s\n  params: %r\n  plan: %s",
+                elapsed * 1000, statement, parameters, "; ".join(record.plan or []) or "-"
+            )
+        log.append(record)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("diagnostics_start"):
+            conn.info["diagnostics_start"].pop()
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block") -> Iterator[QueryLog]:
+    """
+    限定代码块内执行的 SQL 条数，超出时抛出 QueryBudgetExceeded。
+    只统计当前上下文（及其派生的线程池任务）中的查询；需要先对引擎调用 instrument_engine。
+    """
+    log = QueryLog()
+    token = _query_log.set(log)
+    try:
+        yield log
+    finally:
+        _query_log.reset(token)
+    _check_budget(label, log, max_queries)
+
+
+def _check_budget(label: str, log: QueryLog, max_queries: int) -> None:
+    count = log.query_count
+    if count <= max_queries:
+        return
+    statements = "\n".join(f"  {i + 1}. {record.statement}" for i, record in enumerate(log))
+    raise QueryBudgetExceeded(f"{label}: {count} queries, budget {max_queries}\n{statements}")
+
+
+class DiagnosticsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog()
+        token = _query_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_log.reset(token)
+
+        label = f"{scope['method']} {route_template(scope)}"
+        budget = QUERY_BUDGETS.get(label, QUERY_BUDGET_DEFAULT)
+        logger.info("%s: %d queries, %.1f ms in SQL (budget %d)", label, log.query_count, log.total_seconds * 1000, budget)
+        for i, record in enumerate(log):
+            logger.debug("  %d. [%.2f ms] %s %r", i + 1, record.seconds * 1000, record.statement, record.parameters)
+        try:
+            _check_budget(label, log, budget)
+        except QueryBudgetExceeded as e:
+            # 响应已经发出；严格模式下抛出异常让测试失败
+            logger.warning("Query budget exceeded: %s", e)
+            if QUERY_BUDGET_STRICT:
+                raise
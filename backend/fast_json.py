@@ -0,0 +1,68 @@
+"""
+列表接口的快速 JSON 输出（FAST_JSON=1 开启）
+
+默认情况下路由返回的数据要先按 response_model 逐行校验（from_attributes），
+再由 Pydantic 序列化。列表接口的数据来自只选列的查询，字段与 schema 一一对应，
+逐行校验没有意义；开启后直接用 orjson 编码并返回 Response，跳过校验。
+response_model 保持不变，OpenAPI 文档不受影响。
+
+依赖 orjson，未安装时自动退回默认路径。
+"""
+import logging
+import os
+from typing import Any
+
+from fastapi import Response
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+if FAST_JSON and orjson is None:
+    logger.warning("FAST_JSON=1 but orjson is not installed, falling back to the default serializer")
+    FAST_JSON = False
+
+
+def _default(value: Any):
+    # 零散的 SQLAlchemy Row 按字段名转成 dict
+    if isinstance(value, Row):
+        return value._asdict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _rows_to_dicts(value: Any) -> Any:
+    # 同一查询的行字段名相同，只取一次，比逐行 _asdict() 快得多
+    if isinstance(value, list) and value and isinstance(value[0], Row):
+        keys = value[0]._fields
+        return [dict(zip(keys, row)) for row in value]
+    if isinstance(value, dict):
+        return {key: _rows_to_dicts(item) if isinstance(item, list) else item for key, item in value.items()}
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    """
+    编码为 JSON 字节。datetime 输出与 Pydantic 一致（naive 时间不带时区）。
+    """
+    return orjson.dumps(_rows_to_dicts(content), default=_default)
+
+
+def fast_response(content: Any, response: Response) -> Any:
+    """
+    FAST_JSON 开启时直接编码为 JSON 响应，并带上路由已经设置在 response 上的响应头；
+    否则原样返回 content，交给 FastAPI 按 response_model 校验和序列化。
+
+    content 中只能出现 dict、list、Row、基本类型和 datetime，字段必须与 response_model 一致。
+    """
+    if not FAST_JSON:
+        return content
+    fast = Response(content=dumps(content), media_type="application/json")
+    for name, value in response.headers.items():
+        if name != "content-length":
+            fast.headers[name] = value
+    return fast
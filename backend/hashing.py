@@ -0,0 +1,101 @@
+"""
+密码哈希服务
+
+bcrypt 每次计算要消耗 100~300ms CPU，直接放在请求线程里会占满 FastAPI 的线程池。
+这里把哈希和校验放到独立的进程池中执行，并限制排队深度：队列满时立即拒绝，
+由路由返回 503，而不是让登录洪峰拖慢其他接口。
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# bcrypt 成本因子，修改后旧密码会在用户下次登录时自动重新哈希
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 每个 worker 的哈希进程数：多 worker 部署（WEB_CONCURRENCY）时按 worker 数均分 CPU
+_CPUS_PER_WORKER = max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, _CPUS_PER_WORKER))))
+# 允许同时排队/执行的哈希任务数，超过则拒绝
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+
+
+class HashingBusyError(Exception):
+    """哈希队列已满"""
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context(rounds: int = BCRYPT_ROUNDS) -> "CryptContext":
+    # passlib/bcrypt 导入较慢，第一次用到时才导入，不拖慢 worker 启动
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+# 以下两个函数在子进程中执行，必须是模块级函数
+def _hash(password: str, rounds: int) -> str:
+    return get_pwd_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """有界的进程池哈希服务"""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn 避免在多线程的服务进程中 fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingBusyError("Password hashing queue is full")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        校验密码。
+
+        返回: (是否正确, 新哈希)。当哈希参数（如成本因子）已变更时，新哈希不为 None，
+        调用方应将其写回数据库。
+        """
+        return await self._submit(_verify_and_update, password, hashed_password, self.rounds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,75 @@
+"""
+HTTP 条件请求（ETag / If-None-Match、Last-Modified / If-Modified-Since）
+
+- 单个资源的 ETag 由 (类型, id, updated_at) 生成
+- 列表的 ETag 由用户的 change_seq（每次写笔记/文件夹时递增）和查询参数生成
+
+命中时路由直接返回 304，不再查询和序列化完整数据。
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# 浏览器每次使用缓存前都要带条件头回源校验
+CACHE_CONTROL = "private, no-cache"
+
+
+def resource_etag(kind: str, resource_id: int, updated_at: Optional[datetime]) -> str:
+    stamp = updated_at.isoformat() if updated_at else ""
+    digest = hashlib.sha1(f"{kind}:{resource_id}:{stamp}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def collection_etag(kind: str, owner_id: int, change_seq: int, query: str = "") -> str:
+    digest = hashlib.sha1(f"{kind}:{owner_id}:{change_seq}:{query}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def has_conditional_headers(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _http_date(value: datetime) -> str:
+    # 数据库中的时间是 UTC 的 naive datetime
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效。
+
+    If-None-Match 优先；只有没有该请求头时才比较 If-Modified-Since（精确到秒）。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # If-None-Match 使用弱比较
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
+    return False
+
+
+def set_cache_headers(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = _http_date(last_modified)
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag, last_modified)
+    return response
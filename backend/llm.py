@@ -0,0 +1,349 @@
+"""
+AI 助手的大模型调用（POST /api/assistant/chat）
+
+模型部署在 OpenAI 兼容的 /v1 接口之后（vLLM、llama.cpp server 等），这里以流式方式调用
+/chat/completions，把增量文本逐段交给路由转成 SSE。
+
+- 连接复用：每个 worker 一个 httpx.AsyncClient，keep-alive 连接池的大小与并发上限一致，
+  生成之间不重新建立 TCP/TLS 连接
+- 并发控制：GenerationLimiter 限制每个 worker 同时进行的生成数（LLM_MAX_CONCURRENCY）和
+  每个用户同时进行的生成数（LLM_MAX_PER_USER），超出的请求按到达顺序排队；队列满时立即
+  拒绝（路由返回 429），排队超过 LLM_QUEUE_TIMEOUT 秒放弃
+- 取消：客户端断开时 Starlette 取消响应生成器，stream_chat 退出时关闭上游连接，
+  vLLM / llama.cpp 发现连接断开后停止生成，不再为没人接收的回答占用 GPU
+- 指标：排队时间、首个 token 的延迟（time-to-first-token）、生成速度（tokens/s）、
+  按结果统计的生成数，见 metrics.py
+
+限制只在本进程内生效；多 worker 部署时全局上限为 LLM_MAX_CONCURRENCY × worker 数。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+
+from metrics import (
+    LLM_ACTIVE,
+    LLM_COMPLETION_TOKENS,
+    LLM_GENERATIONS,
+    LLM_QUEUE_WAIT,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS_PER_SECOND,
+    LLM_WAITING,
+)
+
+logger = logging.getLogger(__name__)
+
+# OpenAI 兼容接口的地址（包含 /v1）、密钥和模型名
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8000/v1")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_MODEL = os.getenv("LLM_MODEL", "default")
+# 建立连接的超时，以及两段输出之间最长等待的时间（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+# 请求没有指定 max_tokens 时的默认值
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+# 每个 worker 同时进行的生成数，以及每个用户同时进行的生成数
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_PER_USER = int(os.getenv("LLM_MAX_PER_USER", "2"))
+# 排队的请求数上限（全部用户 / 每个用户），超过后直接拒绝
+LLM_MAX_WAITING = int(os.getenv("LLM_MAX_WAITING", "64"))
+LLM_MAX_WAITING_PER_USER = int(os.getenv("LLM_MAX_WAITING_PER_USER", "4"))
+# 排队超过该秒数放弃
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+# 连接池中保留的空闲 keep-alive 连接的时间（秒）
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+
+class LLMError(Exception):
+    """生成失败，消息可以直接返回给客户端"""
+
+
+class QueueFull(LLMError):
+    """排队的请求已达上限"""
+
+
+class QueueTimeout(LLMError):
+    """排队超时"""
+
+
+class UpstreamError(LLMError):
+    """模型服务不可用或返回了错误"""
+
+
+# --- 并发控制 ---
+
+class Ticket:
+    """一次生成在限流器中的位置：排队中 → 执行中 → 结束"""
+    __slots__ = ("owner_id", "future", "state", "queued_at")
+
+    WAITING, ACTIVE, DONE = "waiting", "active", "done"
+
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.future: Optional[asyncio.Future] = None
+        self.state = Ticket.WAITING
+        self.queued_at = time.perf_counter()
+
+    @property
+    def waiting(self) -> bool:
+        return self.state == Ticket.WAITING
+
+
+class GenerationLimiter:
+    """
+    全局和每用户两级并发上限，超出的请求按到达顺序排队（FIFO）。
+
+    某个用户达到自己的上限时，他排队的请求不会挡住其他用户：放行时跳过这些请求，
+    把空出的名额交给后面第一个可以执行的请求。所有方法都在事件循环线程中调用，不需要加锁；
+    等待用的 Future 在排队时才创建，限流器本身不绑定事件循环。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_per_user: int = LLM_MAX_PER_USER,
+        max_waiting: int = LLM_MAX_WAITING,
+        max_waiting_per_user: int = LLM_MAX_WAITING_PER_USER
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_waiting = max_waiting
+        self.max_waiting_per_user = max_waiting_per_user
+        self.active = 0
+        self._active_by_owner: Dict[int, int] = {}
+        self._waiting_by_owner: Dict[int, int] = {}
+        self._waiters: Deque[Ticket] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _can_start(self, owner_id: int) -> bool:
+        return self.active < self.max_concurrency and self._active_by_owner.get(owner_id, 0) < self.max_per_user
+
+    def _start(self, ticket: Ticket) -> None:
+        ticket.state = Ticket.ACTIVE
+        self.active += 1
+        self._active_by_owner[ticket.owner_id] = self._active_by_owner.get(ticket.owner_id, 0) + 1
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - ticket.queued_at)
+
+    def _remove_waiter(self, ticket: Ticket) -> None:
+        self._waiters.remove(ticket)
+        remaining = self._waiting_by_owner[ticket.owner_id] - 1
+        if remaining:
+            self._waiting_by_owner[ticket.owner_id] = remaining
+        else:
+            del self._waiting_by_owner[ticket.owner_id]
+
+    def _update_gauges(self) -> None:
+        LLM_ACTIVE.set(self.active)
+        LLM_WAITING.set(len(self._waiters))
+
+    def enqueue(self, owner_id: int) -> Ticket:
+        """
+        申请一个生成名额：有空闲名额时立即获得，否则排队。
+
+        每次归还名额都会放行所有可以执行的排队请求，所以这里有空闲名额时，排队的
+        请求都是被各自用户的上限挡住的，新请求直接执行不会插到它们前面。
+        抛出: QueueFull —— 排队的请求数达到上限
+        """
+        ticket = Ticket(owner_id)
+        if self._can_start(owner_id):
+            self._start(ticket)
+        else:
+            if len(self._waiters) >= self.max_waiting or self._waiting_by_owner.get(owner_id, 0) >= self.max_waiting_per_user:
+                LLM_GENERATIONS.inc(("rejected",))
+                raise QueueFull("Too many pending assistant requests")
+            ticket.future = asyncio.get_running_loop().create_future()
+            self._waiters.append(ticket)
+            self._waiting_by_owner[owner_id] = self._waiting_by_owner.get(owner_id, 0) + 1
+        self._update_gauges()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """排队请求前面还有几个请求（从 1 开始），已开始执行时为 0"""
+        if not ticket.waiting:
+            return 0
+        return self._waiters.index(ticket) + 1
+
+    async def wait(self, ticket: Ticket, timeout: float = LLM_QUEUE_TIMEOUT) -> None:
+        """
+        等待排队的请求获得名额，已获得时立即返回。
+
+        抛出: QueueTimeout —— 超时（名额已归还，不需要再调用 release）
+        """
+        if not ticket.waiting:
+            return
+        try:
+            # shield：超时不取消 Future，放行和超时同时发生时可以分辨出来
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except asyncio.TimeoutError:
+            self.release(ticket)
+            LLM_GENERATIONS.inc(("timeout",))
+            raise QueueTimeout("Timed out waiting for the assistant")
+
+    def release(self, ticket: Ticket) -> None:
+        """结束一次生成或放弃排队；可以重复调用"""
+        if ticket.state == Ticket.ACTIVE:
+            self.active -= 1
+            remaining = self._active_by_owner[ticket.owner_id] - 1
+            if remaining:
+                self._active_by_owner[ticket.owner_id] = remaining
+            else:
+                del self._active_by_owner[ticket.owner_id]
+        elif ticket.state == Ticket.WAITING:
+            self._remove_waiter(ticket)
+        ticket.state = Ticket.DONE
+        self._dispatch()
+        self._update_gauges()
+
+    def _dispatch(self) -> None:
+        """按排队顺序放行可以执行的请求"""
+        if self.active >= self.max_concurrency:
+            return
+        for ticket in list(self._waiters):
+            if self._can_start(ticket.owner_id):
+                self._remove_waiter(ticket)
+                self._start(ticket)
+                ticket.future.set_result(None)
+                if self.active >= self.max_concurrency:
+                    break
+
+
+# --- 上游调用 ---
+
+class GenerationStats:
+    """一次生成的结果，stream_chat 结束后填好"""
+    __slots__ = ("finish_reason", "completion_tokens", "time_to_first_token", "tokens_per_second")
+
+    def __init__(self):
+        self.finish_reason: Optional[str] = None
+        self.completion_tokens = 0
+        self.time_to_first_token: Optional[float] = None
+        self.tokens_per_second: Optional[float] = None
+
+
+class LLMClient:
+    """OpenAI 兼容接口的流式客户端，连接池在第一次调用时创建，close 时关闭"""
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: str = LLM_API_KEY,
+        model: str = LLM_MODEL,
+        max_connections: int = LLM_MAX_CONCURRENCY
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # 连接池绑定创建它的事件循环，因此在请求中创建，而不是在导入或启动时（不拖慢 worker 启动）
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                )
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def stream_chat(
+        self,
+        messages: List[dict],
+        stats: GenerationStats,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成回答，逐段返回增量文本；结束后 stats 中是结束原因、token 数和速度。
+
+        上游没有返回 usage 时按收到的内容块数估计 token 数（vLLM、llama.cpp 每块一个 token）。
+        抛出: UpstreamError
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "max_tokens": max_tokens or LLM_MAX_TOKENS,
+        }
+        if temperature is not None:
+            payload["temperature"] = temperature
+
+        # 第一次调用时创建连接池（SSL 上下文要几十到几百毫秒），不计入首 token 延迟
+        client = self._get_client()
+        status = "error"
+        chunks = 0
+        usage_tokens = None
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            async with client.stream("POST", "/chat/completions", json=payload) as response:
+                if response.status_code != 200:
+                    detail = (await response.aread())[:200].decode("utf-8", "replace")
+                    logger.warning("LLM upstream returned %d: %s", response.status_code, detail)
+                    raise UpstreamError(f"Assistant model returned HTTP {response.status_code}")
+                # 读到响应结束而不是在 [DONE] 处跳出：没读完的响应会让 httpx 关闭连接，无法复用
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        continue
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        usage_tokens = chunk["usage"].get("completion_tokens")
+                    for choice in chunk.get("choices") or ():
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            chunks += 1
+                            yield text
+                        if choice.get("finish_reason"):
+                            stats.finish_reason = choice["finish_reason"]
+            status = "completed"
+        except asyncio.CancelledError:
+            # 客户端断开：退出 async with 时关闭上游连接，模型服务随之停止生成
+            status = "cancelled"
+            raise
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning("LLM upstream request failed: %r", exc)
+            raise UpstreamError("Assistant model is unavailable") from exc
+        finally:
+            finished = time.perf_counter()
+            stats.completion_tokens = usage_tokens if usage_tokens is not None else chunks
+            LLM_GENERATIONS.inc((status,))
+            LLM_COMPLETION_TOKENS.inc(amount=stats.completion_tokens)
+            if first_token_at is not None:
+                stats.time_to_first_token = first_token_at - started
+                LLM_TIME_TO_FIRST_TOKEN.observe(stats.time_to_first_token)
+                # 生成速度只算首个 token 之后的解码阶段，不含排队和 prefill
+                if stats.completion_tokens > 1 and finished > first_token_at:
+                    stats.tokens_per_second = (stats.completion_tokens - 1) / (finished - first_token_at)
+                    LLM_TOKENS_PER_SECOND.observe(stats.tokens_per_second)
+
+
+generation_limiter = GenerationLimiter()
+llm_client = LLMClient()
@@ -1,20 +1,85 @@
 # 修复版本
+import time
+
+# worker 启动计时的起点（time-to-first-request 从这里算起）
+_boot_started = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from routers import users_router, notes_router, folders_router
-from database import create_tables
+from routers import users_router, notes_router, folders_router, backup_router, stats_router, sync_router, events_router, assistant_router, attachments_router, monitoring_router
+from attachments import BlobCollector
+from bus import BusPoller
+from change_feed import hub as change_hub
+from compression import CompressionMiddleware
+import diagnostics
+from database import ASYNC_DB, async_engine, create_tables, engine
+from hashing import password_hasher
+from llm import llm_client
+from retrieval import index_manager
+from metrics import METRICS_ENABLED, MetricsMiddleware, instrument_engine, record_startup
 from models import folder
 from models import user
 from models import note
+from models import attachment
+
+# uvicorn 为自己的 logger 配置了输出，启动信息借用它
+logger = logging.getLogger("uvicorn.error")
+
+# SQL 计时（/metrics 中的 db_* 指标）
+if METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    if ASYNC_DB:
+        instrument_engine(async_engine.sync_engine, "async")
+
+# 开发环境的 SQL 诊断：逐条记录、慢查询 EXPLAIN、按路由的查询条数预算
+if diagnostics.DIAGNOSTICS:
+    diagnostics.configure_logging()
+    diagnostics.instrument_engine(engine)
+    if ASYNC_DB:
+        diagnostics.instrument_engine(async_engine.sync_engine)
+
 
-# ✅ 在主应用启动时调用，此时所有模型都已导入
-create_tables() 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动：建表/迁移（只有第一个 worker 真正执行，其余 worker 只做一次只读检查），
+    开始轮询跨 worker 的失效通知，启动实时变更推送和附件的定期垃圾回收。
+    关闭：结束推送连接，关闭模型服务的连接池，停止轮询、垃圾回收和哈希进程池，释放检索索引和数据库连接。
+    """
+    started = time.perf_counter()
+    migrated = await run_in_threadpool(create_tables)
+    bus_poller = BusPoller(engine)
+    await bus_poller.start()
+    blob_collector = BlobCollector()
+    await blob_collector.start()
+    change_hub.start()
+    import_seconds, lifespan_seconds = started - _boot_started, time.perf_counter() - started
+    record_startup(_boot_started, import_seconds, lifespan_seconds)
+    logger.info(
+        "Worker started: import %.0f ms, startup %.0f ms%s",
+        import_seconds * 1000, lifespan_seconds * 1000, " (schema created/upgraded)" if migrated else ""
+    )
+    yield
+    change_hub.stop()
+    await llm_client.close()
+    await bus_poller.stop()
+    await blob_collector.stop()
+    password_hasher.shutdown()
+    index_manager.close()
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
 
 
 app = FastAPI(
     title="笔记应用 API",
     description="完整的笔记管理系统",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS 中间件
@@ -24,12 +89,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
+# 响应压缩（gzip，安装 brotli / zstandard 后还支持 br / zstd）
+app.add_middleware(CompressionMiddleware)
+# 请求计数与耗时，放在最外层，统计包含压缩在内的完整处理时间
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if diagnostics.DIAGNOSTICS:
+    app.add_middleware(diagnostics.DiagnosticsMiddleware)
 
 # 包含路由
 app.include_router(users_router, prefix="/api")
 app.include_router(folders_router, prefix="/api")
 app.include_router(notes_router, prefix="/api")
+app.include_router(backup_router, prefix="/api")
+app.include_router(stats_router, prefix="/api")
+app.include_router(sync_router, prefix="/api")
+app.include_router(events_router, prefix="/api")
+app.include_router(assistant_router, prefix="/api")
+app.include_router(attachments_router, prefix="/api")
+app.include_router(monitoring_router)
 
 @app.get("/")
 async def root():
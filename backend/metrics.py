@@ -0,0 +1,384 @@
+"""
+请求级性能指标（Prometheus 文本格式，由 /metrics 输出）
+
+- http_requests_total / http_request_duration_seconds：按方法、路由模板（如 /api/notes/{note_id}）统计
+- http_requests_in_flight：正在处理的请求数
+- threadpool_*：anyio 默认线程池（同步 CRUD、认证等）的容量、占用和排队数，用于判断是否饱和
+- db_queries_per_request：每个请求执行的 SQL 条数，N+1 查询会表现为分布右移
+- db_query_duration_seconds：单条 SQL 的耗时
+- db_pool_checked_out：连接池中已借出的连接数
+- llm_*：AI 助手的生成数（按结果）、排队时间、首个 token 的延迟和生成速度（见 llm.py）
+
+SQL 统计来自引擎的 before_cursor_execute / after_cursor_execute 事件，通过 contextvar
+归属到当前请求（线程池和写队列中执行的查询同样计入）。
+
+指标只保存在本进程内；多个 worker 时每个进程各自统计。不依赖 prometheus_client。
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import anyio.to_thread
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LLM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0)
+LLM_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Gauge(_Metric):
+    """
+    可增减的数值。传入 function 时在输出时调用它取值（返回 {labels: value}），
+    用于线程池、连接池这类只需要在抓取时读取的状态。
+    """
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Dict[Labels, float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._function = function
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            items = sorted(self._function().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [各桶计数（不累加，最后一个是 +Inf）, 总和]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ("le",), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """输出所有指标。包含线程池指标，必须在事件循环中调用"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+
+# --- 线程池 / 连接池 ---
+
+def _threadpool_stats() -> Tuple[int, int, int]:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return limiter.total_tokens, statistics.borrowed_tokens, statistics.tasks_waiting
+
+
+# 已接入统计的引擎：名称 -> Engine
+_engines: Dict[str, Engine] = {}
+
+
+def _pool_checked_out() -> Dict[Labels, float]:
+    values = {}
+    for name, engine in _engines.items():
+        checkedout = getattr(engine.pool, "checkedout", None)
+        if checkedout is not None:
+            values[(name,)] = checkedout()
+    return values
+
+
+# --- 指标定义 ---
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status code.",
+    ("method", "route", "status")
+))
+HTTP_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency including the response body.",
+    ("method", "route")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed."
+))
+THREADPOOL_CAPACITY = registry.register(Gauge(
+    "threadpool_capacity", "Worker threads available to the default anyio threadpool.",
+    function=lambda: {(): _threadpool_stats()[0]}
+))
+THREADPOOL_IN_USE = registry.register(Gauge(
+    "threadpool_in_use", "Threadpool workers currently running a task.",
+    function=lambda: {(): _threadpool_stats()[1]}
+))
+THREADPOOL_WAITING = registry.register(Gauge(
+    "threadpool_waiting", "Tasks waiting for a free threadpool worker.",
+    function=lambda: {(): _threadpool_stats()[2]}
+))
+DB_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of individual SQL statements.",
+    ("engine",), buckets=QUERY_DURATION_BUCKETS
+))
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool.",
+    ("engine",), function=_pool_checked_out
+))
+
+LLM_GENERATIONS = registry.register(Counter(
+    "llm_generations_total",
+    "Assistant generations by outcome: completed, cancelled, error, rejected (queue full), timeout (queued too long).",
+    ("status",)
+))
+LLM_COMPLETION_TOKENS = registry.register(Counter(
+    "llm_completion_tokens_total", "Completion tokens streamed from the model."
+))
+LLM_ACTIVE = registry.register(Gauge(
+    "llm_generations_active", "Assistant generations currently streaming from the model."
+))
+LLM_WAITING = registry.register(Gauge(
+    "llm_generations_waiting", "Assistant requests queued for a generation slot."
+))
+LLM_QUEUE_WAIT = registry.register(Histogram(
+    "llm_queue_wait_seconds", "Time an assistant request waited for a generation slot.",
+    buckets=LLM_LATENCY_BUCKETS
+))
+LLM_TIME_TO_FIRST_TOKEN = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from sending the upstream request to the first content token.",
+    buckets=LLM_LATENCY_BUCKETS
+))
+LLM_TOKENS_PER_SECOND = registry.register(Histogram(
+    "llm_tokens_per_second", "Decode speed of a generation: tokens after the first one per second.",
+    buckets=LLM_RATE_BUCKETS
+))
+
+
+APP_STARTUP = registry.register(Gauge(
+    "app_startup_seconds", "Worker startup time by phase: import of main, lifespan startup.",
+    ("phase",)
+))
+APP_FIRST_REQUEST = registry.register(Gauge(
+    "app_time_to_first_request_seconds", "Seconds from importing main to the first completed request."
+))
+
+# main 开始导入的时间（perf_counter），由 record_startup 设置；首个请求完成后清空
+_boot_started: Optional[float] = None
+
+
+def record_startup(boot_started: float, import_seconds: float, lifespan_seconds: float) -> None:
+    """记录 worker 启动各阶段的耗时，首个请求完成时再记录 time-to-first-request"""
+    global _boot_started
+    _boot_started = boot_started
+    APP_STARTUP.set(import_seconds, ("import",))
+    APP_STARTUP.set(lifespan_seconds, ("lifespan",))
+
+
+# --- 按请求统计 SQL ---
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_request_stats: "contextvars.ContextVar[Optional[RequestStats]]" = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """当前请求的 SQL 统计，不在请求中时返回 None"""
+    return _request_stats.get()
+
+
+_TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+def is_transaction_control(statement: str) -> bool:
+    """BEGIN / COMMIT 等事务语句不计入每请求的查询条数"""
+    return statement.lstrip()[:9].upper().startswith(_TRANSACTION_CONTROL)
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """为引擎注册 SQL 计时事件；异步引擎传入 async_engine.sync_engine"""
+    _engines[name] = engine
+    labels = (name,)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_DURATION.observe(elapsed, labels)
+        stats = _request_stats.get()
+        if stats is not None and not is_transaction_control(statement):
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # 执行失败时不会触发 after_cursor_execute，丢弃对应的开始时间
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def route_template(scope: Scope) -> str:
+    # 用路由模板而不是实际路径作为标签，避免标签数量随 ID 增长。
+    # 新版 FastAPI 中 include_router 的路由保留相对路径，带前缀的完整模板在 effective_route_context 里
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(effective, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        global _boot_started
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            end = time.perf_counter()
+            elapsed = end - start
+            if _boot_started is not None:
+                APP_FIRST_REQUEST.set(end - _boot_started)
+                _boot_started = None
+            HTTP_IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            method, route = scope["method"], route_template(scope)
+            HTTP_REQUESTS.inc((method, route, str(status_code)))
+            HTTP_DURATION.observe(elapsed, (method, route))
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, (method, route))
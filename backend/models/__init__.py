@@ -2,6 +2,9 @@ from .base import BaseModel
 from .user import User
 from .note import Note
 from .folder import Folder
+from .revision import NoteRevision
+from .tombstone import Tombstone
+from .attachment import Blob, Attachment
 
 # 导出所有模型，方便其他地方导入
-__all__ = ["BaseModel", "User", "Note", "Folder"]
+__all__ = ["BaseModel", "User", "Note", "Folder", "NoteRevision", "Tombstone", "Blob", "Attachment"]
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Index
+from .base import BaseModel
+
+class Blob(BaseModel):
+    """
+    附件的内容，按 SHA-256 存放在磁盘上（路径见 attachments/store.py）。
+
+    内容相同的附件共用一行和一个文件，ref_count 是引用它的 attachments 行数，
+    由增删附件的事务增量维护。ref_count 降为 0 时 updated_at 即变为无人引用的时间，
+    垃圾回收在宽限期之后删除行和文件。
+    """
+    __tablename__ = "blobs"
+    __table_args__ = (
+        Index("ix_blobs_sha256", "sha256", unique=True),
+        # 垃圾回收：WHERE ref_count = 0 AND updated_at < ?
+        Index("ix_blobs_ref_count_updated", "ref_count", "updated_at"),
+    )
+
+    sha256 = Column(String(64), nullable=False, comment="内容的 SHA-256（十六进制）")
+    size = Column(BigInteger, nullable=False, comment="字节数")
+    ref_count = Column(Integer, nullable=False, default=0, comment="引用该内容的附件数")
+
+    def __repr__(self):
+        return f"<Blob(sha256='{self.sha256[:12]}', size={self.size}, ref_count={self.ref_count})>"
+
+
+class Attachment(BaseModel):
+    """笔记的附件（图片、文件），内容在 blobs 中"""
+    __tablename__ = "attachments"
+    __table_args__ = (
+        # 笔记的附件列表 / 删除笔记时：WHERE note_id = ?
+        Index("ix_attachments_note", "note_id"),
+        # 对账引用计数：GROUP BY blob_id
+        Index("ix_attachments_blob", "blob_id"),
+    )
+
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, comment="笔记ID")
+    blob_id = Column(Integer, ForeignKey("blobs.id"), nullable=False, comment="内容ID")
+    filename = Column(String(255), nullable=False, comment="上传时的文件名")
+    content_type = Column(String(100), nullable=False, comment="MIME 类型")
+
+    def __repr__(self):
+        return f"<Attachment(id={self.id}, note_id={self.note_id}, filename='{self.filename}')>"
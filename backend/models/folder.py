@@ -1,9 +1,15 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 class Folder(BaseModel):
     __tablename__ = "folders"
+    __table_args__ = (
+        # 目录树/子树：WHERE owner_id = ? AND path >= ? AND path < ?
+        Index("ix_folders_owner_path", "owner_id", "path"),
+        # 增量同步：WHERE owner_id = ? AND change_seq > ? ORDER BY change_seq, id
+        Index("ix_folders_owner_change_seq", "owner_id", "change_seq"),
+    )
 
     name = Column(String(100), nullable=False, comment="文件夹名称")
     description = Column(String(500), comment="文件夹描述")
@@ -11,11 +17,22 @@ class Folder(BaseModel):
     is_default = Column(Boolean, default=False, comment="是否为默认文件夹")
     
     # 外键
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True, comment="用户ID")
+    parent_id = Column(Integer, ForeignKey("folders.id"), nullable=True, comment="父文件夹ID")
+    # 物化路径：从根到自身的ID序列，如 "/3/17/42/"，子树查询是一次索引范围扫描
+    path = Column(String(500), nullable=False, default="", server_default="", comment="物化路径")
+    # 最后一次修改时用户的 change_seq（不含下面的冗余计数），由 crud 在写事务中设置
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0", comment="修改版本号")
+
+    # 冗余计数，由 crud/note.py 在写笔记的事务中维护（不含子文件夹）
+    note_count = Column(Integer, nullable=False, default=0, server_default="0", comment="笔记数")
+    last_note_updated_at = Column(DateTime, nullable=True, comment="最近一次笔记更新时间")
+    total_content_bytes = Column(Integer, nullable=False, default=0, server_default="0", comment="笔记正文总字节数(UTF-8)")
     
     # 关系定义
     owner = relationship("User", back_populates="folders")
     notes = relationship("Note", back_populates="folder")
+    parent = relationship("Folder", remote_side="Folder.id")
 
     def __repr__(self):
         return f"<Folder(id={self.id}, name='{self.name}', owner_id={self.owner_id})>"
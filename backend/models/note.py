@@ -1,15 +1,25 @@
-from sqlalchemy import Column, String, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 class Note(BaseModel):
     __tablename__ = "notes"
+    __table_args__ = (
+        # 列表/分页：WHERE owner_id = ? ORDER BY updated_at, id
+        Index("ix_notes_owner_updated", "owner_id", "updated_at"),
+        # 文件夹内列表：WHERE owner_id = ? AND folder_id = ? ORDER BY updated_at, id
+        Index("ix_notes_owner_folder_updated", "owner_id", "folder_id", "updated_at"),
+        # 增量同步：WHERE owner_id = ? AND change_seq > ? ORDER BY change_seq, id
+        Index("ix_notes_owner_change_seq", "owner_id", "change_seq"),
+    )
 
     title = Column(String(200), nullable=False, comment="笔记标题")
     content = Column(Text, comment="笔记内容")
     # 外键
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
     folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True, comment="文件夹ID")
+    # 最后一次修改时用户的 change_seq，由 crud 在写事务中设置
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0", comment="修改版本号")
     
     # 关系定义
     owner = relationship("User", back_populates="notes")
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, LargeBinary, Index
+from .base import BaseModel
+
+class NoteRevision(BaseModel):
+    """
+    笔记的历史版本（不含当前版本，当前版本就是 notes 中的行）。
+
+    为了让每次保存只写入很少的数据，大部分版本只存一个压缩的反向差异：
+    从下一个更新的版本（最新的一条则是笔记当前内容）还原出本版本。每隔若干条
+    存一份完整快照（kind = "full"），还原任何版本最多应用 REVISION_KEYFRAME_INTERVAL
+    个差异。编码和保留策略见 crud/revision.py。
+    """
+    __tablename__ = "note_revisions"
+    __table_args__ = (
+        # 列表/还原：WHERE note_id = ? ORDER BY seq
+        Index("ix_note_revisions_note_seq", "note_id", "seq", unique=True),
+    )
+
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, comment="笔记ID")
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
+    seq = Column(Integer, nullable=False, comment="版本号，同一笔记内递增")
+    kind = Column(String(5), nullable=False, comment="full: 完整快照；delta: 相对下一个版本的差异")
+    # kind = "delta" 时，从上一个完整快照（更旧的一侧）数起连续的差异条数，用于决定何时存快照
+    run = Column(Integer, nullable=False, default=0, comment="连续差异条数")
+    title = Column(String(200), nullable=False, comment="该版本的标题")
+    data = Column(LargeBinary, nullable=False, comment="zlib 压缩的正文或差异")
+    content_bytes = Column(Integer, nullable=False, default=0, comment="该版本正文字节数(UTF-8)")
+    saved_at = Column(DateTime, nullable=False, comment="该版本的保存时间")
+
+    def __repr__(self):
+        return f"<NoteRevision(note_id={self.note_id}, seq={self.seq}, kind='{self.kind}')>"
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
+from .base import BaseModel
+
+class Tombstone(BaseModel):
+    """
+    被删除的笔记/文件夹的记录，增量同步（GET /api/sync）据此告诉客户端哪些数据已不存在。
+
+    created_at 即删除时间。超过保留期的记录由 python -m database prune-tombstones 清理，
+    清理时把用户的 sync_floor 推进到被清理记录的最大 change_seq。
+    """
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        # 增量同步：WHERE owner_id = ? AND change_seq > ? ORDER BY change_seq, id
+        Index("ix_tombstones_owner_change_seq", "owner_id", "change_seq"),
+    )
+
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
+    kind = Column(String(10), nullable=False, comment="note 或 folder")
+    object_id = Column(Integer, nullable=False, comment="被删除的笔记/文件夹ID")
+    change_seq = Column(Integer, nullable=False, comment="删除时用户的 change_seq")
+
+    def __repr__(self):
+        return f"<Tombstone(kind='{self.kind}', object_id={self.object_id}, change_seq={self.change_seq})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Text
+from sqlalchemy import Column, String, Boolean, Text, Integer, DateTime
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -6,9 +6,17 @@ class User(BaseModel):
     __tablename__ = "users"
 
     username = Column(String(50), unique=True, nullable=False)
-    email = Column(String(100), unique=False, nullable=False)
+    email = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    # 该用户笔记/文件夹数据的版本号，每次写入时递增
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # 已清理的删除记录中最大的 change_seq，早于它的增量同步需要全量重新同步
+    sync_floor = Column(Integer, nullable=False, default=0, server_default="0")
+    # 账户级冗余计数（包含不在任何文件夹中的笔记），与 folders 上的计数一起维护
+    note_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_note_updated_at = Column(DateTime, nullable=True)
+    total_content_bytes = Column(Integer, nullable=False, default=0, server_default="0")
 
     # 关系定义
     notes = relationship("Note", back_populates="owner", cascade="all, delete-orphan")
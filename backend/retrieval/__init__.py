@@ -0,0 +1,24 @@
+"""
+笔记检索（供 AI 助手使用）
+
+笔记切分为片段（chunking），由可替换的嵌入模型（embedders）转为向量，
+每个用户的向量存放在内存映射的 float32 矩阵中（store），由 index_manager
+按 change_seq 增量更新并检索。
+"""
+from .hooks import mark_stale
+from .chunking import Chunk, chunk_note
+from .embedders import Embedder, HashingEmbedder, get_embedder
+from .store import VectorStore
+from .manager import IndexManager, index_manager
+
+__all__ = [
+    'mark_stale',
+    'Chunk',
+    'chunk_note',
+    'Embedder',
+    'HashingEmbedder',
+    'get_embedder',
+    'VectorStore',
+    'IndexManager',
+    'index_manager'
+]
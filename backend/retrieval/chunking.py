@@ -0,0 +1,61 @@
+"""
+把笔记切分为检索片段
+
+按空行分段，相邻段落合并到不超过 CHUNK_CHARS 个字符；单个段落过长时按固定窗口切分，
+窗口之间重叠 CHUNK_OVERLAP 个字符，避免句子被切断后两边都检索不到。
+
+片段只记录在正文中的位置 [start, end)，检索结果返回时再从笔记正文中截取，
+索引文件里不保存正文副本。嵌入的文本带上标题，标题中的词对每个片段都有效。
+"""
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+CHUNK_CHARS = int(os.getenv("ASSISTANT_CHUNK_CHARS", "800"))
+CHUNK_OVERLAP = int(os.getenv("ASSISTANT_CHUNK_OVERLAP", "100"))
+
+# 非空段落：到下一个空行（或结尾）为止
+_PARAGRAPH = re.compile(r"\S(?:.|\n(?![ \t]*\n))*", re.MULTILINE)
+
+
+class Chunk(NamedTuple):
+    start: int
+    end: int
+    # 用于嵌入的文本：标题 + 片段
+    text: str
+
+
+def _windows(start: int, end: int) -> List[tuple]:
+    step = max(1, CHUNK_CHARS - CHUNK_OVERLAP)
+    spans = []
+    for position in range(start, end, step):
+        spans.append((position, min(position + CHUNK_CHARS, end)))
+        if position + CHUNK_CHARS >= end:
+            break
+    return spans
+
+
+def chunk_note(title: str, content: Optional[str]) -> List[Chunk]:
+    """
+    切分一篇笔记。没有正文的笔记返回一个只含标题的空片段 (0, 0)，仍然可以按标题检索到。
+    """
+    content = content or ""
+    spans = []
+    current = None
+    for match in _PARAGRAPH.finditer(content):
+        start, end = match.span()
+        if end - start > CHUNK_CHARS:
+            if current:
+                spans.append(current)
+                current = None
+            spans.extend(_windows(start, end))
+        elif current and end - current[0] > CHUNK_CHARS:
+            spans.append(current)
+            current = (start, end)
+        else:
+            current = (current[0] if current else start, end)
+    if current:
+        spans.append(current)
+    if not spans:
+        return [Chunk(0, 0, title)]
+    return [Chunk(start, end, f"{title}\n{content[start:end]}") for start, end in spans]
@@ -0,0 +1,97 @@
+"""
+文本嵌入
+
+Embedder 把一组文本转成 L2 归一化的 float32 向量，检索时用内积作为余弦相似度。
+默认的 HashingEmbedder 不需要模型文件：英文/数字按词、中文按单字和相邻两字，
+特征经 CRC32 哈希到固定维度（符号也由哈希决定，减少冲突带来的偏差），
+词频取对数。结果是确定的，适合测试和没有 GPU 的部署。
+
+ASSISTANT_EMBEDDER 可以指定为 "模块:工厂函数"，工厂函数无参数、返回 Embedder，
+例如接入 vLLM 等 OpenAI 兼容服务的嵌入接口。更换嵌入模型（name 或 dim 变化）后
+已有索引会自动重建。
+"""
+import importlib
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+ASSISTANT_EMBEDDER = os.getenv("ASSISTANT_EMBEDDER", "hashing")
+ASSISTANT_EMBEDDING_DIM = int(os.getenv("ASSISTANT_EMBEDDING_DIM", "512"))
+
+# 英文单词/数字，或连续的中日韩文字
+_TOKEN = re.compile(r"[a-z0-9_]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_SIGN_BIT = np.uint32(0x80000000)
+
+
+class Embedder:
+    """嵌入模型接口"""
+
+    # 写入索引文件，用于判断索引是否由同一个模型生成
+    name: str = "embedder"
+    dim: int = 0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """返回 (len(texts), dim) 的 float32 矩阵，每行 L2 归一化（空文本为零向量）"""
+        raise NotImplementedError
+
+
+def _features(text: str) -> Iterable[str]:
+    for token in _TOKEN.findall(text.lower()):
+        if token.isascii():
+            yield token
+            continue
+        # 中文没有空格分词：单字 + 相邻两字
+        yield from token
+        for index in range(len(token) - 1):
+            yield token[index:index + 2]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+class HashingEmbedder(Embedder):
+    """特征哈希嵌入（见模块说明）"""
+
+    def __init__(self, dim: int = ASSISTANT_EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(_features(text))
+            if not counts:
+                continue
+            keys = np.fromiter(
+                (zlib.crc32(feature.encode()) for feature in counts), dtype=np.uint32, count=len(counts)
+            )
+            weights = np.fromiter(
+                (1.0 + math.log(count) for count in counts.values()), dtype=np.float32, count=len(counts)
+            )
+            weights[(keys & _SIGN_BIT) != 0] *= -1
+            np.add.at(vectors[row], keys % self.dim, weights)
+        return normalize(vectors)
+
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    """按 ASSISTANT_EMBEDDER 创建（并缓存）嵌入模型"""
+    global _embedder
+    if _embedder is None:
+        if ASSISTANT_EMBEDDER == "hashing":
+            _embedder = HashingEmbedder()
+        else:
+            module_name, _, factory = ASSISTANT_EMBEDDER.partition(":")
+            _embedder = getattr(importlib.import_module(module_name), factory)()
+    return _embedder
@@ -0,0 +1,48 @@
+"""
+笔记写入后通知检索索引
+
+crud 在写事务中调用 mark_stale 登记正文可能变化的用户，提交后把这些用户交给
+on_commit 注册的回调（索引管理器据此在后台更新已加载的索引）。回滚的事务不通知。
+
+这个模块不依赖 crud 和 NumPy，crud 可以直接导入而不产生循环依赖。
+"""
+from typing import Callable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_STALE_KEY = "retrieval_stale"
+_PENDING_KEY = "retrieval_pending"
+
+_callbacks: List[Callable[[Set[int]], None]] = []
+
+
+def on_commit(callback: Callable[[Set[int]], None]) -> None:
+    """注册提交后的回调，参数为本事务中登记过的用户 ID 集合"""
+    _callbacks.append(callback)
+
+
+def mark_stale(db: Session, owner_id: int) -> None:
+    """登记本事务改动了该用户笔记的标题/正文（新建、编辑、删除）"""
+    db.info.setdefault(_STALE_KEY, set()).add(owner_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _take_stale(session: Session) -> None:
+    owners = session.info.pop(_STALE_KEY, None)
+    if owners:
+        session.info[_PENDING_KEY] = owners
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session: Session) -> None:
+    owners = session.info.pop(_PENDING_KEY, None)
+    if owners:
+        for callback in _callbacks:
+            callback(owners)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_STALE_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
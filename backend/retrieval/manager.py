@@ -0,0 +1,189 @@
+"""
+检索索引管理
+
+每个用户一个 VectorStore，最近使用的 ASSISTANT_MAX_RESIDENT 个保持映射。检索前比较索引
+记下的 change_seq 与用户当前的 change_seq，落后时只读取之后修改过的笔记和删除记录，
+并且只重新嵌入标题/正文变化了的笔记（只移动文件夹的不用）。
+
+笔记写入提交后（hooks.mark_stale），本进程已加载的索引在后台线程中提前更新，
+下次检索通常不需要等待嵌入。多个 worker 共用同一份索引文件，更新由文件锁串行化，
+其他 worker 在下次检索时根据 index.json 看到最新版本。
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import crud
+from database import SessionLocal, engine
+from . import hooks
+from .chunking import chunk_note
+from .embedders import Embedder, get_embedder
+from .store import IVF_MIN_ROWS, VectorStore, note_digest
+
+logger = logging.getLogger(__name__)
+
+# 保持映射的用户索引数
+ASSISTANT_MAX_RESIDENT = int(os.getenv("ASSISTANT_MAX_RESIDENT", "64"))
+# 每次送入嵌入模型的片段数
+EMBED_BATCH = 256
+
+
+def default_index_dir() -> str:
+    """ASSISTANT_INDEX_DIR，默认在 SQLite 数据库文件旁边的 <数据库文件名>.vectors 目录"""
+    configured = os.getenv("ASSISTANT_INDEX_DIR")
+    if configured:
+        return configured
+    path = engine.url.database if engine.dialect.name == "sqlite" else None
+    if not path or path == ":memory:":
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "notes.db")
+    return f"{os.path.abspath(path)}.vectors"
+
+
+class IndexManager:
+    def __init__(
+        self,
+        index_dir: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        ivf_min_rows: int = IVF_MIN_ROWS
+    ):
+        self._index_dir = index_dir
+        self._embedder = embedder
+        self._ivf_min_rows = ivf_min_rows
+        self._stores: "OrderedDict[int, VectorStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 等待后台更新的用户
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval-indexer")
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    def _store(self, owner_id: int) -> VectorStore:
+        with self._lock:
+            store = self._stores.get(owner_id)
+            if store is None:
+                if self._index_dir is None:
+                    self._index_dir = default_index_dir()
+                embedder = self.embedder
+                store = self._stores[owner_id] = VectorStore(
+                    os.path.join(self._index_dir, str(owner_id)), embedder.name, embedder.dim, self._ivf_min_rows
+                )
+                while len(self._stores) > ASSISTANT_MAX_RESIDENT:
+                    self._stores.popitem(last=False)
+            self._stores.move_to_end(owner_id)
+            return store
+
+    # 更新
+    def refresh(self, owner_id: int) -> VectorStore:
+        """把用户的索引更新到当前 change_seq（阻塞，在线程中调用）"""
+        store = self._store(owner_id)
+        # 先拿文件锁再开始读事务，读到的数据不会比其他进程已写入的索引旧
+        with store.writing(), SessionLocal() as db:
+            change_seq, sync_floor = crud.get_index_state(db, owner_id)
+            if store.seq == change_seq:
+                return store
+            since = store.seq
+            if since is not None and not sync_floor <= since <= change_seq:
+                # 中间的删除记录已被清理，或数据库被还原
+                since = None
+            if since is None:
+                store.reset()
+            else:
+                store.remove_notes(crud.get_deleted_note_ids(db, owner_id, since))
+            chunks = self._index_notes(db, store, owner_id, since)
+            store.commit(change_seq)
+        logger.debug(
+            "Retrieval index of user %s updated to %s (%s, %d chunks embedded)",
+            owner_id, change_seq, "full" if since is None else f"since {since}", chunks
+        )
+        return store
+
+    def _index_notes(self, db, store: VectorStore, owner_id: int, since: Optional[int]) -> int:
+        entries: List[Tuple[int, int, int, int]] = []
+        texts: List[str] = []
+        embedded = 0
+
+        def flush() -> None:
+            store.add(entries, self.embedder.embed(texts))
+            entries.clear()
+            texts.clear()
+
+        after = None
+        while True:
+            notes = crud.get_notes_for_index(db, owner_id, since, after)
+            if not notes:
+                break
+            after = (notes[-1].change_seq, notes[-1].id)
+            digests = {note.id: note_digest(note.title, note.content) for note in notes}
+            changed = notes
+            if since is not None:
+                indexed = store.digests(digests)
+                changed = [note for note in notes if indexed.get(note.id) != digests[note.id]]
+                store.remove_notes(note.id for note in changed)
+            for note in changed:
+                for chunk in chunk_note(note.title, note.content):
+                    entries.append((note.id, chunk.start, chunk.end, digests[note.id]))
+                    texts.append(chunk.text)
+                if len(texts) >= EMBED_BATCH:
+                    embedded += len(texts)
+                    flush()
+            if len(notes) < crud.INDEX_PAGE_SIZE:
+                break
+        embedded += len(texts)
+        flush()
+        return embedded
+
+    # 检索
+    def search(self, owner_id: int, change_seq: int, queries: List[str], k: int) -> List[list]:
+        """
+        在用户的笔记中检索，索引落后于 change_seq 时先更新（阻塞，在线程中调用）。
+
+        返回: 每个查询一个列表 [(note_id, start, end, 分数)]
+        """
+        store = self._store(owner_id)
+        with store.reading():
+            fresh = store.seq == change_seq
+        if not fresh:
+            self.refresh(owner_id)
+        vectors = self.embedder.embed(queries)
+        with store.reading():
+            return store.search(vectors, k)
+
+    # 后台更新
+    def schedule(self, owner_ids: Iterable[int]) -> None:
+        """笔记写入提交后调用：只更新本进程已加载的索引，其他的等第一次检索时再建立"""
+        with self._lock:
+            owners = {owner_id for owner_id in owner_ids if owner_id in self._stores}
+            if not owners:
+                return
+            idle = not self._pending
+            self._pending.update(owners)
+        if idle:
+            self._executor.submit(self._drain)
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                owner_id = self._pending.pop()
+            try:
+                self.refresh(owner_id)
+            except Exception:
+                logger.exception("Failed to update the retrieval index of user %s", owner_id)
+
+    def close(self) -> None:
+        """释放已加载的索引（应用关闭时）"""
+        with self._lock:
+            self._pending.clear()
+            self._stores.clear()
+
+
+index_manager = IndexManager()
+hooks.on_commit(index_manager.schedule)
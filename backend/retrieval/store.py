@@ -0,0 +1,335 @@
+"""
+一个用户的向量索引文件
+
+目录 ASSISTANT_INDEX_DIR/<owner_id>/ 下：
+- vectors.f32：float32 矩阵 (capacity, dim)，内存映射，每行一个片段的向量
+- rows.i64：int64 矩阵 (capacity, 5)，与向量逐行对应：note_id（0 表示空行）、
+  片段在正文中的 start / end、笔记内容摘要（判断是否需要重新嵌入）、IVF 列表号
+- centroids.npy：IVF 聚类中心，有效片段达到 IVF_MIN_ROWS 后才会训练
+- index.json：嵌入模型、维度、已索引到的 change_seq、行数等，每次更新最后写入
+  （原子替换），其他 worker 据此判断是否需要重新映射
+- lock：进程间文件锁，检索共享、更新独占
+
+删除或修改笔记时原来的行标记为空，新片段优先复用空行，文件只在行数不够时成倍扩大。
+小账户直接对全部向量做一次矩阵乘法取 top-k；片段很多时先用 IVF 聚类中心选出
+IVF_NPROBE 个最近的列表，只在这些列表内计算相似度。
+"""
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedders import normalize
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 只有单进程部署
+    fcntl = None
+
+INDEX_FORMAT_VERSION = 1
+
+# 有效片段达到这个数量后训练 IVF，之后片段数翻倍时重新训练
+IVF_MIN_ROWS = int(os.getenv("ASSISTANT_IVF_MIN_ROWS", "20000"))
+# 每次检索探查的列表数
+IVF_NPROBE = int(os.getenv("ASSISTANT_IVF_NPROBE", "8"))
+_IVF_ITERATIONS = 8
+_IVF_MIN_LISTS, _IVF_MAX_LISTS = 16, 4096
+# 训练时每个列表最多抽样的片段数
+_IVF_SAMPLE_PER_LIST = 64
+_ASSIGN_BLOCK = 65536
+
+_MIN_CAPACITY = 256
+
+# rows.i64 的列
+COL_NOTE, COL_START, COL_END, COL_DIGEST, COL_LIST = range(5)
+_ROW_COLUMNS = 5
+
+
+def note_digest(title: str, content: Optional[str]) -> int:
+    """笔记标题和正文的摘要；只移动文件夹时摘要不变，不需要重新嵌入"""
+    return zlib.crc32(f"{title}\0{content or ''}".encode())
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """scores 中最大的 k 个的下标，按分数从高到低（不含 -inf）"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top[np.isfinite(scores[top])]
+
+
+class VectorStore:
+    """
+    一个用户的索引。读写都要在 reading() / writing() 中进行，进入时会按 index.json
+    同步其他进程的更新。
+    """
+
+    def __init__(self, path: str, name: str, dim: int, ivf_min_rows: int = IVF_MIN_ROWS):
+        self.path = path
+        self.name = name
+        self.dim = dim
+        self.ivf_min_rows = ivf_min_rows
+        # 已索引到的 change_seq，None 表示还没有建立（或模型变了），需要全量重建
+        self.seq: Optional[int] = None
+        # 已使用的行数（含空行）
+        self.rows = 0
+        self.capacity = 0
+        # 训练 IVF 时的有效片段数，0 表示不使用 IVF
+        self.ivf_rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._meta: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        # IVF 倒排表缓存：(按列表号排序的行号, 每个列表的起点)
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._stamp = None
+        self._mutex = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    # 文件
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _header_stamp(self):
+        try:
+            stat = os.stat(self._file("index.json"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _map(self) -> None:
+        if self.capacity == 0:
+            self._vectors = self._meta = None
+            return
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._meta = np.memmap(self._file("rows.i64"), dtype=np.int64, mode="r+", shape=(self.capacity, _ROW_COLUMNS))
+
+    def _sync(self) -> None:
+        """index.json 被（其他进程）更新过时重新加载"""
+        stamp = self._header_stamp()
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        header = None
+        if stamp is not None:
+            with open(self._file("index.json")) as header_file:
+                header = json.load(header_file)
+        if not header or (header["version"], header["embedder"], header["dim"]) != (INDEX_FORMAT_VERSION, self.name, self.dim):
+            # 没有索引，或由其他模型生成：等待全量重建
+            self.seq, self.rows, self.capacity, self.ivf_rows = None, 0, 0, 0
+            self._vectors = self._meta = self._centroids = None
+            self._live = np.zeros(0, dtype=bool)
+            self._inverted = None
+            return
+        self.seq, self.rows, self.capacity = header["seq"], header["rows"], header["capacity"]
+        self.ivf_rows = header["ivf_rows"]
+        self._map()
+        self._centroids = np.load(self._file("centroids.npy")) if self.ivf_rows else None
+        self._live = np.asarray(self._meta[:self.rows, COL_NOTE] != 0) if self.rows else np.zeros(0, dtype=bool)
+        self._inverted = None
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator["VectorStore"]:
+        with self._mutex:
+            if fcntl is None:
+                self._sync()
+                yield self
+                return
+            with open(self._file("lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    self._sync()
+                    yield self
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reading(self):
+        return self._locked(exclusive=False)
+
+    def writing(self):
+        return self._locked(exclusive=True)
+
+    # 统计
+    @property
+    def live_rows(self) -> int:
+        return int(self._live.sum())
+
+    # 写入（在 writing() 中调用，最后调用 commit）
+    def reset(self) -> None:
+        """清空索引，准备全量重建"""
+        for name in ("vectors.f32", "rows.i64", "centroids.npy"):
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+        self.seq, self.rows, self.capacity, self.ivf_rows = None, 0, 0, 0
+        self._vectors = self._meta = self._centroids = None
+        self._live = np.zeros(0, dtype=bool)
+        self._inverted = None
+
+    def digests(self, note_ids: Iterable[int]) -> Dict[int, int]:
+        """已索引笔记的内容摘要"""
+        ids = np.fromiter(note_ids, dtype=np.int64)
+        if not self.rows or not len(ids):
+            return {}
+        meta = np.asarray(self._meta[:self.rows])
+        found = meta[np.isin(meta[:, COL_NOTE], ids)]
+        return dict(zip(found[:, COL_NOTE].tolist(), found[:, COL_DIGEST].tolist()))
+
+    def remove_notes(self, note_ids: Iterable[int]) -> None:
+        ids = np.fromiter(note_ids, dtype=np.int64)
+        if not self.rows or not len(ids):
+            return
+        rows = np.flatnonzero(np.isin(self._meta[:self.rows, COL_NOTE], ids))
+        if len(rows):
+            self._meta[rows, COL_NOTE] = 0
+            self._live[rows] = False
+            self._inverted = None
+
+    def add(self, entries: Sequence[Tuple[int, int, int, int]], vectors: np.ndarray) -> None:
+        """写入片段，entries 为 (note_id, start, end, 内容摘要)，与 vectors 逐行对应"""
+        if not entries:
+            return
+        slots = np.flatnonzero(~self._live)[:len(entries)]
+        extra = len(entries) - len(slots)
+        if extra:
+            if self.rows + extra > self.capacity:
+                self._grow(self.rows + extra)
+            slots = np.concatenate([slots, np.arange(self.rows, self.rows + extra)])
+            self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+            self.rows += extra
+        self._vectors[slots] = vectors
+        self._meta[slots, :COL_LIST] = np.asarray(entries, dtype=np.int64)
+        self._meta[slots, COL_LIST] = self._assign(vectors) if self._centroids is not None else -1
+        self._live[slots] = True
+        self._inverted = None
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(_MIN_CAPACITY, self.capacity * 2, needed)
+        for name, row_bytes in (("vectors.f32", self.dim * 4), ("rows.i64", _ROW_COLUMNS * 8)):
+            # 扩大文件不影响其他进程已有的映射，新增部分为 0（空行）
+            with open(self._file(name), "ab"):
+                pass
+            os.truncate(self._file(name), capacity * row_bytes)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._meta.flush()
+        self.capacity = capacity
+        self._map()
+
+    def commit(self, seq: int) -> None:
+        """写回文件并记下已索引到的 change_seq"""
+        self._maybe_train_ivf()
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._meta.flush()
+        self.seq = seq
+        header = {
+            "version": INDEX_FORMAT_VERSION,
+            "embedder": self.name,
+            "dim": self.dim,
+            "seq": seq,
+            "rows": self.rows,
+            "capacity": self.capacity,
+            "ivf_rows": self.ivf_rows,
+        }
+        temporary = self._file("index.json.tmp")
+        with open(temporary, "w") as header_file:
+            json.dump(header, header_file)
+        os.replace(temporary, self._file("index.json"))
+        self._stamp = self._header_stamp()
+
+    # IVF
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def _maybe_train_ivf(self) -> None:
+        live = self.live_rows
+        if live < max(self.ivf_min_rows, _IVF_MIN_LISTS):
+            if self.ivf_rows:
+                self.ivf_rows, self._centroids, self._inverted = 0, None, None
+            return
+        if self.ivf_rows and live <= 2 * self.ivf_rows:
+            return
+        self._train_ivf(live)
+
+    def _train_ivf(self, live: int) -> None:
+        """球面 k-means：在抽样的片段上训练聚类中心，再给所有行分配列表号"""
+        lists = int(np.clip(np.sqrt(live), _IVF_MIN_LISTS, _IVF_MAX_LISTS))
+        rng = np.random.default_rng(0)
+        rows = np.flatnonzero(self._live)
+        if len(rows) > lists * _IVF_SAMPLE_PER_LIST:
+            rows = np.sort(rng.choice(rows, lists * _IVF_SAMPLE_PER_LIST, replace=False))
+        sample = np.asarray(self._vectors[rows])
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=lists)
+            present = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+            sums = centroids.copy()
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = normalize(sums)
+
+        self._centroids = centroids.astype(np.float32)
+        for start in range(0, self.rows, _ASSIGN_BLOCK):
+            end = min(start + _ASSIGN_BLOCK, self.rows)
+            self._meta[start:end, COL_LIST] = self._assign(np.asarray(self._vectors[start:end]))
+        temporary = self._file("centroids.tmp.npy")
+        np.save(temporary, self._centroids)
+        os.replace(temporary, self._file("centroids.npy"))
+        self.ivf_rows = live
+        self._inverted = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._inverted is None:
+            rows = np.flatnonzero(self._live)
+            list_ids = np.asarray(self._meta[rows, COL_LIST])
+            order = np.argsort(list_ids, kind="stable")
+            offsets = np.searchsorted(list_ids[order], np.arange(len(self._centroids) + 1))
+            self._inverted = (rows[order], offsets)
+        return self._inverted
+
+    # 检索（在 reading() 中调用）
+    def search(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, int, int, float]]]:
+        """
+        对一批查询向量各取相似度最高的 k 个片段。
+
+        返回: 每个查询一个列表 [(note_id, start, end, 分数)]，按分数从高到低
+        """
+        if not self.rows or not self._live.any():
+            return [[] for _ in range(len(queries))]
+        if self._centroids is not None:
+            found = [self._search_ivf(query, k) for query in queries]
+        else:
+            # 所有查询一次矩阵乘法
+            scores = queries @ self._vectors[:self.rows].T
+            scores[:, ~self._live] = -np.inf
+            found = []
+            for row_scores in scores:
+                top = _top(row_scores, k)
+                found.append((top, row_scores[top]))
+        return [
+            [
+                (int(note_id), int(start), int(end), float(score))
+                for (note_id, start, end), score in zip(self._meta[rows, :COL_DIGEST].tolist(), scores)
+            ]
+            for rows, scores in found
+        ]
+
+    def _search_ivf(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        sorted_rows, offsets = self._inverted_lists()
+        probes = _top(self._centroids @ query, IVF_NPROBE)
+        candidates = np.concatenate([sorted_rows[offsets[probe]:offsets[probe + 1]] for probe in probes])
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        scores = self._vectors[candidates] @ query
+        top = _top(scores, k)
+        return candidates[top], scores[top]
@@ -1,7 +1,10 @@
 from .user import router as users_router
 from .folder import router as folders_router  
 from .note import router as notes_router
-
-
-
-
+from .backup import router as backup_router
+from .stats import router as stats_router
+from .sync import router as sync_router
+from .events import router as events_router
+from .assistant import router as assistant_router
+from .attachment import router as attachments_router
+from .monitoring import router as monitoring_router
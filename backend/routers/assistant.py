@@ -0,0 +1,162 @@
+import json
+from contextlib import aclosing
+from typing import AsyncIterator, List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+import crud
+import schemas
+from dependencies import DBSession, Principal, get_db, get_current_user
+from llm import GenerationStats, LLMError, QueueFull, Ticket, generation_limiter, llm_client
+from retrieval import index_manager
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    prefix="/assistant",
+    tags=["assistant"]
+)
+
+SYSTEM_PROMPT = "你是笔记应用中的 AI 助手，用与用户相同的语言简洁地回答问题。"
+NOTES_PROMPT = (
+    "下面是从用户笔记中检索到的片段。回答时优先依据这些内容，并说明出自哪篇笔记；"
+    "片段与问题无关时直接回答，不要编造笔记中没有的内容。"
+)
+
+
+async def _retrieve(db: DBSession, owner_id: int, query: str, top_k: int, min_score: float) -> tuple:
+    """检索与问题最相关的笔记片段，返回 (片段列表, change_seq)"""
+    change_seq = await crud.aio.get_change_seq(db, owner_id=owner_id)
+    # 嵌入和矩阵运算是 CPU 计算，放到线程池中执行
+    hits = (await run_in_threadpool(
+        index_manager.search, owner_id, change_seq, [query], top_k
+    ))[0]
+    sources = await crud.aio.get_passage_sources(
+        db, owner_id=owner_id, note_ids=[note_id for note_id, _, _, _ in hits]
+    )
+
+    passages = []
+    for note_id, start, end, score in hits:
+        source = sources.get(note_id)
+        if source is None or score <= min_score:
+            # 检索之后被删除，或与问题无关
+            continue
+        title, content, folder_id, updated_at = source
+        passages.append({
+            "note_id": note_id,
+            "title": title,
+            "folder_id": folder_id,
+            "text": (content or "")[start:end],
+            "start": start,
+            "end": end,
+            "score": score,
+            "updated_at": updated_at,
+        })
+    return passages, change_seq
+
+def _build_messages(request: schemas.ChatRequest, passages: List[dict]) -> List[dict]:
+    system = SYSTEM_PROMPT
+    if passages:
+        context = "\n\n".join(
+            f"[{i}]《{passage['title']}》\n{passage['text']}" for i, passage in enumerate(passages, 1)
+        )
+        system = f"{SYSTEM_PROMPT}\n\n{NOTES_PROMPT}\n\n{context}"
+    return [{"role": "system", "content": system}] + [message.model_dump() for message in request.messages]
+
+async def _release(ticket: Ticket) -> None:
+    # 限流器只能在事件循环线程中使用；同步函数会被 BackgroundTask 放到线程池执行
+    generation_limiter.release(ticket)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), separators=(',', ':'))}\n\n"
+
+async def _chat_stream(ticket: Ticket, request: schemas.ChatRequest, passages: List[dict]) -> AsyncIterator[str]:
+    try:
+        # 第一块立即发出，让响应头尽快到达客户端
+        yield _sse("context", {"passages": passages})
+        if ticket.waiting:
+            yield _sse("queued", {"position": generation_limiter.position(ticket)})
+            await generation_limiter.wait(ticket)
+
+        stats = GenerationStats()
+        chunks = llm_client.stream_chat(
+            _build_messages(request, passages), stats,
+            max_tokens=request.max_tokens, temperature=request.temperature
+        )
+        # 生成器提前结束（客户端断开）时立即关闭上游连接，而不是等垃圾回收
+        async with aclosing(chunks):
+            async for text in chunks:
+                yield _sse("token", {"text": text})
+        yield _sse("done", {
+            "finish_reason": stats.finish_reason,
+            "completion_tokens": stats.completion_tokens,
+            "time_to_first_token_ms": None if stats.time_to_first_token is None else round(stats.time_to_first_token * 1000),
+            "tokens_per_second": None if stats.tokens_per_second is None else round(stats.tokens_per_second, 1),
+        })
+    except LLMError as exc:
+        yield _sse("error", {"detail": str(exc)})
+    finally:
+        generation_limiter.release(ticket)
+
+# --- 检索 (POST) ---
+@router.post("/retrieve", response_model=schemas.RetrieveResponse)
+async def retrieve_passages(
+    request: schemas.RetrieveRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    在当前用户的笔记中检索与问题最相关的片段，供 AI 助手作为上下文。
+
+    索引按 change_seq 增量更新：笔记改动后第一次检索只重新嵌入改动过的笔记，
+    第一次使用时为该用户建立索引。片段按相似度从高到低排列，同一篇笔记可能出现多个片段。
+    """
+    passages, change_seq = await _retrieve(db, current_user.id, request.query, request.top_k, request.min_score)
+    return {"passages": passages, "change_seq": change_seq}
+
+# --- 对话 (POST, SSE) ---
+@router.post("/chat")
+async def chat(
+    request: schemas.ChatRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    向 AI 助手提问，回答以 Server-Sent Events 逐段返回。
+
+    use_notes 为 true 时先按最后一个问题检索笔记，把相关片段放进系统提示词。
+    事件依次为：
+    - context：{passages}，作为上下文的笔记片段（与 /retrieve 的结果相同）
+    - queued：{position}，并发已满，正在排队（只有排队时才发送）
+    - token：{text}，一段增量文本
+    - done：{finish_reason, completion_tokens, time_to_first_token_ms, tokens_per_second}
+    - error：{detail}，模型服务不可用或排队超时，之后连接关闭
+
+    排队的请求过多时返回 429。客户端断开连接即取消生成。
+    EventSource 只能发 GET，前端用 fetch 读取响应流。
+    """
+    passages = []
+    if request.use_notes:
+        passages, _ = await _retrieve(
+            db, current_user.id, request.messages[-1].content, request.top_k, request.min_score
+        )
+    # 生成可能持续几十秒，期间不占用数据库连接
+    await crud.aio.release(db)
+    try:
+        ticket = generation_limiter.enqueue(current_user.id)
+    except QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many pending assistant requests",
+            headers={"Retry-After": "5"}
+        )
+    return StreamingResponse(
+        _chat_stream(ticket, request, passages),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 响应未开始就断开时生成器不会执行，由后台任务兜底归还名额
+        background=BackgroundTask(_release, ticket)
+    )
@@ -0,0 +1,174 @@
+import os
+from typing import List
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+
+import crud
+import schemas
+from attachments import ATTACHMENT_MAX_SIZE, BlobTooLarge, UploadError, blob_store, receive_upload
+from attachments.upload import FILE_FIELD
+from dependencies import DBSession, Principal, get_db, get_current_user, get_stream_user
+from http_cache import is_not_modified
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    prefix="/attachments",
+    tags=["attachments"]
+)
+
+# 设置后下载由 nginx 直接发送文件（X-Accel-Redirect，sendfile 零拷贝），
+# 值为 nginx 中指向附件目录的 internal location，例如 /_attachments/
+ATTACHMENT_ACCEL_REDIRECT = os.getenv("ATTACHMENT_ACCEL_REDIRECT", "")
+# multipart 边界和 part 头部的额外字节数上限，用于按 Content-Length 提前拒绝过大的上传
+MULTIPART_OVERHEAD = 64 * 1024
+# 附件内容不会改变（同一个 id 始终是同样的内容）
+ATTACHMENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# 可以在页面中直接显示的类型；其余类型（包括 SVG、HTML）一律作为下载
+INLINE_CONTENT_TYPES = {
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/avif",
+    "audio/mpeg", "audio/ogg", "audio/wav", "video/mp4", "video/webm",
+}
+
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": [FILE_FIELD],
+                "properties": {FILE_FIELD: {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+}
+
+
+def _to_read(attachment) -> dict:
+    return {
+        "id": attachment["id"],
+        "note_id": attachment["note_id"],
+        "filename": attachment["filename"],
+        "content_type": attachment["content_type"],
+        "size": attachment["size"],
+        "sha256": attachment["sha256"],
+        "url": f"/api/attachments/{attachment['id']}",
+        "created_at": attachment["created_at"],
+    }
+
+def _content_disposition(content_type: str, filename: str) -> str:
+    kind = "inline" if content_type in INLINE_CONTENT_TYPES else "attachment"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{kind}; filename*=utf-8''{quoted}"
+    return f'{kind}; filename="{filename}"'
+
+# --- 上传附件 (POST) ---
+@router.post(
+    "/",
+    response_model=schemas.AttachmentRead,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": UPLOAD_REQUEST_BODY}
+)
+async def upload_attachment(
+    request: Request,
+    note_id: int = Query(..., description="附件所属的笔记"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    上传附件（multipart/form-data，文件字段名为 file）。
+
+    请求体边接收边写入磁盘并计算 SHA-256，不在内存中缓存整个文件；
+    内容与已有附件（包括其他用户的）相同时只保存一份。
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > ATTACHMENT_MAX_SIZE + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Attachment too large")
+    if await crud.aio.get_note_version(db, note_id=note_id, owner_id=current_user.id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+    # 接收上传可能需要很久，期间不占用数据库连接和读事务
+    await crud.aio.release(db)
+
+    try:
+        upload = await receive_upload(request, blob_store)
+    except UploadError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except BlobTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Attachment too large")
+
+    try:
+        attachment = await crud.aio.create_attachment(
+            db,
+            owner_id=current_user.id,
+            note_id=note_id,
+            writer=upload.writer,
+            filename=upload.filename,
+            content_type=upload.content_type
+        )
+    finally:
+        # 已放到最终位置时没有影响；笔记在上传期间被删除或写入失败时删除临时文件
+        upload.writer.discard()
+    if attachment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+    return _to_read(attachment)
+
+# --- 笔记的附件列表 (GET) ---
+@router.get("/", response_model=List[schemas.AttachmentRead])
+async def read_note_attachments(
+    note_id: int = Query(..., description="笔记 ID"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    rows = await crud.aio.get_note_attachments(db, note_id=note_id, owner_id=current_user.id)
+    return [_to_read(row._mapping) for row in rows]
+
+# --- 下载附件 (GET) ---
+@router.get("/{attachment_id}", response_class=FileResponse)
+async def download_attachment(
+    attachment_id: int,
+    request: Request,
+    current_user: Principal = Depends(get_stream_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    下载附件内容。令牌可以放在查询参数 access_token 中（用于 <img src>）。
+
+    ETag 是内容的 SHA-256，带 If-None-Match 且一致时返回 304；支持 Range 请求（断点续传、
+    音视频拖动）。配置了 ATTACHMENT_ACCEL_REDIRECT 时由 nginx 发送文件。
+    """
+    attachment = await crud.aio.get_attachment(db, attachment_id=attachment_id, owner_id=current_user.id)
+    if attachment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
+    # 发送文件期间不占用数据库连接
+    await crud.aio.release(db)
+
+    headers = {
+        "ETag": f'"{attachment.sha256}"',
+        "Cache-Control": ATTACHMENT_CACHE_CONTROL,
+        "Content-Disposition": _content_disposition(attachment.content_type, attachment.filename),
+        "X-Content-Type-Options": "nosniff",
+        # 直接打开时也不执行其中的脚本
+        "Content-Security-Policy": "sandbox; default-src 'none'",
+    }
+    if is_not_modified(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+            "ETag": headers["ETag"], "Cache-Control": ATTACHMENT_CACHE_CONTROL
+        })
+    if ATTACHMENT_ACCEL_REDIRECT:
+        headers["X-Accel-Redirect"] = ATTACHMENT_ACCEL_REDIRECT + blob_store.relative_path(attachment.sha256)
+        return Response(headers=headers, media_type=attachment.content_type)
+    return FileResponse(blob_store.path(attachment.sha256), media_type=attachment.content_type, headers=headers)
+
+# --- 删除附件 (DELETE) ---
+@router.delete("/{attachment_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_attachment(
+    attachment_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """删除附件；内容不再被任何附件引用时，文件在宽限期后由垃圾回收删除"""
+    if not await crud.aio.delete_attachment(db, attachment_id=attachment_id, owner_id=current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
+    return None
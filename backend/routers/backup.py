@@ -0,0 +1,195 @@
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+
+import crud
+import schemas
+from dependencies import DBSession, Principal, get_db, get_current_user
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    tags=["backup"]
+)
+
+# 导出时每个响应块的大致字节数
+STREAM_CHUNK_BYTES = 256 * 1024
+# 单行记录（解压后）的最大字节数
+MAX_IMPORT_LINE_BYTES = 16 * 1024 * 1024
+# 每次解压产出的最大字节数，防止压缩炸弹一次性展开
+_INFLATE_CHUNK = 1024 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+
+_record_adapter = TypeAdapter(schemas.ExportRecord)
+
+
+def _ndjson_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=_json_default) + "\n"
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+async def _export_lines(db: DBSession, owner_id: int) -> AsyncIterator[bytes]:
+    """
+    依次产出头部、文件夹、笔记；多行合并为约 STREAM_CHUNK_BYTES 大小的块再发送。
+    """
+    yield _ndjson_line({
+        "type": "header",
+        "version": schemas.EXPORT_FORMAT_VERSION,
+        "exported_at": datetime.utcnow(),
+    }).encode()
+    buffer, size = [], 0
+    for kind, statement in (
+        ("folder", crud.export_folders_query(owner_id)),
+        ("note", crud.export_notes_query(owner_id)),
+    ):
+        async for rows in crud.aio.stream_rows(db, statement, crud.EXPORT_BATCH_SIZE):
+            for row in rows:
+                line = _ndjson_line({"type": kind, **row._mapping}).encode()
+                buffer.append(line)
+                size += len(line)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield b"".join(buffer)
+                    buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # 压缩在线程池中执行，不阻塞事件循环
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = await run_in_threadpool(compressor.compress, chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# --- 导出 (GET) ---
+@router.get("/export")
+async def export_notebook(
+    gzip: bool = Query(False, description="是否使用 gzip 压缩"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    以 NDJSON 流导出当前用户的全部文件夹和笔记。
+
+    第一行为 header，随后是所有 folder 行，最后是所有 note 行。数据通过游标分批读取，
+    内存占用与账户大小无关；整个导出在同一个读事务中完成，内容是一致的快照。
+    """
+    filename = f"mynote-export-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson"
+    body = _export_lines(db, current_user.id)
+    media_type = "application/x-ndjson"
+    if gzip:
+        body = _gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def _import_lines(request: Request) -> AsyncIterator[bytes]:
+    """
+    把请求体切分成行，自动识别 gzip（Content-Encoding 或文件头）。
+    """
+    decompressor = None
+    first = True
+    pending = []        # 当前行中尚未遇到换行的片段
+    pending_size = 0
+    async for chunk in request.stream():
+        if first and chunk:
+            first = False
+            if request.headers.get("content-encoding") == "gzip" or chunk.startswith(_GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pieces = [chunk]
+        if decompressor is not None:
+            pieces = []
+            data = chunk
+            while data:
+                pieces.append(decompressor.decompress(data, _INFLATE_CHUNK))
+                data = decompressor.unconsumed_tail
+        for piece in pieces:
+            # 只切分新到的片段，长行跨越多个块时不会反复扫描
+            *lines, tail = piece.split(b"\n")
+            if lines:
+                pending.append(lines[0])
+                yield b"".join(pending)
+                for line in lines[1:]:
+                    yield line
+                pending, pending_size = [], 0
+            pending.append(tail)
+            pending_size += len(tail)
+            if pending_size > MAX_IMPORT_LINE_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Import record too large"
+                )
+    if pending_size:
+        yield b"".join(pending)
+
+# --- 导入 (POST) ---
+@router.post("/import", response_model=schemas.ImportResult)
+async def import_notebook(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    导入 /export 生成的 NDJSON 流（可以是 gzip 压缩的），全部记录归属当前用户。
+
+    文件夹和笔记会分配新的 ID，笔记的 folder_id 自动映射到新文件夹。
+    记录按批次写入，每批一个事务；某一行不合法时返回 400，之前的批次已经写入。
+    """
+    folder_map = {}
+    imported_folders = imported_notes = 0
+    batch = []
+
+    async def flush():
+        nonlocal imported_folders, imported_notes
+        try:
+            folders, notes = await crud.aio.import_records(
+                db=db,
+                owner_id=current_user.id,
+                records=batch,
+                folder_map=folder_map
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        imported_folders += folders
+        imported_notes += notes
+        batch.clear()
+
+    line_number = 0
+    async for line in _import_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = _record_adapter.validate_json(line)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid record on line {line_number}: {e.errors(include_url=False)[0]['msg']}"
+            )
+        if record.type == "header":
+            if record.version > schemas.EXPORT_FORMAT_VERSION:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unsupported export version {record.version}"
+                )
+            continue
+        batch.append(record)
+        if len(batch) >= crud.IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    return {"folders": imported_folders, "notes": imported_notes}
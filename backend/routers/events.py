@@ -0,0 +1,138 @@
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+import crud
+from change_feed import SubscriberLimitExceeded, Subscriber, hub, iter_messages
+from dependencies import DBSession, Principal, authenticate_token, get_db, get_stream_user
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    prefix="/events",
+    tags=["events"]
+)
+
+# 连接断开后 EventSource 自动重连的等待时间（毫秒）
+SSE_RETRY_MS = 3000
+
+
+async def _subscribe(db: DBSession, owner_id: int, since: Optional[int]) -> tuple:
+    """
+    读取当前序号并登记订阅者，然后归还数据库连接（推送期间不占用连接）。
+
+    返回: (订阅者, 补发的批列表或 None, 客户端的起始序号)
+    """
+    current_seq = await crud.aio.get_change_seq(db, owner_id=owner_id)
+    await crud.aio.release(db)
+    position = current_seq if since is None else since
+    subscriber, replay = hub.subscribe(owner_id, position, current_seq)
+    return subscriber, replay, position
+
+def _parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+async def _sse_stream(subscriber: Subscriber, replay: Optional[list], since: int) -> AsyncIterator[str]:
+    # 第一块立即发出，让响应头尽快到达客户端（压缩中间件在看到响应体前不会发送响应头）
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    try:
+        async for event, seq, data in iter_messages(subscriber, replay, since):
+            if event == "ping":
+                yield ": ping\n\n"
+                continue
+            lines = f"id: {seq}\n" if seq is not None else ""
+            yield f"{lines}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
+
+# --- 变更推送 (SSE) ---
+@router.get("")
+async def stream_changes(
+    since: Optional[int] = Query(None, ge=0, description="客户端已处理到的 change_seq，为空时从当前开始"),
+    last_event_id: Optional[str] = Header(None, description="EventSource 重连时自动带上的最后一个事件 ID"),
+    current_user: Principal = Depends(get_stream_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    以 Server-Sent Events 推送当前用户的笔记/文件夹变更。
+
+    事件：
+    - change（id 为 change_seq）：{change_seq, changes: [{type, id, folder_id / parent_id}], truncated}，
+      type 为 note.created / note.updated / note.moved / note.deleted 和 folder.* 同名事件；
+      truncated 为 true 时改动没有逐条列出
+    - resync：断开期间的事件无法补发，客户端调用 GET /api/sync?since=<data.since> 补齐
+
+    每 CHANGE_FEED_HEARTBEAT 秒发送一次注释行作为心跳。重连时 Last-Event-ID 优先于 since。
+    EventSource 不能设置请求头，令牌可以放在查询参数 access_token 中。
+    """
+    resume_from = _parse_last_event_id(last_event_id)
+    if resume_from is not None:
+        since = resume_from
+    try:
+        subscriber, replay, position = await _subscribe(db, current_user.id, since)
+    except SubscriberLimitExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams"
+        )
+    return StreamingResponse(
+        _sse_stream(subscriber, replay, position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 响应未开始就断开时生成器不会执行，由后台任务兜底注销
+        background=BackgroundTask(hub.unsubscribe, subscriber)
+    )
+
+# --- 变更推送 (WebSocket) ---
+@router.websocket("/ws")
+async def websocket_changes(
+    websocket: WebSocket,
+    access_token: str = Query("", description="访问令牌"),
+    since: Optional[int] = Query(None, ge=0, description="客户端已处理到的 change_seq，为空时从当前开始"),
+    db: DBSession = Depends(get_db)
+):
+    """
+    与 GET /api/events 相同的事件，每条消息为 JSON：{event, id, data}，心跳为 {"event": "ping"}。
+    客户端发来的消息被忽略。
+    """
+    try:
+        current_user = await authenticate_token(access_token, db)
+        subscriber, replay, position = await _subscribe(db, current_user.id, since)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except SubscriberLimitExceeded:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    async def send_events() -> None:
+        async for event, seq, data in iter_messages(subscriber, replay, position):
+            await websocket.send_json({"event": event, "id": seq, "data": data})
+
+    async def wait_disconnect() -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    await websocket.accept()
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if tasks[1] in done:
+            return
+        try:
+            tasks[0].result()
+        except WebSocketDisconnect:
+            # 发送时客户端已断开
+            return
+        # 推送结束（被关闭或到达最长时间），通知客户端稍后重连
+        await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(subscriber)
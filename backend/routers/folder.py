@@ -1,14 +1,18 @@
 # 文件: routers/folders.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List
 
 # 修改这些导入
 import crud
 import schemas
 import models
-from dependencies import get_db, get_current_user
+from dependencies import DBSession, Principal, get_db, get_current_user
+from fast_json import fast_response
+from http_cache import (
+    collection_etag, is_not_modified, not_modified_response,
+    resource_etag, set_cache_headers
+)
 # 创建一个APIRouter实例
 router = APIRouter(
     prefix="/folders",
@@ -17,47 +21,82 @@ router = APIRouter(
 
 # --- 1. 创建文件夹 (POST) ---
 @router.post("/", response_model=schemas.FolderRead, status_code=status.HTTP_201_CREATED)
-def create_folder(
+async def create_folder(
     folder_data: schemas.FolderCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     为当前认证用户创建一个新的文件夹。
     """
     # 调用 CRUD 函数
-    db_folder = crud.create_folder(
-        db=db,
-        folder=folder_data,
-        owner_id=current_user.id
-    )
+    try:
+        db_folder = await crud.aio.create_folder(
+            db=db,
+            folder=folder_data,
+            owner_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return db_folder
 
 # --- 2. 获取所有文件夹 (GET) ---
 @router.get("/", response_model=List[schemas.FolderRead])
-def read_folders(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def read_folders(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     获取当前用户的所有文件夹列表。
+    带 If-None-Match 且数据未变化时返回 304。
     """
+    change_seq = await crud.aio.get_change_seq(db, owner_id=current_user.id)
+    etag = collection_etag(request.url.path, current_user.id, change_seq, request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+
     # 调用 CRUD 函数
-    folders = crud.get_folders_by_owner(db=db, owner_id=current_user.id)
-    return folders
+    folders = await crud.aio.get_folders_by_owner(db=db, owner_id=current_user.id)
+    return fast_response(folders, response)
+
+# --- 获取文件夹树 (GET) ---
+# 必须声明在 /{folder_id} 之前，否则 "tree" 会被当作 folder_id 解析
+@router.get("/tree", response_model=List[schemas.FolderTreeNode])
+async def read_folder_tree(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    一次返回当前用户的完整文件夹树，每个节点带笔记数。
+    带 If-None-Match 且数据未变化时返回 304。
+    """
+    change_seq = await crud.aio.get_change_seq(db, owner_id=current_user.id)
+    etag = collection_etag(request.url.path, current_user.id, change_seq)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    tree = await crud.aio.get_folder_tree(db=db, owner_id=current_user.id)
+    return fast_response(tree, response)
 
 # --- 3. 获取单个文件夹 (GET by ID) ---
 @router.get("/{folder_id}", response_model=schemas.FolderRead)
-def read_folder(
+async def read_folder(
     folder_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     获取指定ID的文件夹，前提是该文件夹属于当前用户。
     """
     # 调用 CRUD 函数
-    db_folder = crud.get_folder_by_id(
+    db_folder = await crud.aio.get_folder_by_id(
         db=db,
         folder_id=folder_id,
         owner_id=current_user.id
@@ -67,26 +106,34 @@ def read_folder(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Folder not found or you don't have permission"
         )
+    # 文件夹行很小，直接用查到的数据做校验
+    etag = resource_etag("folder", db_folder.id, db_folder.updated_at)
+    if is_not_modified(request, etag, db_folder.updated_at):
+        return not_modified_response(etag, db_folder.updated_at)
+    set_cache_headers(response, etag, db_folder.updated_at)
     return db_folder
 
 # --- 4. 更新文件夹 (PUT) ---
 @router.put("/{folder_id}", response_model=schemas.FolderRead)
-def update_folder(
+async def update_folder(
     folder_id: int,
     folder_data: schemas.FolderUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     更新指定ID的文件夹。
     """
     # 调用 CRUD 函数
-    db_folder = crud.update_folder(
-        db=db,
-        folder_id=folder_id,
-        owner_id=current_user.id,
-        folder_data=folder_data
-    )
+    try:
+        db_folder = await crud.aio.update_folder(
+            db=db,
+            folder_id=folder_id,
+            owner_id=current_user.id,
+            folder_data=folder_data
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not db_folder:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -96,16 +143,16 @@ def update_folder(
 
 # --- 5. 删除文件夹 (DELETE) ---
 @router.delete("/{folder_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_folder(
+async def delete_folder(
     folder_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
-    删除指定ID的文件夹。
+    删除指定ID的文件夹及其子文件夹，其中的笔记移到顶层。
     """
     # 调用 CRUD 函数
-    success = crud.delete_folder(
+    success = await crud.aio.delete_folder(
         db=db,
         folder_id=folder_id,
         owner_id=current_user.id
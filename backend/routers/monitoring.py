@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+
+import metrics
+from database import ASYNC_DB, check_async_database, check_database
+
+# 创建一个 APIRouter 实例（不加 /api 前缀，供 nginx、Docker 和 Prometheus 直接访问）
+router = APIRouter(
+    tags=["monitoring"]
+)
+
+# 就绪检查中数据库查询的超时时间（秒）
+READY_TIMEOUT = 2.0
+# 本 worker 进程的启动时间（Unix 秒），reload.sh 据此判断响应是否来自重载后启动的 worker
+WORKER_STARTED_AT = time.time()
+
+# --- 存活检查 (GET) ---
+@router.get("/health")
+async def health():
+    """
+    存活检查：进程能处理请求就返回 200，不访问数据库，
+    避免数据库短暂繁忙时容器被反复重启。
+    """
+    return {"status": "ok"}
+
+# --- 就绪检查 (GET) ---
+@router.get("/ready")
+async def ready():
+    """
+    就绪检查：同步和异步引擎都能执行查询、且迁移已全部应用时返回 200，否则返回 503。
+    响应中的 worker 是处理本次请求的 worker 进程号和启动时间。
+    """
+    checks = {}
+    try:
+        checks["database"] = await asyncio.wait_for(run_in_threadpool(check_database), READY_TIMEOUT)
+        if ASYNC_DB:
+            checks["async_database"] = await asyncio.wait_for(check_async_database(), READY_TIMEOUT)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database unavailable: {type(e).__name__}"
+        )
+    if not all(checks.values()):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database migrations pending"
+        )
+    return {
+        "status": "ready",
+        "checks": checks,
+        "worker": {"pid": os.getpid(), "started_at": WORKER_STARTED_AT}
+    }
+
+# --- 性能指标 (GET) ---
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Prometheus 文本格式的进程内指标"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics disabled")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Optional
 
 # 修改这些导入
 import crud
 import schemas
 import models
-from dependencies import get_db, get_current_user
+from compression import COMPRESSED_CACHE_SIZE, cached_response, compressed_body_cache, negotiate
+from dependencies import DBSession, Principal, get_db, get_current_user
+from fast_json import fast_response
+from text_patch import PatchError
+from http_cache import (
+    collection_etag, has_conditional_headers, is_not_modified,
+    not_modified_response, resource_etag, set_cache_headers
+)
 
 # 创建一个 APIRouter 实例
 router = APIRouter(
@@ -16,62 +22,147 @@ router = APIRouter(
 
 # --- 1. 创建笔记 (POST) ---
 @router.post("/", response_model=schemas.NoteRead, status_code=status.HTTP_201_CREATED)
-def create_new_note(
+async def create_new_note(
     note_data: schemas.NoteCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     为当前认证用户创建一个新笔记。
     """
     # 调用 CRUD 函数
-    return crud.create_note(db=db, note=note_data, owner_id=current_user.id)
+    return await crud.aio.create_note(db=db, note=note_data, owner_id=current_user.id)
+
+async def _collection_etag(request: Request, db: DBSession, owner_id: int) -> str:
+    change_seq = await crud.aio.get_change_seq(db, owner_id=owner_id)
+    return collection_etag(request.url.path, owner_id, change_seq, request.url.query)
+
+async def _note_page(db: DBSession, owner_id: int, folder_id: Optional[int], limit: int, cursor: Optional[str]) -> dict:
+    """
+    查询一页笔记摘要，游标不合法时返回 400。
+    """
+    try:
+        items, next_cursor = await crud.aio.get_note_summaries(
+            db=db,
+            owner_id=owner_id,
+            folder_id=folder_id,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return {"items": items, "next_cursor": next_cursor}
 
 # --- 2. 获取所有笔记 (GET) ---
-@router.get("/", response_model=List[schemas.NoteRead])
-def read_all_notes(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/", response_model=schemas.NotePage)
+async def read_all_notes(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
-    获取当前用户的所有笔记。
+    分页获取当前用户的笔记摘要（按更新时间倒序，不含正文）。
+    带 If-None-Match 且数据未变化时返回 304。
     """
-    # 调用 CRUD 函数
-    notes = crud.get_notes_by_owner(db=db, owner_id=current_user.id)
-    return notes
+    etag = await _collection_etag(request, db, current_user.id)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    return fast_response(await _note_page(db, current_user.id, None, limit, cursor), response)
+
+# --- 搜索笔记 (GET) ---
+# 必须声明在 /{note_id} 之前，否则 "search" 会被当作 note_id 解析
+@router.get("/search", response_model=List[schemas.NoteSearchHit])
+async def search_notes(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="搜索关键词，多个词用空格分隔"),
+    limit: int = Query(20, ge=1, le=100, description="最多返回条数"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    在当前用户的笔记标题和正文中全文搜索，按相关度排序并高亮命中片段。
+    """
+    hits = await crud.aio.search_notes(db=db, owner_id=current_user.id, query=q, limit=limit)
+    return fast_response(hits, response)
+
+# --- 批量操作 (POST) ---
+@router.post("/batch", response_model=schemas.NoteBatchResponse)
+async def batch_note_operations(
+    batch: schemas.NoteBatchRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    在一个事务中批量创建、更新、移动和删除笔记，按顺序返回每一项的结果。
+    单项失败（笔记或文件夹不存在）不影响其他项。
+    """
+    results = await crud.aio.batch_note_operations(
+        db=db,
+        owner_id=current_user.id,
+        operations=batch.operations
+    )
+    succeeded = sum(1 for result in results if result["ok"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
 
 # --- 3. 获取单个笔记 (GET by ID) ---
 @router.get("/{note_id}", response_model=schemas.NoteRead)
-def read_note_by_id(
+async def read_note_by_id(
     note_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     根据笔记 ID 获取单个笔记。
+    带 If-None-Match / If-Modified-Since 且笔记未变化时返回 304，不加载正文；
+    已有该版本的压缩结果时直接返回缓存的字节。
     """
+    encoding = negotiate(request.headers.get("accept-encoding")) if COMPRESSED_CACHE_SIZE > 0 else None
+    if encoding or has_conditional_headers(request):
+        version = await crud.aio.get_note_version(db=db, note_id=note_id, owner_id=current_user.id)
+        if version:
+            etag = resource_etag("note", version.id, version.updated_at)
+            if is_not_modified(request, etag, version.updated_at):
+                return not_modified_response(etag, version.updated_at)
+            cached = encoding and compressed_body_cache.get(("note", version.id, version.updated_at, encoding))
+            if cached:
+                return cached_response(cached, encoding, etag, version.updated_at)
+
     # 调用 CRUD 函数
-    db_note = crud.get_note_by_id(db=db, note_id=note_id, owner_id=current_user.id)
+    db_note = await crud.aio.get_note_by_id(db=db, note_id=note_id, owner_id=current_user.id)
     if not db_note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Note not found or you don't have permission"
         )
+    set_cache_headers(response, resource_etag("note", db_note.id, db_note.updated_at), db_note.updated_at)
+    # 由压缩中间件按这个键缓存压缩后的响应体
+    request.state.compressed_cache_key = ("note", db_note.id, db_note.updated_at)
     return db_note
 
 # --- 4. 更新笔记 (PUT) ---
 @router.put("/{note_id}", response_model=schemas.NoteRead)
-def update_existing_note(
+async def update_existing_note(
     note_id: int,
     note_data: schemas.NoteUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     更新指定 ID 的笔记。
+    响应头带新版本的 ETag / Last-Modified，可直接用于之后的 PATCH 或条件 GET。
     """
     # 调用 CRUD 函数
-    db_note = crud.update_note(
+    db_note = await crud.aio.update_note(
         db=db,
         note_id=note_id,
         owner_id=current_user.id,
@@ -82,20 +173,79 @@ def update_existing_note(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Note not found or you don't have permission"
         )
+    set_cache_headers(response, resource_etag("note", db_note.id, db_note.updated_at), db_note.updated_at)
     return db_note
 
+# --- 4.1 增量更新笔记 (PATCH) ---
+@router.patch("/{note_id}", response_model=schemas.NotePatchResult)
+async def patch_existing_note(
+    note_id: int,
+    patch: schemas.NotePatch,
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    以文本操作或 unified diff 增量更新笔记正文，只需上传改动部分。
+
+    基准版本由 base_etag 或 If-Match 请求头指定（取自 GET / 上一次 PATCH 响应的 ETag）；
+    笔记已被其他请求修改时返回 409，响应头 ETag 为当前版本。
+    响应不含正文，新的 ETag 在响应头和响应体中。
+    """
+    base_etag = patch.base_etag or request.headers.get("if-match")
+    if not base_etag:
+        raise HTTPException(
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="base_etag or If-Match header is required"
+        )
+    try:
+        db_note = await crud.aio.patch_note(
+            db=db,
+            note_id=note_id,
+            owner_id=current_user.id,
+            patch=patch,
+            base_etag=base_etag.strip()
+        )
+    except crud.NoteVersionConflict as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note has been modified, reload it and reapply the changes",
+            headers={"ETag": exc.current_etag}
+        )
+    except PatchError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"Patch does not apply: {exc}"
+        )
+    if not db_note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found or you don't have permission"
+        )
+    etag = resource_etag("note", db_note.id, db_note.updated_at)
+    set_cache_headers(response, etag, db_note.updated_at)
+    return {
+        "id": db_note.id,
+        "title": db_note.title,
+        "folder_id": db_note.folder_id,
+        "content_length": len((db_note.content or "").encode("utf-16-le")) // 2,
+        "updated_at": db_note.updated_at,
+        "etag": etag,
+    }
+
 # --- 5. 删除笔记 (DELETE) ---
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_existing_note(
+async def delete_existing_note(
     note_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
     删除指定 ID 的笔记。
     """
     # 调用 CRUD 函数
-    success = crud.delete_note(db=db, note_id=note_id, owner_id=current_user.id)
+    success = await crud.aio.delete_note(db=db, note_id=note_id, owner_id=current_user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,23 +255,85 @@ def delete_existing_note(
     return None
 
 # --- 6. 获取特定文件夹中的所有笔记 (GET) ---
-@router.get("/folder/{folder_id}", response_model=List[schemas.NoteRead])
-def read_notes_in_a_folder(
+@router.get("/folder/{folder_id}", response_model=schemas.NotePage)
+async def read_notes_in_a_folder(
     folder_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
 ):
     """
-    获取指定文件夹中的所有笔记。
+    分页获取指定文件夹中的笔记摘要。
     """
+    # 文件夹被删除或转移也会改变 change_seq，所以可以先于权限检查做缓存校验
+    etag = await _collection_etag(request, db, current_user.id)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
     # 额外检查文件夹是否属于当前用户
-    folder = crud.get_folder_by_id(db, folder_id=folder_id, owner_id=current_user.id)
+    folder = await crud.aio.get_folder_by_id(db, folder_id=folder_id, owner_id=current_user.id)
     if not folder:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Folder not found or you don't have permission"
         )
     
-    # 调用 CRUD 函数
-    notes = crud.get_notes_in_folder(db=db, folder_id=folder_id, owner_id=current_user.id)
-    return notes
\ No newline at end of file
+    set_cache_headers(response, etag)
+    return fast_response(await _note_page(db, current_user.id, folder_id, limit, cursor), response)
+
+# --- 7. 历史版本 (GET / POST) ---
+@router.get("/{note_id}/revisions", response_model=List[schemas.NoteRevisionSummary])
+async def read_note_revisions(
+    note_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    列出笔记的历史版本（不含正文），从新到旧。当前版本不在其中。
+    """
+    revisions = await crud.aio.get_revisions(db=db, note_id=note_id, owner_id=current_user.id)
+    if not revisions and not await crud.aio.get_note_version(db=db, note_id=note_id, owner_id=current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found or you don't have permission"
+        )
+    return revisions
+
+@router.get("/{note_id}/revisions/{seq}", response_model=schemas.NoteRevisionRead)
+async def read_note_revision(
+    note_id: int,
+    seq: int,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    获取笔记的某个历史版本（含正文）。
+    """
+    revision = await crud.aio.get_revision(db=db, note_id=note_id, owner_id=current_user.id, seq=seq)
+    if not revision:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found or you don't have permission"
+        )
+    return revision
+
+@router.post("/{note_id}/revisions/{seq}/restore", response_model=schemas.NoteRead)
+async def restore_note_revision(
+    note_id: int,
+    seq: int,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    把笔记恢复为某个历史版本。恢复前的内容会保存为一个新的历史版本。
+    """
+    db_note = await crud.aio.restore_revision(db=db, note_id=note_id, owner_id=current_user.id, seq=seq)
+    if not db_note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found or you don't have permission"
+        )
+    return db_note
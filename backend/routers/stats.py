@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+import crud
+import schemas
+from dependencies import DBSession, Principal, get_db, get_current_user
+from http_cache import collection_etag, is_not_modified, not_modified_response, set_cache_headers
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    tags=["stats"]
+)
+
+# --- 账户统计 (GET) ---
+@router.get("/stats", response_model=schemas.AccountStats)
+async def read_account_stats(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    当前用户的笔记/文件夹统计，由冗余计数汇总，不扫描笔记。
+    带 If-None-Match 且数据未变化时返回 304。
+    """
+    change_seq = await crud.aio.get_change_seq(db, owner_id=current_user.id)
+    etag = collection_etag(request.url.path, current_user.id, change_seq)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+    return await crud.aio.get_account_stats(db=db, owner_id=current_user.id)
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+
+import crud
+import schemas
+from dependencies import DBSession, Principal, get_db, get_current_user
+from fast_json import fast_response
+from http_cache import collection_etag, is_not_modified, not_modified_response, set_cache_headers
+
+# 创建一个 APIRouter 实例
+router = APIRouter(
+    tags=["sync"]
+)
+
+# --- 增量同步 (GET) ---
+@router.get("/sync", response_model=schemas.SyncPage)
+async def read_changes(
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0, description="上次同步结束时的 change_seq，0 表示全量同步"),
+    limit: int = Query(200, ge=1, le=1000, description="每页条数（文件夹、笔记、删除记录合计）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    current_user: Principal = Depends(get_current_user),
+    db: DBSession = Depends(get_db)
+):
+    """
+    返回 since 之后新建、修改和删除的文件夹与笔记，按 change_seq 分页。
+
+    客户端先应用 deleted，再应用 folders 和 notes；has_more 为 true 时带上 next_cursor
+    继续请求，为 false 时保存 change_seq 作为下次的 since。since 之后的删除记录已被清理
+    （或 since 晚于当前版本）时返回 410，客户端应丢弃本地数据并从 since=0 重新同步。
+    带 If-None-Match 且数据未变化时返回 304。
+    """
+    change_seq = await crud.aio.get_change_seq(db, owner_id=current_user.id)
+    etag = collection_etag(request.url.path, current_user.id, change_seq, request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_cache_headers(response, etag)
+
+    try:
+        page = await crud.aio.get_changes(
+            db=db,
+            owner_id=current_user.id,
+            since=since,
+            limit=limit,
+            cursor=cursor
+        )
+    except crud.SyncResetRequired:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Full resync required"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return fast_response(page, response)
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from datetime import timedelta
 
 import crud 
 import schemas
 import models
 import auth  # ✅ 改为这样导入
-from dependencies import get_db, get_current_user
+from dependencies import DBSession, Principal, get_db, get_current_user
+from hashing import HashingBusyError
 
 # Create an API router instance
 router = APIRouter(
@@ -14,36 +14,50 @@ router = APIRouter(
     tags=["users"]
 )
 
+def _hashing_busy() -> HTTPException:
+    """Password hashing pool is saturated: ask the client to retry later."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
 # --- 1. User Registration (POST /users/) ---
 @router.post("/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def register_new_user(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_new_user(user_data: schemas.UserCreate, db: DBSession = Depends(get_db)):
     """
     Creates a new user account.
     """
     # Check if a user with the same email already exists
-    db_user_by_email = crud.get_user_by_email(db, email=user_data.email)
+    db_user_by_email = await crud.aio.get_user_by_email(db, email=user_data.email)
     if db_user_by_email:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email already registered."
         )
     # Check if a user with the same username already exists
-    db_user_by_username = crud.get_user_by_username(db, username=user_data.username)
+    db_user_by_username = await crud.aio.get_user_by_username(db, username=user_data.username)
     if db_user_by_username:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already taken."
         )
 
-    return crud.create_user(db=db, user=user_data)
+    try:
+        return await crud.aio.create_user(db=db, user=user_data)
+    except HashingBusyError:
+        raise _hashing_busy()
 
 # 添加登录端点
 @router.post("/login", response_model=schemas.Token)
-def login_user(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_data: schemas.UserLogin, db: DBSession = Depends(get_db)):
     """
     User login endpoint
     """
-    user = crud.authenticate_user(db, user_data.username, user_data.password)
+    try:
+        user = await crud.aio.authenticate_user(db, user_data.username, user_data.password)
+    except HashingBusyError:
+        raise _hashing_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,7 +73,7 @@ def login_user(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_current_user_info(current_user: models.User = Depends(get_current_user)):
+async def get_current_user_info(current_user: Principal = Depends(get_current_user)):
     """
     Get current user information
     """
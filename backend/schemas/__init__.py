@@ -18,16 +18,65 @@ from .user import (
 from .folder import (
     FolderCreate,
     FolderUpdate,
-    FolderRead
+    FolderRead,
+    FolderTreeNode
 )
 
 # 从note模块导入笔记相关模型
 from .note import (
     NoteCreate,
     NoteUpdate,
-    NoteRead
+    NoteRead,
+    NoteSummary,
+    NotePage,
+    NoteSearchHit,
+    NoteBatchCreate,
+    NoteBatchUpdate,
+    NoteBatchMove,
+    NoteBatchDelete,
+    NoteBatchRequest,
+    NoteBatchItemResult,
+    NoteBatchResponse,
+    NoteRevisionSummary,
+    NoteRevisionRead,
+    NoteTextOperation,
+    NotePatch,
+    NotePatchResult
 )
 
+# 从backup模块导入导出/导入相关模型
+from .backup import (
+    EXPORT_FORMAT_VERSION,
+    ExportHeader,
+    ExportFolder,
+    ExportNote,
+    ExportRecord,
+    ImportResult
+)
+
+# 从stats模块导入统计相关模型
+from .stats import AccountStats
+
+# 从sync模块导入增量同步相关模型
+from .sync import (
+    SyncFolder,
+    SyncNote,
+    SyncTombstone,
+    SyncPage
+)
+
+# 从assistant模块导入AI助手相关模型
+from .assistant import (
+    RetrieveRequest,
+    RetrievedPassage,
+    RetrieveResponse,
+    ChatMessage,
+    ChatRequest
+)
+
+# 从attachment模块导入附件相关模型
+from .attachment import AttachmentRead
+
 # 定义可导出的公共接口
 __all__ = [
     # 用户相关模型
@@ -43,9 +92,52 @@ __all__ = [
     'FolderCreate',
     'FolderUpdate',
     'FolderRead',
+    'FolderTreeNode',
     
     # 笔记相关模型
     'NoteCreate',
     'NoteUpdate',
-    'NoteRead'
+    'NoteRead',
+    'NoteSummary',
+    'NotePage',
+    'NoteSearchHit',
+    'NoteBatchCreate',
+    'NoteBatchUpdate',
+    'NoteBatchMove',
+    'NoteBatchDelete',
+    'NoteBatchRequest',
+    'NoteBatchItemResult',
+    'NoteBatchResponse',
+    'NoteRevisionSummary',
+    'NoteRevisionRead',
+    'NoteTextOperation',
+    'NotePatch',
+    'NotePatchResult',
+
+    # 导出/导入相关模型
+    'EXPORT_FORMAT_VERSION',
+    'ExportHeader',
+    'ExportFolder',
+    'ExportNote',
+    'ExportRecord',
+    'ImportResult',
+
+    # 统计相关模型
+    'AccountStats',
+
+    # 增量同步相关模型
+    'SyncFolder',
+    'SyncNote',
+    'SyncTombstone',
+    'SyncPage',
+
+    # AI助手相关模型
+    'RetrieveRequest',
+    'RetrievedPassage',
+    'RetrieveResponse',
+    'ChatMessage',
+    'ChatRequest',
+
+    # 附件相关模型
+    'AttachmentRead'
 ]
\ No newline at end of file
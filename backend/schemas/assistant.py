@@ -0,0 +1,55 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+from datetime import datetime
+
+
+class RetrieveRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=2000, description="问题或关键词")
+    top_k: int = Field(5, ge=1, le=50, description="返回的片段数")
+    min_score: float = Field(0.0, ge=-1.0, le=1.0, description="只返回相似度高于该值的片段")
+
+
+class RetrievedPassage(BaseModel):
+    note_id: int
+    title: str
+    folder_id: Optional[int] = None
+    text: str = Field(..., description="片段正文")
+    start: int = Field(..., description="片段在笔记正文中的起始位置（字符）")
+    end: int = Field(..., description="片段在笔记正文中的结束位置（字符，不含）")
+    score: float = Field(..., description="与问题的相似度（余弦）")
+    updated_at: datetime
+
+
+class RetrieveResponse(BaseModel):
+    passages: List[RetrievedPassage]
+    change_seq: int = Field(..., description="检索时笔记数据的版本号")
+
+
+class ChatMessage(BaseModel):
+    role: Literal["user", "assistant"] = Field(..., description="消息来源：用户或助手")
+    content: str = Field(..., min_length=1, max_length=8000, description="消息内容")
+
+
+class ChatRequest(BaseModel):
+    messages: List[ChatMessage] = Field(..., min_length=1, max_length=50, description="对话历史，最后一条是用户的问题")
+    use_notes: bool = Field(True, description="是否检索笔记作为回答的上下文")
+    top_k: int = Field(4, ge=1, le=10, description="作为上下文的笔记片段数")
+    min_score: float = Field(0.05, ge=-1.0, le=1.0, description="只使用相似度高于该值的片段")
+    max_tokens: Optional[int] = Field(None, ge=1, le=4096, description="回答的最大 token 数，为空时使用服务端默认值")
+    temperature: Optional[float] = Field(None, ge=0.0, le=2.0, description="采样温度，为空时使用模型默认值")
+
+    @model_validator(mode='after')
+    def validate_last_message(self):
+        """最后一条消息必须来自用户"""
+        if self.messages[-1].role != "user":
+            raise ValueError('最后一条消息必须是用户的问题')
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "messages": [{"role": "user", "content": "我上周记的会议结论是什么？"}],
+                "use_notes": True,
+                "top_k": 4
+            }
+        }
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class AttachmentRead(BaseModel):
+    id: int
+    note_id: int
+    filename: str = Field(..., description="上传时的文件名")
+    content_type: str = Field(..., description="MIME 类型")
+    size: int = Field(..., description="字节数")
+    sha256: str = Field(..., description="内容的 SHA-256，同时是下载的 ETag")
+    url: str = Field(..., description="下载地址（相对于站点根路径）")
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "note_id": 42,
+                "filename": "diagram.png",
+                "content_type": "image/png",
+                "size": 48213,
+                "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "url": "/api/attachments/1",
+                "created_at": "2024-01-02T08:30:00"
+            }
+        }
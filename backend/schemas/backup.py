@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional, Union
+from datetime import datetime
+
+from .folder import FolderCreate
+
+# 导出文件格式版本，格式不兼容地变化时递增
+EXPORT_FORMAT_VERSION = 1
+
+# ==================== 1. ExportHeader - 导出文件的第一行 ====================
+class ExportHeader(BaseModel):
+    type: Literal["header"]
+    version: int = Field(..., description="导出格式版本")
+    exported_at: Optional[datetime] = Field(None, description="导出时间")
+
+# ==================== 2. ExportFolder - 一行文件夹记录 ====================
+class ExportFolder(FolderCreate):
+    type: Literal["folder"]
+    id: int = Field(..., description="导出时的文件夹ID，导入时会重新分配")
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# ==================== 3. ExportNote - 一行笔记记录 ====================
+# 不继承 NoteCreate：它的校验器会去掉首尾空白、把空白正文变成 None，
+# 导出再导入必须原样恢复笔记（PATCH 保存的正文可能带首尾空白）
+class ExportNote(BaseModel):
+    type: Literal["note"]
+    id: int = Field(..., description="导出时的笔记ID，导入时会重新分配")
+    title: str = Field(..., min_length=1, max_length=200, description="笔记标题")
+    content: Optional[str] = Field(None, description="笔记内容")
+    folder_id: Optional[int] = Field(None, gt=0, description="导出时的文件夹ID（可选）")
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# 导入时按 type 字段解析每一行
+ExportRecord = Annotated[
+    Union[ExportHeader, ExportFolder, ExportNote],
+    Field(discriminator="type")
+]
+
+# ==================== 4. ImportResult - 导入结果 ====================
+class ImportResult(BaseModel):
+    folders: int = Field(..., description="导入的文件夹数")
+    notes: int = Field(..., description="导入的笔记数")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "folders": 3,
+                "notes": 120
+            }
+        }
@@ -25,6 +25,10 @@ class FolderCreate(BaseModel):
         False,
         description="是否为默认文件夹，默认为 False"
     )
+    parent_id: Optional[int] = Field(
+        None,
+        description="父文件夹ID，为空时创建顶层文件夹"
+    )
     
     @field_validator('name')
     def validate_name(cls, v):
@@ -64,13 +68,21 @@ class FolderCreate(BaseModel):
                 raise ValueError('颜色格式必须为7位字符，如: #6B73FF')
         return v
     
+    @field_validator('parent_id')
+    def validate_parent_id(cls, v):
+        """验证父文件夹ID"""
+        if v is not None and v <= 0:
+            raise ValueError('父文件夹ID必须大于0')
+        return v
+    
     class Config:
         json_schema_extra = {
             "example": {
                 "name": "工作笔记",
                 "description": "存放工作相关的笔记和文档",
                 "color": "#6B73FF",
-                "is_default": False
+                "is_default": False,
+                "parent_id": None
             }
         }
 
@@ -95,6 +107,10 @@ class FolderUpdate(BaseModel):
         None,
         description="是否为默认文件夹（可选）"
     )
+    parent_id: Optional[int] = Field(
+        None,
+        description="新的父文件夹ID（可选），显式传 null 时移动到顶层"
+    )
     
     @field_validator('name')
     def validate_name(cls, v):
@@ -133,6 +149,13 @@ class FolderUpdate(BaseModel):
                 raise ValueError('颜色格式必须为7位字符，如: #6B73FF')
         return v
     
+    @field_validator('parent_id')
+    def validate_parent_id(cls, v):
+        """验证父文件夹ID"""
+        if v is not None and v <= 0:
+            raise ValueError('父文件夹ID必须大于0')
+        return v
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -150,7 +173,11 @@ class FolderRead(BaseModel):
     description: str | None = Field(None, description="文件夹描述")
     color: str = Field(..., description="文件夹颜色")
     is_default: bool = Field(..., description="是否为默认文件夹")
+    parent_id: Optional[int] = Field(None, description="父文件夹ID")
     owner_id: int = Field(..., description="拥有者ID")
+    note_count: int = Field(0, description="文件夹中（不含子文件夹）的笔记数")
+    last_note_updated_at: Optional[datetime] = Field(None, description="文件夹中笔记的最近更新时间")
+    total_content_bytes: int = Field(0, description="文件夹中笔记正文的总字节数")
     created_at: datetime = Field(..., description="创建时间")
     updated_at: datetime = Field(..., description="更新时间")
 
@@ -163,8 +190,16 @@ class FolderRead(BaseModel):
                 "description": "存放工作相关的笔记和文档",
                 "color": "#6B73FF",
                 "is_default": False,
+                "parent_id": None,
                 "owner_id": 1,
+                "note_count": 12,
+                "last_note_updated_at": "2024-01-02T08:30:00",
+                "total_content_bytes": 20480,
                 "created_at": "2024-01-01T00:00:00",
                 "updated_at": "2024-01-01T00:00:00"
             }
         }
+
+
+class FolderTreeNode(FolderRead):
+    children: List["FolderTreeNode"] = Field(default_factory=list, description="子文件夹")
@@ -1,6 +1,13 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Annotated, Literal, Optional, List, Union
 from datetime import datetime
+import re
+
+# C0 控制字符（保留制表符和换行）。笔记中不保存这些字符：搜索高亮用其中的字符标记命中位置
+_CONTROL_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _strip_control(value: str) -> str:
+    return _CONTROL_CHARS.sub("", value)
 
 # ==================== 1. NoteCreate - 创建笔记 ====================
 class NoteCreate(BaseModel):
@@ -22,6 +29,7 @@ class NoteCreate(BaseModel):
     @field_validator('title')
     def validate_title(cls, v):
         """验证标题"""
+        v = _strip_control(v)
         if not v or not v.strip():
             raise ValueError('笔记标题不能为空')
         return v.strip()
@@ -30,6 +38,7 @@ class NoteCreate(BaseModel):
     def validate_content(cls, v):
         """验证内容"""
         if v is not None:
+            v = _strip_control(v)
             return v.strip() if v.strip() else None
         return v
     
@@ -70,6 +79,7 @@ class NoteUpdate(BaseModel):
     def validate_title(cls, v):
         """验证标题"""
         if v is not None:
+            v = _strip_control(v)
             if not v or not v.strip():
                 raise ValueError('笔记标题不能为空')
             return v.strip()
@@ -79,6 +89,7 @@ class NoteUpdate(BaseModel):
     def validate_content(cls, v):
         """验证内容"""
         if v is not None:
+            v = _strip_control(v)
             return v.strip() if v.strip() else None
         return v
     
@@ -121,3 +132,236 @@ class NoteRead(BaseModel):
                 "updated_at": "2024-01-01T00:00:00"
             }
         }
+
+# ==================== 4. NoteSummary - 笔记列表项（不含正文） ====================
+class NoteSummary(BaseModel):
+    id: int
+    title: str
+    snippet: Optional[str] = Field(None, description="正文开头的摘要片段")
+    owner_id: int
+    folder_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "title": "我的笔记",
+                "snippet": "笔记内容...",
+                "owner_id": 1,
+                "folder_id": 1,
+                "created_at": "2024-01-01T00:00:00",
+                "updated_at": "2024-01-01T00:00:00"
+            }
+        }
+
+# ==================== 5. NotePage - 笔记分页列表 ====================
+class NotePage(BaseModel):
+    items: List[NoteSummary] = Field(..., description="当前页的笔记摘要，按 updated_at、id 倒序")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为 null 表示没有更多数据")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [],
+                "next_cursor": "MjAyNC0wMS0wMVQwMDowMDowMHwx"
+            }
+        }
+
+# ==================== 6. NoteSearchHit - 全文搜索结果 ====================
+class NoteSearchHit(BaseModel):
+    id: int
+    title: str = Field(..., description="标题（已转义 HTML），命中部分用 <mark> 标记")
+    snippet: Optional[str] = Field(None, description="正文中命中位置附近的片段（已转义 HTML），命中部分用 <mark> 标记")
+    folder_id: Optional[int]
+    updated_at: datetime
+    score: float = Field(..., description="相关度得分，越大越相关")
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "title": "<mark>机器学习</mark>笔记",
+                "snippet": "…关于<mark>机器学习</mark>的一些总结…",
+                "folder_id": 1,
+                "updated_at": "2024-01-01T00:00:00",
+                "score": 3.2
+            }
+        }
+
+# ==================== 7. NoteBatch - 批量操作 ====================
+class NoteBatchCreate(BaseModel):
+    op: Literal["create"]
+    note: NoteCreate
+
+class NoteBatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int = Field(..., description="笔记ID")
+    note: NoteUpdate
+
+class NoteBatchMove(BaseModel):
+    op: Literal["move"]
+    id: int = Field(..., description="笔记ID")
+    folder_id: Optional[int] = Field(None, description="目标文件夹ID，为 null 时移出文件夹")
+
+class NoteBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int = Field(..., description="笔记ID")
+
+NoteBatchOperation = Annotated[
+    Union[NoteBatchCreate, NoteBatchUpdate, NoteBatchMove, NoteBatchDelete],
+    Field(discriminator="op")
+]
+
+class NoteBatchRequest(BaseModel):
+    operations: List[NoteBatchOperation] = Field(
+        ...,
+        min_length=1,
+        max_length=5000,
+        description="按顺序执行的操作列表，全部在一个事务中提交"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "operations": [
+                    {"op": "create", "note": {"title": "导入的笔记", "content": "...", "folder_id": 1}},
+                    {"op": "update", "id": 3, "note": {"title": "新标题"}},
+                    {"op": "move", "id": 4, "folder_id": 2},
+                    {"op": "delete", "id": 5}
+                ]
+            }
+        }
+
+class NoteBatchItemResult(BaseModel):
+    index: int = Field(..., description="对应 operations 中的下标")
+    op: str
+    ok: bool
+    id: Optional[int] = Field(None, description="笔记ID（create 时为新笔记的ID）")
+    error: Optional[str] = None
+
+class NoteBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[NoteBatchItemResult]
+
+# ==================== 8. NoteRevision - 历史版本 ====================
+class NoteRevisionSummary(BaseModel):
+    seq: int = Field(..., description="版本号，同一笔记内递增")
+    title: str = Field(..., description="该版本的标题")
+    content_bytes: int = Field(..., description="该版本正文字节数(UTF-8)")
+    saved_at: datetime = Field(..., description="该版本的保存时间")
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "seq": 12,
+                "title": "我的笔记",
+                "content_bytes": 2048,
+                "saved_at": "2024-01-01T00:00:00"
+            }
+        }
+
+class NoteRevisionRead(BaseModel):
+    note_id: int
+    seq: int
+    title: str
+    content: Optional[str]
+    content_bytes: int
+    saved_at: datetime
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "note_id": 1,
+                "seq": 12,
+                "title": "我的笔记",
+                "content": "笔记内容...",
+                "content_bytes": 2048,
+                "saved_at": "2024-01-01T00:00:00"
+            }
+        }
+
+# ==================== 9. NotePatch - 增量更新正文 ====================
+class NoteTextOperation(BaseModel):
+    start: int = Field(..., ge=0, description="替换范围起点（UTF-16 码元，与 JavaScript 字符串下标一致）")
+    end: int = Field(..., ge=0, description="替换范围终点（不含）")
+    text: str = Field("", description="替换成的文本，为空表示删除")
+
+    @field_validator('text')
+    def validate_text(cls, v):
+        """去掉控制字符"""
+        return _strip_control(v)
+
+class NotePatch(BaseModel):
+    base_etag: Optional[str] = Field(
+        None,
+        description="编辑所基于的版本的 ETag（GET 响应头中的 ETag），也可以用 If-Match 请求头传递"
+    )
+    ops: Optional[List[NoteTextOperation]] = Field(
+        None,
+        max_length=10000,
+        description="相对基准版本的文本操作，互不重叠"
+    )
+    diff: Optional[str] = Field(None, description="相对基准版本的 unified diff")
+    title: Optional[str] = Field(None, min_length=1, max_length=200, description="新标题（可选）")
+
+    @field_validator('title')
+    def validate_title(cls, v):
+        """验证标题"""
+        if v is not None:
+            v = _strip_control(v)
+            if not v.strip():
+                raise ValueError('笔记标题不能为空')
+            return v.strip()
+        return v
+
+    @field_validator('diff')
+    def validate_diff(cls, v):
+        """去掉控制字符"""
+        if v is not None:
+            return _strip_control(v)
+        return v
+
+    @model_validator(mode='after')
+    def validate_changes(self):
+        """ops 和 diff 最多提供一个，且至少要有一项改动"""
+        if self.ops is not None and self.diff is not None:
+            raise ValueError('ops 和 diff 只能提供一个')
+        if self.ops is None and self.diff is None and self.title is None:
+            raise ValueError('没有需要更新的内容')
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "base_etag": "\"3f9a0c1d2e4b5a6c7d8e\"",
+                "ops": [{"start": 120, "end": 125, "text": "新的文字"}]
+            }
+        }
+
+class NotePatchResult(BaseModel):
+    id: int
+    title: str
+    folder_id: Optional[int]
+    content_length: int = Field(..., description="更新后正文的长度（UTF-16 码元），客户端可据此校验")
+    updated_at: datetime
+    etag: str = Field(..., description="新版本的 ETag，作为下一次 PATCH 的 base_etag")
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "title": "我的笔记",
+                "folder_id": 1,
+                "content_length": 20480,
+                "updated_at": "2024-01-01T00:00:00",
+                "etag": "\"8d1b2f3a4c5e6d7f8a9b\""
+            }
+        }
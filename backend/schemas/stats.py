@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class AccountStats(BaseModel):
+    folder_count: int = Field(..., description="文件夹数")
+    note_count: int = Field(..., description="笔记总数")
+    unfiled_note_count: int = Field(..., description="不在任何文件夹中的笔记数")
+    total_content_bytes: int = Field(..., description="笔记正文总字节数(UTF-8)")
+    last_note_updated_at: Optional[datetime] = Field(None, description="最近一次笔记更新时间")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "folder_count": 8,
+                "note_count": 120,
+                "unfiled_note_count": 5,
+                "total_content_bytes": 524288,
+                "last_note_updated_at": "2024-01-02T08:30:00"
+            }
+        }
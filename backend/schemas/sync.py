@@ -0,0 +1,58 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+
+
+class SyncFolder(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    color: Optional[str] = None
+    is_default: Optional[bool] = None
+    parent_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    change_seq: int = Field(..., description="最后一次修改时的版本号")
+
+    class Config:
+        from_attributes = True
+
+
+class SyncNote(BaseModel):
+    id: int
+    title: str
+    content: Optional[str] = None
+    folder_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    change_seq: int = Field(..., description="最后一次修改时的版本号")
+
+    class Config:
+        from_attributes = True
+
+
+class SyncTombstone(BaseModel):
+    type: Literal["note", "folder"] = Field(..., description="被删除的数据类型")
+    id: int = Field(..., description="被删除的笔记/文件夹ID")
+    change_seq: int = Field(..., description="删除时的版本号")
+
+
+class SyncPage(BaseModel):
+    change_seq: int = Field(..., description="当前版本号，has_more 为 false 时作为下次同步的 since")
+    folders: List[SyncFolder] = Field(..., description="新建或修改的文件夹（不含笔记计数）")
+    notes: List[SyncNote] = Field(..., description="新建或修改的笔记")
+    deleted: List[SyncTombstone] = Field(..., description="已删除的笔记和文件夹，应先于 folders/notes 应用")
+    has_more: bool = Field(..., description="是否还有下一页")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为 null 表示没有更多数据")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "change_seq": 42,
+                "folders": [],
+                "notes": [],
+                "deleted": [{"type": "note", "id": 7, "change_seq": 41}],
+                "has_more": False,
+                "next_cursor": None
+            }
+        }
@@ -0,0 +1,74 @@
+"""
+生产环境启动入口（多 worker）
+
+    python serve.py
+
+- worker 数取 WEB_CONCURRENCY；未设置时等于本进程可用的 CPU 数（考虑 CPU 亲和性和
+  cgroup 配额，容器里不会按宿主机的核数启动）
+- 始终由 uvicorn 的多进程管理器启动，worker 异常退出会被自动拉起
+- 收到 SIGHUP 时逐个替换 worker：新 worker 就绪后才停止旧的，重载期间不中断服务
+  （代码更新后执行 reload.sh 或 systemctl reload mynote）
+- 收到 SIGTERM 时等待进行中的请求完成，最多 GRACEFUL_TIMEOUT 秒
+
+worker 之间的缓存失效通过 bus.py 同步。
+"""
+import math
+import os
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8008"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "20"))
+
+
+def _cgroup_cpu_limit() -> int:
+    """cgroup v2 的 CPU 配额（cpu.max），未限制时返回 0"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        return 0
+    if quota == "max":
+        return 0
+    return max(1, math.ceil(int(quota) / int(period)))
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - macOS / Windows
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    return max(1, int(configured)) if configured else available_cpus()
+
+
+def main() -> None:
+    workers = worker_count()
+    # worker 进程据此调整每个进程的资源（如哈希进程数）
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    config = uvicorn.Config(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        proxy_headers=True,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+    # workers=1 时 uvicorn.run 会在当前进程直接运行，收不到 SIGHUP 重载；
+    # 这里总是经过多进程管理器
+    sock = config.bind_socket()
+    try:
+        Multiprocess(config, sockets=[sock]).run()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
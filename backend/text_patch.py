@@ -0,0 +1,109 @@
+"""
+把客户端提交的改动应用到笔记正文上（PATCH /api/notes/{id}）
+
+支持两种格式，都相对客户端编辑前的版本（基准版本）：
+- 文本操作：[{start, end, text}]，把基准文本的 [start, end) 替换为 text。位置按 UTF-16
+  码元计算，与浏览器中 JavaScript 字符串的下标一致；多个操作互不重叠，顺序不限
+- unified diff（diff -u / jsdiff 的 createPatch 格式）：按行应用，上下文和删除的行
+  必须与基准文本一致
+
+改动无法应用时抛出 PatchError。
+"""
+import re
+from typing import Iterable, List
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """改动与基准文本不匹配或格式不合法"""
+
+
+def apply_text_ops(base: str, ops: Iterable) -> str:
+    """
+    应用文本操作，ops 中每一项有 start、end、text 属性。
+    """
+    # 按 UTF-16 编码后位置乘 2 就是字节偏移
+    encoded = base.encode("utf-16-le")
+    length = len(encoded) // 2
+    parts = []
+    position = 0
+    for op in sorted(ops, key=lambda op: (op.start, op.end)):
+        if op.end < op.start or op.end > length:
+            raise PatchError(f"Operation range [{op.start}, {op.end}) is outside the text (length {length})")
+        if op.start < position:
+            raise PatchError(f"Operation at {op.start} overlaps a previous operation")
+        parts.append(encoded[position * 2:op.start * 2])
+        parts.append(op.text.encode("utf-16-le", "surrogatepass"))
+        position = op.end
+    parts.append(encoded[position * 2:])
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError as exc:
+        raise PatchError("Operation splits a surrogate pair") from exc
+
+
+def _split_lines(text: str) -> List[str]:
+    """按 \\n 分行并保留换行符，与 diff 工具的分行方式一致（\\r 留在行内）"""
+    parts = text.split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def apply_unified_diff(base: str, diff: str) -> str:
+    """
+    应用 unified diff。文件头（---/+++ 等）会被忽略，按 hunk 头中的行数读取每个 hunk。
+    """
+    lines = _split_lines(base)
+    diff_lines = diff.split("\n")
+    output = []
+    position = 0
+    index = 0
+    hunks = 0
+    while index < len(diff_lines):
+        header = _HUNK_HEADER.match(diff_lines[index])
+        index += 1
+        if not header:
+            if hunks and diff_lines[index - 1].strip():
+                raise PatchError(f"Unexpected line {index} outside a hunk")
+            continue
+        hunks += 1
+        old_start, old_count = int(header.group(1)), int(header.group(2) or 1)
+        new_count = int(header.group(4) or 1)
+        # 旧行数为 0 时，起始行号表示在该行之后插入
+        start = old_start - 1 if old_count else old_start
+        if start < position or start > len(lines):
+            raise PatchError(f"Hunk {hunks} starts at line {old_start}, which is out of order or past the end")
+        output.extend(lines[position:start])
+        position = start
+
+        old_seen = new_seen = 0
+        while old_seen < old_count or new_seen < new_count:
+            if index >= len(diff_lines):
+                raise PatchError(f"Hunk {hunks} is truncated")
+            line = diff_lines[index]
+            index += 1
+            tag, text = (line[:1], line[1:]) if line else (" ", "")
+            # 下一行是 "\ No newline at end of file" 时本行没有换行符
+            if index < len(diff_lines) and diff_lines[index].startswith("\\"):
+                index += 1
+            else:
+                text += "\n"
+            if tag in (" ", "-"):
+                if position >= len(lines) or lines[position] != text:
+                    raise PatchError(f"Hunk {hunks} does not match the base text at line {position + 1}")
+                position += 1
+                old_seen += 1
+            if tag in (" ", "+"):
+                output.append(text)
+                new_seen += 1
+            elif tag != "-":
+                raise PatchError(f"Invalid line in hunk {hunks}: {line[:40]!r}")
+        if old_seen != old_count or new_seen != new_count:
+            raise PatchError(f"Hunk {hunks} line counts do not match its header")
+    if not hunks:
+        raise PatchError("The diff contains no hunks")
+    output.extend(lines[position:])
+    return "".join(output)
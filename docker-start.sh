@@ -9,7 +9,7 @@ echo "🐳 在Docker容器中启动 MyNote2.0 应用..."
 # 启动后端服务（后台运行）
 echo "🔧 启动后端API服务..."
 cd /app/backend
-uvicorn main:app --host 0.0.0.0 --port 8008 &
+python serve.py &
 BACKEND_PID=$!
 echo "✅ 后端服务已启动 (PID: $BACKEND_PID)"
 
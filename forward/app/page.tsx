@@ -5,13 +5,13 @@ import FolderCard from '../components/FolderCard';
 import NoteCard from '../components/NoteCard';
 import CreateFolderModal from '../components/CreateFolderModal';
 import { folderApi, noteApi } from '../services/api';
-import { Folder, Note, CreateFolderData } from '../types';
+import { Folder, NoteSummary, NotePage, CreateFolderData } from '../types';
 
 function HomeContent() {
   const router = useRouter();
   const searchParams = useSearchParams();
   const [folders, setFolders] = useState<Folder[]>([]);
-  const [notes, setNotes] = useState<Note[]>([]);
+  const [notes, setNotes] = useState<NoteSummary[]>([]);
   const [selectedFolder, setSelectedFolder] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -38,8 +38,8 @@ function HomeContent() {
     try {
       setLoading(true);
       setError(null);
-      const data = await noteApi.getAll(folderId) as unknown as Note[];
-      setNotes(data);
+      const page = await noteApi.getAll(folderId) as unknown as NotePage;
+      setNotes(page.items);
     } catch (err) {
       console.error('获取笔记失败:', err);
       setError('获取笔记失败');
@@ -199,6 +199,7 @@ function HomeContent() {
                   <FolderCard
                     key={folder.id}
                     name={folder.name}
+                    noteCount={folder.note_count}
                     onClick={() => handleFolderClick(folder.id)}
                   />
                 ))}
@@ -266,7 +267,7 @@ function HomeContent() {
                     title={note.title}
                     path={note.id.toString()}
                     lastModified={new Date(note.updated_at).toLocaleDateString('zh-CN')}
-                    preview={note.content ? note.content.split('\n')[0].substring(0, 100) : undefined}
+                    preview={note.snippet ? note.snippet.split('\n')[0].substring(0, 100) : undefined}
                   />
                 ))}
               </div>
@@ -1,10 +1,73 @@
 'use client';
-import { useState } from 'react';
-import { IoChatbubbleEllipses, IoClose, IoSend, IoSparkles } from 'react-icons/io5';
+import { useEffect, useRef, useState } from 'react';
+import { IoChatbubbleEllipses, IoClose, IoSend, IoSparkles, IoStop } from 'react-icons/io5';
+import { assistantApi } from '../services/api';
+import { ChatMessage, RetrievedPassage } from '../types';
 
 export default function FloatingChat() {
   const [isOpen, setIsOpen] = useState(false);
   const [message, setMessage] = useState('');
+  const [messages, setMessages] = useState<ChatMessage[]>([]);
+  // 最后一条回答引用的笔记片段
+  const [sources, setSources] = useState<RetrievedPassage[]>([]);
+  const [status, setStatus] = useState('');
+  const [isStreaming, setIsStreaming] = useState(false);
+  const abortRef = useRef<AbortController | null>(null);
+  const bottomRef = useRef<HTMLDivElement>(null);
+
+  // 关闭组件时断开正在进行的回答，服务端随之停止生成
+  useEffect(() => () => abortRef.current?.abort(), []);
+
+  useEffect(() => {
+    bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
+  }, [messages]);
+
+  const appendToReply = (text: string) => {
+    setMessages((prev) => {
+      const last = prev[prev.length - 1];
+      return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+    });
+  };
+
+  const sendMessage = async (text: string = message) => {
+    const question = text.trim();
+    if (!question || isStreaming) return;
+    // 停止得太早的回答没有内容，不放进对话历史
+    const history: ChatMessage[] = [...messages.filter((item) => item.content), { role: 'user', content: question }];
+    // 先放一条空的回答，token 到达后逐段追加
+    setMessages([...history, { role: 'assistant', content: '' }]);
+    setMessage('');
+    setSources([]);
+    setStatus('');
+    setIsStreaming(true);
+    const controller = new AbortController();
+    abortRef.current = controller;
+    try {
+      await assistantApi.chat(history, {
+        onContext: setSources,
+        onQueued: (position) => setStatus(`排队中，前面还有 ${position} 个请求…`),
+        onToken: (token) => {
+          setStatus('');
+          appendToReply(token);
+        },
+        onError: (detail) => {
+          setStatus('');
+          appendToReply(`（${detail}）`);
+        },
+      }, controller.signal);
+    } catch (error) {
+      if (!controller.signal.aborted) {
+        console.error('AI 助手请求失败:', error);
+        appendToReply('（连接中断）');
+      }
+    } finally {
+      abortRef.current = null;
+      setIsStreaming(false);
+      setStatus('');
+    }
+  };
+
+  const stopReply = () => abortRef.current?.abort();
 
   return (
     <>
@@ -52,29 +115,36 @@ export default function FloatingChat() {
               </div>
             </div>
             
-            {/* 示例用户消息 */}
-            <div className="flex items-start space-x-2 sm:space-x-3 justify-end">
-              <div className="bg-gradient-to-r from-blue-500 to-purple-600 p-3 sm:p-4 rounded-2xl rounded-tr-md max-w-xs shadow-sm">
-                <p className="text-xs sm:text-sm text-white leading-relaxed">
-                  帮我整理一下今天的笔记
-                </p>
-              </div>
-              <div className="w-7 h-7 sm:w-8 sm:h-8 bg-gray-300 rounded-full flex items-center justify-center flex-shrink-0">
-                <span className="text-white text-xs font-medium">我</span>
-              </div>
-            </div>
-            
-            {/* AI回复消息 */}
-            <div className="flex items-start space-x-2 sm:space-x-3">
-              <div className="w-7 h-7 sm:w-8 sm:h-8 bg-gradient-to-r from-blue-500 to-purple-600 rounded-full flex items-center justify-center flex-shrink-0">
-                <IoSparkles className="text-white text-xs sm:text-sm" />
+            {messages.map((item, index) => item.role === 'user' ? (
+              <div key={index} className="flex items-start space-x-2 sm:space-x-3 justify-end">
+                <div className="bg-gradient-to-r from-blue-500 to-purple-600 p-3 sm:p-4 rounded-2xl rounded-tr-md max-w-xs shadow-sm">
+                  <p className="text-xs sm:text-sm text-white leading-relaxed whitespace-pre-wrap">
+                    {item.content}
+                  </p>
+                </div>
+                <div className="w-7 h-7 sm:w-8 sm:h-8 bg-gray-300 rounded-full flex items-center justify-center flex-shrink-0">
+                  <span className="text-white text-xs font-medium">我</span>
+                </div>
               </div>
-              <div className="bg-gradient-to-r from-blue-50 to-purple-50 p-3 sm:p-4 rounded-2xl rounded-tl-md max-w-xs shadow-sm border border-blue-100">
-                <p className="text-xs sm:text-sm text-gray-800 leading-relaxed">
-                  好的！我可以帮你整理笔记。请告诉我你想要整理哪些内容，或者上传你的笔记文件。
-                </p>
+            ) : (
+              <div key={index} className="flex items-start space-x-2 sm:space-x-3">
+                <div className="w-7 h-7 sm:w-8 sm:h-8 bg-gradient-to-r from-blue-500 to-purple-600 rounded-full flex items-center justify-center flex-shrink-0">
+                  <IoSparkles className="text-white text-xs sm:text-sm" />
+                </div>
+                <div className="bg-gradient-to-r from-blue-50 to-purple-50 p-3 sm:p-4 rounded-2xl rounded-tl-md max-w-xs shadow-sm border border-blue-100">
+                  <p className="text-xs sm:text-sm text-gray-800 leading-relaxed whitespace-pre-wrap">
+                    {item.content || (index === messages.length - 1 && (status || '思考中…'))}
+                  </p>
+                  {/* 最后一条回答参考的笔记 */}
+                  {index === messages.length - 1 && sources.length > 0 && (
+                    <p className="mt-2 text-xs text-gray-500">
+                      参考：{sources.map((source) => `《${source.title}》`).filter((title, i, all) => all.indexOf(title) === i).join('、')}
+                    </p>
+                  )}
+                </div>
               </div>
-            </div>
+            ))}
+            <div ref={bottomRef} />
           </div>
         </div>
         
@@ -89,29 +159,28 @@ export default function FloatingChat() {
               className="flex-1 px-3 sm:px-4 py-2.5 sm:py-3 border border-gray-200 rounded-2xl focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent bg-gray-50 transition-all duration-200 text-sm sm:text-base"
               onKeyPress={(e) => {
                 if (e.key === 'Enter') {
-                  setMessage('');
+                  sendMessage();
                 }
               }}
             />
             <button
-              onClick={() => {
-                setMessage('');
-              }}
+              onClick={() => (isStreaming ? stopReply() : sendMessage())}
+              title={isStreaming ? '停止回答' : '发送'}
               className="px-4 sm:px-6 py-2.5 sm:py-3 bg-gradient-to-r from-blue-500 to-purple-600 text-white rounded-2xl hover:shadow-lg transform hover:scale-105 transition-all duration-200 flex items-center justify-center"
             >
-              <IoSend className="text-base sm:text-lg" />
+              {isStreaming ? <IoStop className="text-base sm:text-lg" /> : <IoSend className="text-base sm:text-lg" />}
             </button>
           </div>
           
           {/* 快捷操作按钮 */}
           <div className="flex space-x-1.5 sm:space-x-2 mt-2 sm:mt-3 overflow-x-auto">
-            <button className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-blue-100 text-blue-700 rounded-full text-xs hover:bg-blue-200 transition-colors whitespace-nowrap">
+            <button onClick={() => sendMessage('帮我整理一下今天的笔记')} className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-blue-100 text-blue-700 rounded-full text-xs hover:bg-blue-200 transition-colors whitespace-nowrap">
               📝 整理笔记
             </button>
-            <button className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-purple-100 text-purple-700 rounded-full text-xs hover:bg-purple-200 transition-colors whitespace-nowrap">
+            <button onClick={() => sendMessage('根据我的笔记给我一些创意建议')} className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-purple-100 text-purple-700 rounded-full text-xs hover:bg-purple-200 transition-colors whitespace-nowrap">
               💡 创意建议
             </button>
-            <button className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-green-100 text-green-700 rounded-full text-xs hover:bg-green-200 transition-colors whitespace-nowrap">
+            <button onClick={() => sendMessage('在我的笔记里找一找还没完成的待办事项')} className="px-2.5 sm:px-3 py-1 sm:py-1.5 bg-green-100 text-green-700 rounded-full text-xs hover:bg-green-200 transition-colors whitespace-nowrap">
               🔍 搜索内容
             </button>
           </div>
@@ -3,10 +3,11 @@ import { IoFolder } from 'react-icons/io5';
 
 interface FolderCardProps {
   name: string;
+  noteCount?: number;
   onClick: () => void;
 }
 
-const FolderCard: FC<FolderCardProps> = ({ name, onClick }) => {
+const FolderCard: FC<FolderCardProps> = ({ name, noteCount, onClick }) => {
   return (
     <div
       onClick={onClick}
@@ -16,6 +17,9 @@ const FolderCard: FC<FolderCardProps> = ({ name, onClick }) => {
         <IoFolder className="text-yellow-500 text-xl sm:text-2xl flex-shrink-0" />
         <h3 className="text-base sm:text-lg font-medium text-gray-800 truncate">{name}</h3>
       </div>
+      {noteCount !== undefined && (
+        <p className="mt-2 text-xs sm:text-sm text-gray-500">{noteCount} 篇笔记</p>
+      )}
     </div>
   );
 };
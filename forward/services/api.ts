@@ -7,8 +7,18 @@ import {
   CreateFolderData,
   UpdateFolderData,
   Note,
+  NotePage,
   CreateNoteData,
   UpdateNoteData,
+  PatchNoteData,
+  NotePatchResult,
+  SyncPage,
+  ChangeEvent,
+  RetrieveResponse,
+  RetrievedPassage,
+  ChatMessage,
+  ChatDone,
+  Attachment,
 } from '../types';
 
 // 定义登录响应类型
@@ -90,17 +100,130 @@ export const folderApi = {
 // 笔记 API
 export const noteApi = {
   create: (data: CreateNoteData) => api.post<Note>('/api/notes/', data),
-  getAll: (folder_id?: number, skip: number = 0, limit: number = 100) => {
+  // 按更新时间倒序分页，cursor 为上一页返回的 next_cursor
+  getAll: (folder_id?: number, cursor: string | null = null, limit: number = 100) => {
+    const params = cursor ? { cursor, limit } : { limit };
     // 如果指定了文件夹ID，使用专门的文件夹端点
     if (folder_id) {
-      return api.get<Note[]>(`/api/notes/folder/${folder_id}`, { params: { skip, limit } });
+      return api.get<NotePage>(`/api/notes/folder/${folder_id}`, { params });
     }
     // 否则获取所有笔记
-    return api.get<Note[]>('/api/notes/', { params: { skip, limit } });
+    return api.get<NotePage>('/api/notes/', { params });
   },
   getOne: (id: number) => api.get<Note>(`/api/notes/${id}`),
   update: (id: number, data: UpdateNoteData) => api.put<Note>(`/api/notes/${id}`, data),
+  // 只上传改动部分；基准版本已被修改时返回 409，需要重新获取笔记
+  patch: (id: number, data: PatchNoteData) => api.patch<NotePatchResult>(`/api/notes/${id}`, data),
   delete: (id: number) => api.delete(`/api/notes/${id}`),
   getPublic: (skip: number = 0, limit: number = 100) =>
     api.get<Note[]>('/api/notes/public', { params: { skip, limit } }),
 };
+
+// 增量同步 API：返回 since 之后的改动；返回 410 时需要从 since=0 全量重新同步
+export const syncApi = {
+  getChanges: (since: number = 0, cursor: string | null = null, limit: number = 200) =>
+    api.get<SyncPage>('/api/sync', { params: cursor ? { cursor, limit } : { since, limit } }),
+};
+
+// 变更推送 API（Server-Sent Events）
+export const changeFeedApi = {
+  // EventSource 不能设置请求头，令牌放在查询参数中；断线重连时浏览器自动带上 Last-Event-ID
+  subscribe: (
+    since: number,
+    onChange: (event: ChangeEvent) => void,
+    onResync: (since: number) => void
+  ): EventSource => {
+    const params = new URLSearchParams({
+      access_token: localStorage.getItem('token') || '',
+      since: String(since),
+    });
+    const source = new EventSource(`${api.defaults.baseURL}/api/events?${params}`);
+    source.addEventListener('change', (event) => {
+      onChange(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('resync', (event) => {
+      onResync(JSON.parse((event as MessageEvent).data).since);
+    });
+    return source;
+  },
+};
+
+// 对话事件流的回调
+export interface ChatHandlers {
+  onContext?: (passages: RetrievedPassage[]) => void;
+  onQueued?: (position: number) => void;
+  onToken: (text: string) => void;
+  onDone?: (done: ChatDone) => void;
+  onError?: (detail: string) => void;
+}
+
+// AI 助手 API
+export const assistantApi = {
+  // 在当前用户的笔记中检索与问题相关的片段
+  retrieve: (query: string, topK: number = 5) =>
+    api.post<RetrieveResponse>('/api/assistant/retrieve', { query, top_k: topK }),
+  // 流式对话：EventSource 只能发 GET，这里用 fetch 读取 SSE 响应流；
+  // 调用 signal 对应的 AbortController.abort() 即断开连接，服务端随之停止生成
+  chat: async (messages: ChatMessage[], handlers: ChatHandlers, signal?: AbortSignal) => {
+    const response = await fetch(`${api.defaults.baseURL}/api/assistant/chat`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${localStorage.getItem('token') || ''}`,
+      },
+      body: JSON.stringify({ messages }),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      handlers.onError?.(response.status === 429 ? '请求太多，请稍后再试' : `请求失败（${response.status}）`);
+      return;
+    }
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      // 事件之间以空行分隔，最后一段可能不完整，留到下次
+      const events = buffer.split('\n\n');
+      buffer = events.pop() || '';
+      for (const block of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (event === 'token') handlers.onToken(payload.text);
+        else if (event === 'context') handlers.onContext?.(payload.passages);
+        else if (event === 'queued') handlers.onQueued?.(payload.position);
+        else if (event === 'done') handlers.onDone?.(payload);
+        else if (event === 'error') handlers.onError?.(payload.detail);
+      }
+    }
+  },
+};
+
+// 附件 API
+export const attachmentApi = {
+  // 文件字段名必须是 file；onProgress 接收 0~1 的上传进度
+  upload: (noteId: number, file: File, onProgress?: (progress: number) => void) => {
+    const form = new FormData();
+    form.append('file', file);
+    return api.post<Attachment>('/api/attachments/', form, {
+      params: { note_id: noteId },
+      // 覆盖实例默认的 JSON（否则 FormData 会被转成 JSON），boundary 由浏览器补上
+      headers: { 'Content-Type': 'multipart/form-data' },
+      onUploadProgress: (event) => {
+        if (onProgress && event.total) onProgress(event.loaded / event.total);
+      },
+    });
+  },
+  getForNote: (noteId: number) => api.get<Attachment[]>('/api/attachments/', { params: { note_id: noteId } }),
+  delete: (id: number) => api.delete(`/api/attachments/${id}`),
+  // <img src> / <a href> 不能设置请求头，令牌放在查询参数中
+  url: (attachment: Attachment) =>
+    `${api.defaults.baseURL}${attachment.url}?access_token=${encodeURIComponent(localStorage.getItem('token') || '')}`,
+};
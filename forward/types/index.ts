@@ -29,6 +29,9 @@ export interface Folder {
   created_at: string;
   updated_at: string;
   children?: Folder[];
+  note_count?: number;
+  last_note_updated_at?: string | null;
+  total_content_bytes?: number;
   notes?: Note[];
 }
 
@@ -57,6 +60,22 @@ export interface Note {
   folder?: Folder;
 }
 
+// 列表接口返回的笔记摘要（不含完整正文）
+export interface NoteSummary {
+  id: number;
+  title: string;
+  snippet?: string | null;
+  folder_id?: number | null;
+  owner_id: number;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface NotePage {
+  items: NoteSummary[];
+  next_cursor: string | null;
+}
+
 export interface CreateNoteData {
   title: string;
   content?: string;
@@ -69,4 +88,130 @@ export interface UpdateNoteData {
   content?: string;
   folder_id?: number;
   is_public?: boolean;
-}
\ No newline at end of file
+}
+
+// 增量更新：把基准文本的 [start, end) 替换为 text，位置即 JavaScript 字符串下标
+export interface NoteTextOperation {
+  start: number;
+  end: number;
+  text: string;
+}
+
+// ops 与 diff（unified diff）二选一；base_etag 为编辑所基于版本的 ETag
+export interface PatchNoteData {
+  base_etag: string;
+  ops?: NoteTextOperation[];
+  diff?: string;
+  title?: string;
+}
+
+export interface NotePatchResult {
+  id: number;
+  title: string;
+  folder_id?: number | null;
+  content_length: number;
+  updated_at: string;
+  etag: string;
+}
+
+export interface SyncFolder {
+  id: number;
+  name: string;
+  description?: string | null;
+  color?: string | null;
+  is_default?: boolean | null;
+  parent_id?: number | null;
+  created_at: string;
+  updated_at: string;
+  change_seq: number;
+}
+
+export interface SyncNote {
+  id: number;
+  title: string;
+  content?: string | null;
+  folder_id?: number | null;
+  created_at: string;
+  updated_at: string;
+  change_seq: number;
+}
+
+export interface SyncTombstone {
+  type: 'note' | 'folder';
+  id: number;
+  change_seq: number;
+}
+
+// 先应用 deleted，再应用 folders / notes；has_more 为 false 时保存 change_seq 作为下次的 since
+export interface SyncPage {
+  change_seq: number;
+  folders: SyncFolder[];
+  notes: SyncNote[];
+  deleted: SyncTombstone[];
+  has_more: boolean;
+  next_cursor: string | null;
+}
+
+export type ChangeType =
+  | 'note.created'
+  | 'note.updated'
+  | 'note.moved'
+  | 'note.deleted'
+  | 'folder.created'
+  | 'folder.updated'
+  | 'folder.moved'
+  | 'folder.deleted';
+
+export interface Change {
+  type: ChangeType;
+  id: number;
+  folder_id?: number | null;
+  parent_id?: number | null;
+}
+
+// 事件只描述改动了什么；truncated 为 true 或收到 resync 时调用 syncApi.getChanges 补齐
+export interface ChangeEvent {
+  change_seq: number;
+  changes: Change[];
+  truncated: boolean;
+}
+
+export interface RetrievedPassage {
+  note_id: number;
+  title: string;
+  folder_id?: number | null;
+  text: string;
+  start: number;
+  end: number;
+  score: number;
+  updated_at: string;
+}
+
+export interface RetrieveResponse {
+  passages: RetrievedPassage[];
+  change_seq: number;
+}
+export interface ChatMessage {
+  role: 'user' | 'assistant';
+  content: string;
+}
+
+// 一次回答结束时的统计
+export interface ChatDone {
+  finish_reason: string | null;
+  completion_tokens: number;
+  time_to_first_token_ms: number | null;
+  tokens_per_second: number | null;
+}
+
+// 笔记附件；相同内容的附件共用一份存储，sha256 同时是下载的 ETag
+export interface Attachment {
+  id: number;
+  note_id: number;
+  filename: string;
+  content_type: string;
+  size: number;
+  sha256: string;
+  url: string;
+  created_at: string;
+}
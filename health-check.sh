@@ -102,6 +102,8 @@ main() {
     # 检查HTTP服务
     check_service "前端服务" "http://localhost:3000" || ((failed++))
     check_service "后端API" "http://localhost:8008" || ((failed++))
+    check_service "后端存活" "http://localhost:8008/health" || ((failed++))
+    check_service "后端就绪" "http://localhost:8008/ready" || ((failed++))
     check_service "API文档" "http://localhost:8008/docs" || ((failed++))
     
     echo ""
@@ -0,0 +1,48 @@
+#!/bin/bash
+
+# MyNote2.0 后端平滑重载脚本
+# 代码或配置更新后使用：逐个替换后端 worker，新 worker 就绪后才停止旧的，服务不中断
+# （需要完全重启前端或修改 worker 数时仍使用 restart.sh）
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+cd "$SCRIPT_DIR"
+
+if [ ! -f "logs/backend.pid" ] || ! kill -0 "$(cat logs/backend.pid)" 2>/dev/null; then
+    echo "❌ 后端服务未运行，请使用 ./start.sh 启动"
+    exit 1
+fi
+
+BACKEND_PID=$(cat logs/backend.pid)
+# 超时（秒）：每个 worker 启动并等待旧 worker 优雅退出，worker 多时可适当调大
+RELOAD_TIMEOUT=${RELOAD_TIMEOUT:-80}
+# worker 是 multiprocessing spawn 出来的子进程（另一个子进程是 resource_tracker）
+OLD_WORKERS=$(pgrep -P "$BACKEND_PID" -f multiprocessing-fork)
+RELOAD_AT=$(date +%s.%N)
+echo "🔄 平滑重载后端服务 (PID: $BACKEND_PID)..."
+kill -HUP "$BACKEND_PID"
+
+# 旧 worker 在整个重载期间都会响应 /ready，不能据此判断完成。等所有旧 worker 退出，
+# 且 /ready 由 HUP 之后启动的 worker 响应（响应中的 worker.started_at）才算完成。
+# 新 worker 未能就绪时 uvicorn 会放弃重载、保留剩余的旧 worker，此时等到超时报告失败。
+for _ in $(seq 1 $((RELOAD_TIMEOUT * 5))); do
+    if ! kill -0 "$BACKEND_PID" 2>/dev/null; then
+        echo "❌ 后端进程已退出，请检查日志"
+        exit 1
+    fi
+    REMAINING=""
+    for pid in $OLD_WORKERS; do
+        if kill -0 "$pid" 2>/dev/null; then
+            REMAINING="$REMAINING $pid"
+        fi
+    done
+    if [ -z "$REMAINING" ]; then
+        STARTED_AT=$(curl -sf http://localhost:8008/ready | grep -o '"started_at":[0-9.]*' | cut -d: -f2)
+        if [ -n "$STARTED_AT" ] && awk "BEGIN { exit !($STARTED_AT >= $RELOAD_AT) }"; then
+            echo "✅ 后端重载完成"
+            exit 0
+        fi
+    fi
+    sleep 0.2
+done
+echo "❌ 后端重载未完成（仍在运行的旧 worker:${REMAINING:- 无}），请检查日志"
+exit 1
@@ -9,14 +9,10 @@ echo "🔄 重启 MyNote2.0 应用..."
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 cd "$SCRIPT_DIR"
 
-# 停止服务
+# 停止服务（stop.sh 会等待进程退出）
 echo "🛑 停止现有服务..."
 ./stop.sh
 
-# 等待服务完全停止
-echo "⏳ 等待服务完全停止..."
-sleep 3
-
 # 启动服务
 echo "🚀 启动服务..."
 ./start.sh
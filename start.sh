@@ -55,12 +55,25 @@ if [ -f "requirements.txt" ]; then
 fi
 
 # 启动后端服务（后台运行）
+# worker 数默认等于可用 CPU 数，可用 WEB_CONCURRENCY 指定；代码更新后用 ./reload.sh 平滑重载
 echo "🚀 启动后端API服务 (端口 8008)..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8008 > /dev/null 2>&1 &
+nohup python serve.py > /dev/null 2>&1 &
 BACKEND_PID=$!
 echo $BACKEND_PID > ../logs/backend.pid
 echo "✅ 后端服务已启动 (PID: $BACKEND_PID)"
 
+# 等待后端就绪（数据库可用、迁移完成），代替固定的等待时间
+echo -n "⏳ 等待后端就绪"
+READY_START=$(date +%s%N)
+for _ in $(seq 1 150); do
+    if curl -sf -o /dev/null http://localhost:8008/ready; then
+        echo " ✅ ($(( ($(date +%s%N) - READY_START) / 1000000 )) ms)"
+        break
+    fi
+    echo -n "."
+    sleep 0.2
+done
+
 # 返回项目根目录
 cd ..
 
@@ -15,7 +15,11 @@ if [ -f "logs/backend.pid" ]; then
     if kill -0 $BACKEND_PID 2>/dev/null; then
         echo "🔧 停止后端服务 (PID: $BACKEND_PID)..."
         kill $BACKEND_PID
-        sleep 2
+        # 等待优雅退出（各 worker 处理完进行中的请求、关闭哈希进程池、释放数据库连接），最多 25 秒
+        for _ in $(seq 1 125); do
+            kill -0 $BACKEND_PID 2>/dev/null || break
+            sleep 0.2
+        done
         if kill -0 $BACKEND_PID 2>/dev/null; then
             echo "⚠️  强制停止后端服务..."
             kill -9 $BACKEND_PID
@@ -52,6 +56,7 @@ fi
 # 额外清理：杀死可能残留的进程
 echo "🧹 清理残留进程..."
 pkill -f "uvicorn main:app" 2>/dev/null || true
+pkill -f "python serve.py" 2>/dev/null || true
 pkill -f "npm start" 2>/dev/null || true
 pkill -f "next start" 2>/dev/null || true
 